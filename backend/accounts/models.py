@@ -13,6 +13,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     nickname = models.CharField(max_length=30, unique=True)
     profile_image = models.ImageField(
         upload_to='profile_images', null=True, blank=True)
+    # 썸네일/중간 크기 파생본의 스토리지 이름 (books.image_variants)
+    image_variants = models.JSONField(default=dict, blank=True)
     is_verified = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
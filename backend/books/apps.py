@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class BooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'books'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import image_variants
+
+        image_variants.connect()
+
+        # gunicorn --preload 처럼 마스터에서 앱을 올린 뒤 fork 하는 경우,
+        # 무거운 provider 모듈을 미리 올려 두면 워커들이 메모리를 공유하고 바로 요청을 받음
+        if getattr(settings, "PRELOAD_PROVIDERS", False):
+            from . import lazy
+            from .generators import prompt_budget
+            lazy.preload()
+            # tiktoken 은 첫 사용 때 BPE 파일을 내려받으므로 요청 전에 미리 받아 둠
+            prompt_budget.get_encoding()
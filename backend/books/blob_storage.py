@@ -0,0 +1,129 @@
+"""
+내용 해시로 이름을 정하는(content-addressed) 미디어 스토리지
+
+``{title}_chapter_{n}.png`` 처럼 제목으로 이름을 지으면 다시 생성하거나 같은 파일을 올릴 때마다
+객체가 따로 쌓입니다. ``ContentAddressedMixin`` 을 스토리지 앞에 섞으면 저장할 때 내용의
+sha256 으로 ``blobs/ab/<sha256>.png`` 이름을 정하고, 같은 내용은 한 번만 올린 뒤
+``StoredBlob.refcount`` 만 올립니다. ``delete()`` 는 참조 수만 내리고 실제 파일은
+``python manage.py gc_media`` 가 DB 의 실제 참조를 다시 세어 유예 시간이 지난 고아 파일만 지웁니다.
+(저장 직후 아직 커밋되지 않은 행이 참조하는 파일을 지우지 않도록)
+
+    DEFAULT_FILE_STORAGE = "books.blob_storage.ContentAddressedFileSystemStorage"
+    DEFAULT_FILE_STORAGE = "config.asset_storage.ContentAddressedMediaStorage"  # S3
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+DEFAULT_BLOBS = {
+    "PREFIX": "blobs",
+    # 해시를 계산하는 동안 이 크기까지는 메모리에, 넘으면 임시 파일에 담음
+    "SPOOL_MAX_SIZE": 2 * 1024 * 1024,
+    # 참조가 없어진 뒤 gc_media 가 파일을 지우기까지 기다리는 시간(초)
+    "GRACE_PERIOD": 60 * 60 * 24,
+}
+
+
+def blob_settings():
+    return {**DEFAULT_BLOBS, **getattr(settings, "BLOB_STORAGE", {})}
+
+
+def _spool(content):
+    """내용을 한 번 읽으며 sha256 을 계산하고, 다시 읽을 수 있는 임시 파일로 옮깁니다."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=blob_settings()["SPOOL_MAX_SIZE"])
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in content.chunks():
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        digest.update(chunk)
+        spooled.write(chunk)
+        size += len(chunk)
+    spooled.seek(0)
+    return spooled, digest.hexdigest(), size
+
+
+class ContentAddressedMixin:
+    """Storage 클래스 앞에 섞어 쓰는 내용 주소 지정 + 참조 수 관리"""
+
+    def blob_name(self, digest, name):
+        extension = os.path.splitext(name or "")[1].lower()
+        return f"{blob_settings()['PREFIX']}/{digest[:2]}/{digest}{extension}"
+
+    def is_blob(self, name):
+        return (name or "").startswith(f"{blob_settings()['PREFIX']}/")
+
+    def save(self, name, content, max_length=None):
+        from .models import StoredBlob
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        spooled, digest, size = _spool(content)
+        blob_name = self.blob_name(digest, name)
+        with spooled:
+            # 업로드는 잠금 없이 먼저 하고, 행 잠금은 참조 수를 올리는 동안만 잡음
+            if not self.exists(blob_name):
+                self._upload(blob_name, spooled)
+            else:
+                logging.info(f"Reusing stored blob {blob_name} for {name}")
+            with transaction.atomic():
+                blob, created = StoredBlob.objects.select_for_update().get_or_create(
+                    name=blob_name,
+                    defaults={"sha256": digest, "size": size, "refcount": 1,
+                              "last_referenced_at": timezone.now()},
+                )
+                if not created:
+                    StoredBlob.objects.filter(pk=blob.pk).update(
+                        refcount=F("refcount") + 1, last_referenced_at=timezone.now())
+            # 참조를 올리기 전에 gc_media 가 (참조 없던) 파일을 지웠으면 다시 올림.
+            # 참조를 올린 뒤에는 gc_media 가 지우지 않음
+            if not self.exists(blob_name):
+                self._upload(blob_name, spooled)
+        return blob_name
+
+    def _upload(self, blob_name, spooled):
+        spooled.seek(0)
+        # get_available_name 을 거치지 않고 해시 이름 그대로 저장
+        stored = self._save(blob_name, File(spooled, blob_name))
+        if stored != blob_name:
+            # 다른 요청이 같은 내용을 방금 올림 → 중복본은 버림
+            super().delete(stored)
+
+    def retain(self, name):
+        """
+        이미 저장된 blob 을 다른 필드가 가리키게 될 때 참조 수를 올립니다.
+        그사이 gc_media 가 blob 을 지웠으면 False
+        """
+        from .models import StoredBlob
+
+        return bool(StoredBlob.objects.filter(name=name).update(
+            refcount=F("refcount") + 1, last_referenced_at=timezone.now()))
+
+    def delete(self, name):
+        """blob 이면 참조 수만 내리고(파일은 gc_media 가 정리), 아니면 바로 지웁니다."""
+        from .models import StoredBlob
+
+        if not self.is_blob(name):
+            return super().delete(name)
+        StoredBlob.objects.filter(name=name, refcount__gt=0).update(
+            refcount=F("refcount") - 1, last_referenced_at=timezone.now())
+
+    def purge(self, name):
+        """참조 수와 상관없이 실제 파일을 지웁니다. (gc_media 전용)"""
+        super().delete(name)
+
+
+class ContentAddressedFileSystemStorage(ContentAddressedMixin, FileSystemStorage):
+    pass
@@ -0,0 +1,127 @@
+"""
+시놉시스(Book) 일괄 생성
+
+프롬프트 N개를 ``settings.BULK_SYNOPSIS["CONCURRENCY"]`` 개씩(프로세스 전체로는
+``GLOBAL_CONCURRENCY`` 개까지) 동시에 생성하고,
+끝난 결과를 ``BATCH_SIZE`` 개씩 모아 ``bulk_create`` 로 저장하면서 항목별 결과를 내보냅니다.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from . import elements_cache, executors, translation_router
+from .models import Book, Tag
+from .serializers import BookSerializer
+
+
+DEFAULT_BULK = {
+    "MAX_PROMPTS": 50,
+    "CONCURRENCY": 4,
+    "BATCH_SIZE": 10,
+    # 프로세스 안의 모든 일괄 요청을 합친 동시 생성 수 (CONCURRENCY 는 요청 하나 기준)
+    "GLOBAL_CONCURRENCY": 8,
+}
+
+
+def bulk_settings():
+    return {**DEFAULT_BULK, **getattr(settings, "BULK_SYNOPSIS", {})}
+
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def _global_slots():
+    global _slots
+    if _slots is None:
+        with _slots_lock:
+            if _slots is None:
+                _slots = threading.BoundedSemaphore(bulk_settings()["GLOBAL_CONCURRENCY"])
+    return _slots
+
+
+def _generate(prompt, language):
+    # 일괄 요청이 여러 개 동시에 들어와도 생성 호출 수는 GLOBAL_CONCURRENCY 를 넘지 않음
+    with _global_slots():
+        content = elements_cache.get_elements(prompt, language)
+        translated = translation_router.translate(content, language)
+    return content, translated
+
+
+def _insert(books, tags):
+    with transaction.atomic():
+        Book.objects.bulk_create(books)
+        if tags:
+            Book.tags.through.objects.bulk_create([
+                Book.tags.through(book_id=book.id, tag_id=tag.id)
+                for book in books for tag in tags
+            ])
+
+
+def _save(batch, user, tags):
+    """생성 결과를 검증한 뒤 한 번에 저장하고 (index, book 또는 오류, translated) 목록을 돌려줍니다."""
+    books, rows = [], []
+    for index, content, translated in batch:
+        # 태그는 아래에서 through 테이블로 한 번에 연결하므로 검증에는 빈 목록을 넘김
+        # (tags 필드는 쓰기를 지원하지 않지만 필수로 검사됨)
+        serializer = BookSerializer(data={**content, "tags": [], "user_id": user.pk})
+        if not serializer.is_valid():
+            rows.append((index, serializer.errors, translated))
+            continue
+        data = dict(serializer.validated_data)
+        data.pop("tags", None)
+        book = Book(**data)
+        books.append(book)
+        rows.append((index, book, translated))
+
+    try:
+        _insert(books, tags)
+    except DatabaseError as e:
+        # 한 행 때문에 배치 전체를 잃지 않도록 한 권씩 다시 저장
+        logging.error(f"Bulk insert of {len(books)} synopses failed, saving one by one: {e}")
+        failed = set()
+        for book in books:
+            book.pk = None
+            book._state.adding = True
+            try:
+                _insert([book], tags)
+            except DatabaseError as e:
+                logging.error(f"Error saving synopsis {book.title!r} in bulk: {e}")
+                failed.add(id(book))
+        rows = [
+            (index, "Failed to save synopsis." if id(book) in failed else book, translated)
+            for index, book, translated in rows
+        ]
+    return rows
+
+
+def generate_synopses(prompts, language, user, tag_names=()):
+    """항목이 끝나는 대로 {"index", "status", ...} 딕셔너리를 내보내는 제너레이터"""
+    config = bulk_settings()
+    tags = [Tag.objects.get_or_create(name=name)[0] for name in tag_names]
+    batch = []
+
+    def flush():
+        for index, book, translated in _save(batch, user, tags):
+            if isinstance(book, Book):
+                yield {"index": index, "status": "created", "book_id": book.id, "content": translated}
+            else:
+                yield {"index": index, "status": "failed", "error": book}
+        batch.clear()
+
+    items = list(enumerate(prompts))
+    for (index, prompt), result, error in executors.map_unordered(
+            lambda item: _generate(item[1], language), items, config["CONCURRENCY"]):
+        if error is not None:
+            logging.error(f"Error creating synopsis #{index} in bulk: {error}")
+            yield {"index": index, "status": "failed", "error": "Failed to create synopsis."}
+            continue
+        content, translated = result
+        batch.append((index, content, translated))
+        if len(batch) >= config["BATCH_SIZE"]:
+            yield from flush()
+
+    if batch:
+        yield from flush()
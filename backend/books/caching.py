@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    스레드 안전한 크기 제한 LRU 캐시
+
+    ``ttl`` (초)을 주면 만료된 항목은 조회 시 버립니다.
+    hit/miss 횟수를 세어 캐시 효율을 확인할 수 있습니다.
+    """
+
+    _missing = object()
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, self._missing)
+            if entry is not self._missing:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def update(self, key, func, ttl=None):
+        """
+        현재 값(없거나 만료됐으면 None)을 ``func`` 로 바꿔 저장하고 새 값을 돌려줍니다.
+        읽기-수정-쓰기가 잠금 안에서 한 번에 일어나므로 동시에 갱신해도 값을 잃지 않습니다.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._data.get(key, self._missing)
+            current = None
+            if entry is not self._missing:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    current = value
+            value = func(current)
+            self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
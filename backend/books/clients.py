@@ -0,0 +1,188 @@
+"""
+AI 제공자(OpenAI) 클라이언트를 프로세스 단위로 재사용하기 위한 레지스트리
+
+생성기 함수가 호출될 때마다 ``ChatOpenAI`` 를 새로 만들면 HTTP 클라이언트와
+TLS 핸드셰이크도 매번 새로 생깁니다. 여기서는 (model, temperature, 옵션) 조합마다
+클라이언트를 한 번만 만들고, ``settings.LLM_HTTP_POOL`` 로 설정한 keep-alive
+커넥션 풀을 모든 클라이언트가 공유합니다.
+
+생성된 이미지 다운로드도 ``settings.IMAGE_DOWNLOAD`` 로 설정한 커넥션 풀을 가진
+``requests.Session`` 하나를 공유합니다. (``books.downloads``)
+
+``settings.AI_PROVIDER_BACKEND`` 가 "fake" 면 실제 API 대신 ``books.fake_providers`` 의
+가짜 LLM/DeepL/이미지 provider 를 돌려줍니다. (부하 테스트용)
+"""
+import os
+import threading
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from config import secret
+
+# langchain_openai, openai, deepl 은 import 비용이 커서 클라이언트를 처음 만들 때 import 합니다.
+
+
+DEFAULT_POOL = {
+    "MAX_CONNECTIONS": 20,
+    "MAX_KEEPALIVE_CONNECTIONS": 10,
+    "KEEPALIVE_EXPIRY": 60.0,
+    "CONNECT_TIMEOUT": 5.0,
+    "READ_TIMEOUT": 60.0,
+    # 재시도는 books.resilience 가 담당하므로 SDK 자체 재시도는 끔
+    "MAX_RETRIES": 0,
+}
+
+DEFAULT_DOWNLOAD = {
+    "POOL_SIZE": 10,
+    "CONNECT_TIMEOUT": 5.0,
+    "READ_TIMEOUT": 30.0,
+    "MAX_BYTES": 10 * 1024 * 1024,
+    "CHUNK_SIZE": 64 * 1024,
+}
+
+_lock = threading.Lock()
+_http_client = None
+_download_session = None
+_chat_models = {}
+_openai_clients = {}
+_deepl_translator = None
+
+
+def provider_backend():
+    return getattr(settings, "AI_PROVIDER_BACKEND", "openai")
+
+
+def pool_settings():
+    return {**DEFAULT_POOL, **getattr(settings, "LLM_HTTP_POOL", {})}
+
+
+def get_http_client():
+    """모든 OpenAI 호출이 공유하는 keep-alive httpx 클라이언트"""
+    global _http_client
+    if _http_client is None:
+        with _lock:
+            if _http_client is None:
+                pool = pool_settings()
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=pool["MAX_CONNECTIONS"],
+                        max_keepalive_connections=pool["MAX_KEEPALIVE_CONNECTIONS"],
+                        keepalive_expiry=pool["KEEPALIVE_EXPIRY"],
+                    ),
+                    timeout=httpx.Timeout(
+                        pool["READ_TIMEOUT"], connect=pool["CONNECT_TIMEOUT"]
+                    ),
+                )
+    return _http_client
+
+
+def download_settings():
+    return {**DEFAULT_DOWNLOAD, **getattr(settings, "IMAGE_DOWNLOAD", {})}
+
+
+def get_download_session():
+    """생성된 이미지 다운로드가 공유하는 keep-alive requests 세션"""
+    global _download_session
+    if _download_session is None:
+        with _lock:
+            if _download_session is None:
+                config = download_settings()
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=config["POOL_SIZE"],
+                    pool_maxsize=config["POOL_SIZE"],
+                    max_retries=0,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _download_session = session
+    return _download_session
+
+
+def _base_url(base_url):
+    return base_url or getattr(settings, "OPENAI_BASE_URL", None)
+
+
+def get_chat_model(model="gpt-4o-mini", temperature=0.7, base_url=None, **options):
+    """
+    (model, temperature, 옵션) 별로 설정된 ChatOpenAI 인스턴스를 반환합니다.
+    같은 키로 다시 요청하면 기존 인스턴스(와 커넥션 풀)를 그대로 재사용합니다.
+    """
+    base_url = _base_url(base_url)
+    key = (model, temperature, base_url, tuple(sorted(options.items())))
+    llm = _chat_models.get(key)
+    if llm is None:
+        with _lock:
+            llm = _chat_models.get(key)
+            if llm is None and provider_backend() == "fake":
+                from .fake_providers import FakeChatModel
+                llm = _chat_models[key] = FakeChatModel(model_name=model, temperature=temperature)
+            if llm is None:
+                from langchain_openai import ChatOpenAI
+                pool = pool_settings()
+                llm = ChatOpenAI(
+                    model=model,
+                    api_key=secret.OPENAI_API_KEY,
+                    temperature=temperature,
+                    base_url=base_url,
+                    timeout=pool["READ_TIMEOUT"],
+                    max_retries=pool["MAX_RETRIES"],
+                    http_client=get_http_client(),
+                    **options,
+                )
+                _chat_models[key] = llm
+    return llm
+
+
+def get_openai_client(base_url=None):
+    """이미지 생성 등 OpenAI SDK를 직접 쓰는 호출용 공유 클라이언트"""
+    base_url = _base_url(base_url)
+    client = _openai_clients.get(base_url)
+    if client is None:
+        with _lock:
+            client = _openai_clients.get(base_url)
+            if client is None and provider_backend() == "fake":
+                from .fake_providers import FakeOpenAIClient
+                client = _openai_clients[base_url] = FakeOpenAIClient()
+            if client is None:
+                from openai import OpenAI
+                client = OpenAI(
+                    api_key=secret.OPENAI_API_KEY,
+                    base_url=base_url,
+                    max_retries=pool_settings()["MAX_RETRIES"],
+                    http_client=get_http_client(),
+                )
+                _openai_clients[base_url] = client
+    return client
+
+
+def get_deepl_translator():
+    global _deepl_translator
+    if _deepl_translator is None:
+        with _lock:
+            if _deepl_translator is None:
+                if provider_backend() == "fake":
+                    from .fake_providers import FakeTranslator
+                    _deepl_translator = FakeTranslator()
+                else:
+                    import deepl
+                    _deepl_translator = deepl.Translator(settings.DEEPL_API_KEY)
+    return _deepl_translator
+
+
+def reset_clients():
+    """등록된 클라이언트를 모두 버립니다. (fork 이후, 설정 변경 시)"""
+    global _http_client, _download_session, _lock, _deepl_translator
+    _lock = threading.Lock()
+    _chat_models.clear()
+    _openai_clients.clear()
+    _deepl_translator = None
+    # 부모 프로세스의 소켓을 자식이 공유하면 안 되므로 닫지 않고 참조만 버립니다.
+    _http_client = None
+    _download_session = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_clients)
@@ -1,17 +1,67 @@
-import deepl
-from django.conf import settings
+from . import language as language_detection
+from . import resilience, translation_cache
+from .clients import get_deepl_translator
+
+
+# DeepL 은 요청 한 번에 최대 50개 텍스트를 받음
+BULK_SIZE = 50
+
+# DeepL 은 대상 언어로 "EN", "PT" 대신 지역 코드를 요구함
+TARGET_CODES = {
+    "en": "EN-US",
+    "pt": "PT-BR",
+}
+
+
+def target_code(language):
+    code = language_detection.normalize_language(language)
+    if language.strip().lower() in language_detection.LANGUAGE_NAMES or "-" not in language:
+        return TARGET_CODES.get(code, code.upper())
+    return language.strip().upper()
+
+
+def translate_many(texts, language):
+    """
+    {key: text} 를 DeepL 벌크 요청(최대 ``BULK_SIZE`` 개씩)으로 번역합니다.
+    캐시에 있거나 이미 대상 언어인 텍스트는 요청에서 뺍니다. provider 오류는 그대로 올립니다.
+    """
+    translated = {}
+    misses = {}
+    for key, text in texts.items():
+        if not language_detection.should_translate(text, language, "deepl"):
+            translated[key] = text
+            continue
+        cached = translation_cache.get(text, language, "deepl")
+        if cached is not None:
+            translated[key] = cached
+        else:
+            misses[key] = text
+
+    if misses:
+        translator = get_deepl_translator()
+        target = target_code(language)
+        keys = list(misses)
+        for start in range(0, len(keys), BULK_SIZE):
+            chunk = keys[start:start + BULK_SIZE]
+            results = resilience.call(
+                "deepl",
+                # deepl SDK 는 호출별 timeout 을 받지 않아 Translator 의 네트워크 타임아웃을 따름
+                lambda timeout: translator.translate_text(
+                    [misses[key] for key in chunk], target_lang=target),
+                stage="translation",
+            )
+            for key, result in zip(chunk, results):
+                translation_cache.put(misses[key], language, "deepl", result.text)
+                translated[key] = result.text
+    return translated
+
 
 # 요약 내용을 지정된 언어로 번역
 def translate_summary(content, language):
-    auth_key = settings.DEEPL_API_KEY
-    translator = deepl.Translator(auth_key)
-
-    if isinstance(content, dict):  # content가 dict 형태일 때, 각 값을 번역
-        translated_data = {}
-        for key, value in content.items():
-            result = translator.translate_text(value, target_lang=language)
-            translated_data[key] = result.text
-        return translated_data
+    if isinstance(content, dict):  # content가 dict 형태일 때, 모든 값을 한 번의 벌크 요청으로 번역
+        texts = {key: value for key, value in content.items()
+                 if isinstance(value, str) and value.strip()}
+        translated = translate_many(texts, language)
+        return {key: translated.get(key, value) for key, value in content.items()}
     elif isinstance(content, str):  # content가 문자열일 때, 직접 번역
-        result = translator.translate_text(content, target_lang=language)
-        return result.text
\ No newline at end of file
+        return translate_many({"text": content}, language)["text"]
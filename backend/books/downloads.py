@@ -0,0 +1,115 @@
+"""
+생성된 이미지를 메모리에 전부 올리지 않고 스토리지로 흘려보내는 다운로드
+
+``open_image(url)`` 는 공유 세션(``clients.get_download_session``)으로 응답을 스트리밍하는
+Django ``File`` 을 돌려줍니다. ``FieldFile.save`` 에 그대로 넘기면
+파일시스템 스토리지는 ``chunks()`` 로, S3 ``MediaStorage`` 는 ``upload_fileobj`` 로
+``CHUNK_SIZE`` 단위씩 읽어 가므로 한 번에 청크 몇 개만 메모리에 올라갑니다.
+응답이 ``MAX_BYTES`` 를 넘으면 읽는 도중에 ``ImageTooLarge`` 로 중단합니다.
+"""
+import io
+import time
+
+from django.core.files.base import ContentFile, File
+
+from .clients import download_settings, get_download_session
+
+
+class ImageDownloadError(Exception):
+    """받아온 응답이 이미지가 아닐 때"""
+    status_code = 422
+
+
+class ImageTooLarge(ImageDownloadError):
+    """이미지가 MAX_BYTES 보다 클 때"""
+    status_code = 413
+
+
+class _ResponseStream(io.RawIOBase):
+    """requests 응답 본문을 읽기 전용 파일처럼 읽는 스트림 (seek 불가)"""
+
+    def __init__(self, response, max_bytes, chunk_size, deadline=None):
+        self._response = response
+        self._chunks = response.iter_content(chunk_size)
+        self._pending = b""
+        self._max_bytes = max_bytes
+        self._deadline = deadline
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            # 읽기 타임아웃은 청크 사이 간격만 보므로 전체 다운로드 시간은 따로 제한
+            if self._deadline is not None and time.monotonic() > self._deadline:
+                raise TimeoutError("Image download exceeded its deadline")
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self.bytes_read += len(chunk)
+            if self.bytes_read > self._max_bytes:
+                raise ImageTooLarge(f"Image exceeds {self._max_bytes} bytes")
+            self._pending = chunk
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        self._response.close()
+        super().close()
+
+
+class StreamedImage(File):
+    """스트리밍 응답을 감싼 File. 크기는 Content-Length 로만 알 수 있습니다."""
+
+    def __init__(self, response, name, max_bytes, chunk_size, deadline=None):
+        self._stream = _ResponseStream(response, max_bytes, chunk_size, deadline)
+        # S3 업로드는 read(n) 이 n 바이트를 채워 주길 기대하므로 버퍼를 씌움
+        super().__init__(io.BufferedReader(self._stream, chunk_size), name)
+        self.content_type = response.headers.get("Content-Type")
+        length = response.headers.get("Content-Length", "")
+        self._length = int(length) if length.isdigit() else None
+
+    @property
+    def size(self):
+        return self._length
+
+    @property
+    def bytes_read(self):
+        return self._stream.bytes_read
+
+
+def open_image(url, name, timeout=None):
+    """
+    이미지 URL 을 스트리밍하는 File 을 엽니다. 다 쓰고 나면 close() 해야 커넥션이 풀로 돌아갑니다.
+    ``timeout`` 을 주면 연결부터 마지막 청크까지 전체 시간을 그 안으로 제한합니다.
+    """
+    if url.startswith("fake://"):
+        from .fake_providers import fake_image_bytes
+        return ContentFile(fake_image_bytes(url), name=name)
+
+    config = download_settings()
+    read_timeout = config["READ_TIMEOUT"]
+    deadline = None
+    if timeout is not None:
+        read_timeout = min(read_timeout, timeout)
+        deadline = time.monotonic() + timeout
+    response = get_download_session().get(
+        url,
+        stream=True,
+        timeout=(min(config["CONNECT_TIMEOUT"], read_timeout), read_timeout),
+    )
+    try:
+        response.raise_for_status()
+        content_type = response.headers.get("Content-Type", "")
+        if not content_type.startswith("image/"):
+            raise ImageDownloadError(f"Unexpected content type: {content_type or 'none'}")
+        length = response.headers.get("Content-Length", "")
+        if length.isdigit() and int(length) > config["MAX_BYTES"]:
+            raise ImageTooLarge(f"Image exceeds {config['MAX_BYTES']} bytes ({length})")
+    except Exception:
+        response.close()
+        raise
+    return StreamedImage(response, name, config["MAX_BYTES"], config["CHUNK_SIZE"], deadline)
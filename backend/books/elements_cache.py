@@ -0,0 +1,125 @@
+"""
+시놉시스(elements) 생성 결과 캐시 (opt-in)
+
+"중세 판타지 소설" 처럼 반복되는 프롬프트는 정규화한 프롬프트, 언어,
+프롬프트 템플릿 버전을 키로 이전 생성 결과를 재사용합니다.
+키마다 최대 ``VARIANTS`` 개의 결과를 모아 두고, 다 모인 뒤에는 그중 하나를
+무작위로 돌려주어 같은 프롬프트라도 결과가 한 가지로 굳지 않게 합니다.
+"""
+import copy
+import hashlib
+import json
+import random
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+
+from .caching import LRUCache
+from .lazy import lazy_module
+
+
+elements_generator = lazy_module("books.generators.elements_generator")
+
+
+DEFAULT_CACHE = {
+    "ENABLED": False,
+    "MAX_ENTRIES": 512,
+    "TTL": 60 * 60 * 24,
+    "VARIANTS": 3,
+}
+
+_memory = LRUCache(maxsize=DEFAULT_CACHE["MAX_ENTRIES"], ttl=DEFAULT_CACHE["TTL"])
+
+stats = {
+    "hits": 0,
+    "misses": 0,
+    "bypassed": 0,
+}
+# 일괄 생성(books.bulk)이 여러 스레드에서 get_elements 를 부르므로 잠금으로 묶음
+_stats_lock = threading.Lock()
+
+
+def _count(stat):
+    with _stats_lock:
+        stats[stat] += 1
+
+
+_template_version = None
+
+
+def cache_settings():
+    return {**DEFAULT_CACHE, **getattr(settings, "ELEMENTS_CACHE", {})}
+
+
+def _get_memory(config):
+    # 설정을 호출할 때마다 읽으므로 크기/TTL 을 바꾸면 다음 저장부터 적용됨
+    _memory.maxsize = config["MAX_ENTRIES"]
+    _memory.ttl = config["TTL"]
+    return _memory
+
+
+def template_version():
+    """예시나 시스템 프롬프트가 바뀌면 이전 캐시를 쓰지 않도록 템플릿 내용으로 버전을 만듭니다."""
+    global _template_version
+    if _template_version is not None:
+        return _template_version
+    raw = json.dumps(
+        [elements_generator.ELEMENTS_SYSTEM, elements_generator.EXAMPLES],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    _template_version = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+    return _template_version
+
+
+def normalize(prompt):
+    prompt = unicodedata.normalize("NFC", prompt).casefold()
+    prompt = re.sub(r"[\s\"'`]+", " ", prompt)
+    return prompt.strip(" .!?。")
+
+
+def make_key(prompt, language):
+    language = elements_generator.language_key(language or "")
+    raw = f"{template_version()}\x00{language}\x00{normalize(prompt)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get_elements(user_prompt, language):
+    """캐시된 결과가 있으면 그중 하나를, 없으면 generate_elements 결과를 반환합니다."""
+    config = cache_settings()
+    if not config["ENABLED"]:
+        _count("bypassed")
+        return elements_generator.generate_elements(user_prompt, language)
+
+    memory = _get_memory(config)
+    key = make_key(user_prompt, language)
+    variants = memory.get(key) or ()
+    if len(variants) >= config["VARIANTS"]:
+        _count("hits")
+        # 호출한 쪽에서 user_id, tags 등을 덧붙이므로 복사본을 돌려줌
+        return copy.deepcopy(random.choice(variants))
+
+    _count("misses")
+    elements = elements_generator.generate_elements(user_prompt, language)
+    if elements.get("title"):
+        stored = copy.deepcopy(elements)
+
+        def add_variant(current):
+            # 그사이 다른 스레드가 넣은 결과를 덮어쓰지 않도록 지금 값에 덧붙임
+            current = current or ()
+            return current if len(current) >= config["VARIANTS"] else current + (stored,)
+
+        memory.update(key, add_variant)
+    return elements
+
+
+def clear():
+    _memory.clear()
+
+
+def snapshot():
+    with _stats_lock:
+        counts = dict(stats)
+    return {**counts, "enabled": cache_settings()["ENABLED"], "memory": _memory.stats()}
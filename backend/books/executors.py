@@ -0,0 +1,81 @@
+"""
+생성 단계 안에서 서로 독립적인 provider 호출을 동시에 실행하기 위한 공유 스레드 풀
+
+풀 크기는 ``settings.GENERATION_FANOUT_WORKERS`` 로 제한합니다.
+동기 모드의 백그라운드 작업(이미지, 프롤로그 초안 등)은 ``submit_background`` 로
+``settings.GENERATION_BACKGROUND_WORKERS`` 크기의 별도 풀에서 실행합니다.
+fan-out 풀을 기다리는 번역/추천 호출이 15~30초 걸리는 이미지 작업 뒤에 밀리지 않도록 하기 위함입니다.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+# 풀 이름: (크기 설정 이름, 기본 크기)
+POOLS = {
+    "fanout": ("GENERATION_FANOUT_WORKERS", 8),
+    "background": ("GENERATION_BACKGROUND_WORKERS", 2),
+}
+
+_lock = threading.Lock()
+_executors = {}
+
+
+def get_executor(pool="fanout"):
+    executor = _executors.get(pool)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(pool)
+            if executor is None:
+                setting, default = POOLS[pool]
+                executor = _executors[pool] = ThreadPoolExecutor(
+                    max_workers=getattr(settings, setting, default),
+                    thread_name_prefix=f"generation-{pool}",
+                )
+    return executor
+
+
+def _call(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # 풀 스레드가 만든 DB 커넥션도 CONN_MAX_AGE 에 맞춰 정리
+        close_old_connections()
+
+
+def submit(func, *args, **kwargs):
+    return get_executor().submit(_call, func, args, kwargs)
+
+
+def submit_background(func, *args, **kwargs):
+    return get_executor("background").submit(_call, func, args, kwargs)
+
+
+def map_unordered(func, items, max_workers):
+    """
+    ``func(item)`` 을 최대 ``max_workers`` 개씩 동시에 실행하고, 끝나는 순서대로
+    (item, result, error) 를 내보냅니다. 공유 풀과 별개인 요청 전용 풀을 씁니다.
+    """
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation-bulk")
+    try:
+        futures = {pool.submit(_call, func, (item,), {}): item for item in items}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], (None if error else future.result()), error
+    finally:
+        # 클라이언트가 중간에 끊으면 아직 시작하지 않은 작업은 취소
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _reset_after_fork():
+    global _lock
+    # 부모의 스레드는 자식 프로세스로 복제되지 않으므로 풀을 새로 만듭니다.
+    _lock = threading.Lock()
+    _executors.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
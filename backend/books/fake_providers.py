@@ -0,0 +1,224 @@
+"""
+비용 없이 부하 테스트를 하기 위한 가짜 provider (LLM, DeepL, 이미지)
+
+``settings.AI_PROVIDER_BACKEND = "fake"`` 이면 ``books.clients`` 가 실제 클라이언트 대신
+여기 있는 객체를 돌려줍니다. 응답은 프롬프트 해시로 결정되므로 같은 입력에는 항상
+같은 결과가 나오고, 지연 시간/토큰 스트리밍 속도/실패율은 ``settings.FAKE_PROVIDER`` 로 조절합니다.
+"""
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Iterator, List, Optional
+
+from django.conf import settings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+DEFAULT_FAKE = {
+    "LATENCY": 0.2,
+    "TOKEN_DELAY": 0.01,
+    "FAILURE_RATE": 0.0,
+    "IMAGE_LATENCY": 1.0,
+    "SEED": 0,
+}
+
+WORDS = (
+    "the knight walked through the silent forest while the storm gathered over "
+    "the castle and a letter from the queen revealed a secret that changed "
+    "everything she believed about her family and the war to come"
+).split()
+
+_rng_lock = threading.Lock()
+_rng = None
+
+
+def fake_settings():
+    return {**DEFAULT_FAKE, **getattr(settings, "FAKE_PROVIDER", {})}
+
+
+class FakeProviderError(Exception):
+    """설정한 실패율에 따라 발생하는 provider 오류 (재시도 대상인 503)"""
+
+    status_code = 503
+
+
+def _maybe_fail(provider):
+    global _rng
+    config = fake_settings()
+    if not config["FAILURE_RATE"]:
+        return
+    with _rng_lock:
+        if _rng is None:
+            _rng = random.Random(config["SEED"])
+        failed = _rng.random() < config["FAILURE_RATE"]
+    if failed:
+        raise FakeProviderError(f"Simulated {provider} failure")
+
+
+def _seed(text):
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _sentence(rng, length):
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+
+def fake_reply(prompt):
+    """프롬프트 종류에 맞춰 생성기가 파싱할 수 있는 형식의 응답을 만듭니다."""
+    rng = random.Random(_seed(prompt))
+
+    match = re.search(r"following JSON object to .*?\n(\{.*\})\s*$", prompt, re.DOTALL)
+    if match:
+        # 배치 번역: 같은 키의 JSON 을 그대로 돌려줌
+        return match.group(1)
+    if "expert in novel settings" in prompt:
+        return "\n".join([
+            f"Title: {_sentence(rng, 3)[:-1]}",
+            "Genre: Fantasy",
+            "Theme: Courage and Redemption",
+            "Tone: Tense and Hopeful",
+            f"Setting: {_sentence(rng, 20)}",
+            "Characters:",
+            f"Aria: {_sentence(rng, 8)}",
+            f"Ronan: {_sentence(rng, 8)}",
+        ])
+    if "recommendations" in prompt:
+        return "\n".join(
+            f"Title: {_sentence(rng, 4)[:-1]}\nDescription: {_sentence(rng, 16)}"
+            for _ in range(3)
+        )
+    match = re.search(r"Translate the following text to [^:]+: (.*)$", prompt, re.DOTALL)
+    if match:
+        return match.group(1).strip()
+    return " ".join(_sentence(rng, rng.randint(8, 16)) for _ in range(12))
+
+
+def fake_tool_args(tool, prompt):
+    """function calling(with_structured_output) 요청에 대한 tool 인자"""
+    rng = random.Random(_seed(prompt))
+    properties = tool["function"].get("parameters", {}).get("properties", {})
+    if "recommendations" in properties:
+        return {"recommendations": [
+            {"Title": _sentence(rng, 4)[:-1], "Description": _sentence(rng, 16)}
+            for _ in range(3)
+        ]}
+    return {}
+
+
+def _render(messages):
+    return "\n".join(f"{message.type}: {message.content}" for message in messages)
+
+
+class FakeChatModel(BaseChatModel):
+    """ChatOpenAI 대신 쓰는 결정적인 가짜 채팅 모델 (invoke/stream/bind/bind_tools 지원)"""
+
+    model_name: str = "fake-gpt"
+    temperature: float = 0.7
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _usage(self, prompt, reply):
+        return {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(reply.split()),
+        }
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        config = fake_settings()
+        prompt = _render(messages)
+        time.sleep(config["LATENCY"])
+        _maybe_fail("llm")
+        tools = kwargs.get("tools")
+        if tools:
+            args = fake_tool_args(tools[0], prompt)
+            reply = json.dumps(args)
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": tools[0]["function"]["name"], "args": args, "id": f"call_{_seed(prompt):08x}"}],
+            )
+        else:
+            reply = fake_reply(prompt)
+            message = AIMessage(content=reply)
+        time.sleep(config["TOKEN_DELAY"] * len(reply.split()))
+        message.response_metadata = {
+            "token_usage": self._usage(prompt, reply), "model_name": self.model_name}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        config = fake_settings()
+        time.sleep(config["LATENCY"])
+        _maybe_fail("llm")
+        for token in re.findall(r"\S+\s*", fake_reply(_render(messages))):
+            time.sleep(config["TOKEN_DELAY"])
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class FakeImages:
+    def generate(self, model=None, prompt="", size="1024x1024", quality=None, n=1, **kwargs):
+        time.sleep(fake_settings()["IMAGE_LATENCY"])
+        _maybe_fail("images")
+        data = [
+            SimpleNamespace(url=f"fake://images/{_seed(f'{prompt}:{i}'):08x}/{size}.png", revised_prompt=prompt)
+            for i in range(n)
+        ]
+        return SimpleNamespace(data=data)
+
+
+class FakeOpenAIClient:
+    """OpenAI SDK 중 이미지 생성만 흉내 냅니다."""
+
+    def __init__(self):
+        self.images = FakeImages()
+
+
+def fake_image_bytes(url):
+    """fake:// 이미지 URL 에 해당하는 PNG 바이트 (URL 해시로 색을 정함)"""
+    from PIL import Image
+
+    match = re.search(r"/(\d+)x(\d+)\.png$", url)
+    width, height = (int(match.group(1)), int(match.group(2))) if match else (1024, 1024)
+    seed = _seed(url)
+    color = (seed & 0xFF, (seed >> 8) & 0xFF, (seed >> 16) & 0xFF)
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeTranslator:
+    """deepl.Translator 와 같은 모양의 가짜 번역기 (원문을 그대로 돌려줌)"""
+
+    def translate_text(self, text, target_lang=None, **kwargs):
+        config = fake_settings()
+        texts = text if isinstance(text, (list, tuple)) else [text]
+        time.sleep(config["LATENCY"] / 2)
+        _maybe_fail("deepl")
+        results = [SimpleNamespace(text=item, detected_source_lang="EN") for item in texts]
+        return results if isinstance(text, (list, tuple)) else results[0]
@@ -1,24 +1,22 @@
-from langchain_openai import ChatOpenAI
-from config import secret
+import json
 import logging
+from .. import language as language_detection
+from .. import resilience, translation_cache
+from ..clients import get_chat_model
+from .prompt_budget import record_usage
 
 
-def translate_text(content, language):
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        api_key=secret.OPENAI_API_KEY,
-        temperature=0.7,
-    )
+def translate_text(content, language, batch=True):
+    llm = get_chat_model(model="gpt-4o-mini", temperature=0.7)
 
     # Prepare the prompt for translation
     def prepare_input_text(text):
-        if language.lower() == "korean":
-            return text
-        else:
-            return f"Translate the following text to {language}: {text}"
+        return f"Translate the following text to {language}: {text}"
 
     # Handle dictionary inputs
     if isinstance(content, dict):
+        if batch:
+            return translate_batch(content, language)
         translated_content = {}
         for key, value in content.items():
             if isinstance(value, str):
@@ -27,32 +25,131 @@ def translate_text(content, language):
                 translated_content[key] = str(value)
         return translated_content
 
+    # Handle list inputs (추천 제목/설명 목록 등)
+    elif isinstance(content, list):
+        if batch:
+            return translate_batch(content, language)
+        return [translate_text(item, language) for item in content]
+
     # Handle string inputs
     elif isinstance(content, str):
+        if language.lower() == "korean":
+            return content
+        # 이미 대상 언어로 쓰인 텍스트는 번역하지 않음
+        if not language_detection.should_translate(content, language, "llm"):
+            return content
+
+        cached = translation_cache.get(content, language, "llm")
+        if cached is not None:
+            return cached
+
         translation_prompt = prepare_input_text(content)
 
         try:
-            # Prepare the input for the model
-            response = llm.invoke(
-                {"messages": [{"role": "user", "content": translation_prompt}]}
-            )
-
-            # Ensure the response is a list and has the expected structure
-            if isinstance(response, list) and len(response) > 0 and hasattr(response[0], 'content'):
-                translated_text = response[0].content.strip()
+            response = resilience.call(
+                "openai", lambda timeout: llm.invoke(translation_prompt, timeout=timeout),
+                stage="translation")
+            record_usage("translation", translation_prompt, response)
+
+            if hasattr(response, "content"):
+                translated_text = response.content.strip()
             else:
-                logging.warning(f"AI model did not return a valid response for input: {
-                                translation_prompt}")
+                logging.warning(
+                    f"AI model did not return a valid response for input: {translation_prompt}")
                 return content
 
+            translation_cache.put(content, language, "llm", translated_text)
             return translated_text if translated_text else content
 
         except Exception as e:
-            logging.error(f"Error during translation for input: '{
-                          content}'. Error: {e}")
+            logging.error(
+                f"Error during translation for input: '{content}'. Error: {e}")
             return content
 
     else:
-        logging.error(f"Invalid input type for translation: {
-                      type(content)}. Input data: {content}")
+        logging.error(
+            f"Invalid input type for translation: {type(content)}. Input data: {content}")
         return str(content)
+
+
+def translate_batch(content, language, raise_errors=False):
+    """
+    dict 의 문자열 필드 전체 또는 문자열 list 를 한 번의 구조화된(JSON) 요청으로 번역합니다.
+    응답이 깨졌거나 키가 맞지 않으면 필드별 번역으로 되돌아갑니다.
+    ``raise_errors`` 면 provider 오류 시 원문을 두지 않고 예외를 올립니다. (translation_router 의 failover 용)
+    """
+    is_list = isinstance(content, list)
+    items = dict(enumerate(content)) if is_list else content
+    texts = {str(key): value for key, value in items.items()
+             if isinstance(value, str) and value.strip()}
+    if language.lower() == "korean":
+        texts = {}
+    texts = {key: value for key, value in texts.items()
+             if language_detection.should_translate(value, language, "llm")}
+
+    translated = {}
+    misses = {}
+    for key, value in texts.items():
+        cached = translation_cache.get(value, language, "llm")
+        if cached is not None:
+            translated[key] = cached
+        else:
+            misses[key] = value
+
+    if misses:
+        try:
+            batch_result = _request_batch(misses, language)
+        except Exception as e:
+            if raise_errors:
+                raise
+            # provider 장애 시 필드별로 다시 부르지 않고 원문을 그대로 둠
+            logging.error(f"Error during batch translation: {e}")
+            batch_result = {}
+        else:
+            if batch_result is None:
+                logging.warning(
+                    f"Batch translation response was malformed, falling back to per-field translation ({len(misses)} fields)")
+                batch_result = {key: translate_text(value, language)
+                                for key, value in misses.items()}
+            else:
+                for key, value in misses.items():
+                    translation_cache.put(value, language, "llm", batch_result[key])
+        translated.update(batch_result)
+
+    result = {}
+    for key, value in items.items():
+        if str(key) in translated:
+            result[key] = translated[str(key)]
+        elif isinstance(value, str):
+            result[key] = value
+        else:
+            result[key] = str(value)
+
+    if is_list:
+        return [result[index] for index in range(len(content))]
+    return result
+
+
+def _request_batch(texts, language):
+    llm = get_chat_model(model="gpt-4o-mini", temperature=0.7).bind(
+        response_format={"type": "json_object"}
+    )
+    prompt = (
+        f"Translate every value of the following JSON object to {language}. "
+        "Keep the keys unchanged and return only a JSON object with exactly the same keys.\n"
+        f"{json.dumps(texts, ensure_ascii=False)}"
+    )
+
+    response = resilience.call(
+        "openai", lambda timeout: llm.invoke(prompt, timeout=timeout), stage="translation")
+    record_usage("translation", prompt, response)
+    try:
+        data = json.loads(response.content)
+    except ValueError:
+        return None
+
+    if not isinstance(data, dict) or set(data) != set(texts):
+        return None
+    if not all(isinstance(value, str) and value.strip() for value in data.values()):
+        return None
+    return {key: value.strip() for key, value in data.items()}
@@ -1,77 +1,99 @@
 # elements_generator.py
 import logging
-from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, FewShotChatMessagePromptTemplate
-from config import secret
+from .. import resilience
+from ..clients import get_chat_model
+from .prompt_budget import PromptBuilder, budget_for, record_usage
 
 
-def generate_elements(user_prompt, language):
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        api_key=secret.OPENAI_API_KEY,
-        temperature=0.8,
-    )
+# 프롬프트 템플릿과 예시는 프로세스당 한 번만 만들어 재사용합니다. (언어별)
+EXAMPLES = {
+    "korean": (
+        {
+            "user_prompt": "중세 시대의 판타지 소설 설정을 만들어 주세요.",
+            "answer": """
+                Title: 돌의 마음
+                Genre: 중세 로맨스 판타지
+                Theme: 역경을 이겨낸 사랑, 용기, 그리고 구원
+                Tone: 가슴 아프고, 매혹적이며, 긴장감 있는
+                Setting: 엘도리아 왕국은 광활한 초원, 울창한 마법의 숲, 그리고 위엄 있는 성들이 특징인 생동감 넘치는 영역입니다. 이곳은 마법과 신화적 생명체들이 숨쉬는 세계로, 전쟁의 위기 속에서 정치적 긴장감이 도사리고 있습니다.
+                Characters:
+                레이디 이졸드 오브 쏜리지: 강한 의지를 가진 귀족 여성, 가족과 사랑 사이에서 갈등함.
+                용감한 세드릭 경: 과거의 괴로움에 시달리며 이졸드를 사랑하게 되는 기사.
+                마법사 엘라라: 주인공들을 감정적 여정으로 이끄는 신비로운 요정.
+            """,
+        },
+    ),
+    "default": (
+        {
+            "user_prompt": "Create a medieval fantasy novel setting.",
+            "answer": """
+                Title: Hearts of Stone
+                Genre: Medieval Romance Fantasy
+                Theme: Love Against the Odds, Courage, and Redemption
+                Tone: Poignant, Enchanting, and Tense
+                Setting: The Kingdom of Eldoria is a vibrant realm characterized by vast plains, dense enchanted forests, and majestic castles. It is a land ruled by a feudal system where knights uphold honor and courage, and mythical creatures such as fairies, elves, and dragons inhabit hidden corners of the world. The kingdom stands on the brink of war, with political tensions and old rivalries threatening the fragile peace.
+                Characters:
+                Lady Isolde of Thornridge: A noblewoman with a strong will, torn between duty to her family and a desire for true love.
+                Sir Cedric the Brave: A knight burdened by past sorrows, struggling with his growing feelings for Isolde.
+                Elara the Sorceress: A mystical fae who guides Isolde and Cedric on an emotional journey.
+            """,
+        },
+    ),
+}
 
-    if language.lower() == "korean":
-        examples = [
-            {
-                "user_prompt": "중세 시대의 판타지 소설 설정을 만들어 주세요.",
-                "answer": """
-                    Title: 돌의 마음
-                    Genre: 중세 로맨스 판타지
-                    Theme: 역경을 이겨낸 사랑, 용기, 그리고 구원
-                    Tone: 가슴 아프고, 매혹적이며, 긴장감 있는
-                    Setting: 엘도리아 왕국은 광활한 초원, 울창한 마법의 숲, 그리고 위엄 있는 성들이 특징인 생동감 넘치는 영역입니다. 이곳은 마법과 신화적 생명체들이 숨쉬는 세계로, 전쟁의 위기 속에서 정치적 긴장감이 도사리고 있습니다.
-                    Characters:
-                    레이디 이졸드 오브 쏜리지: 강한 의지를 가진 귀족 여성, 가족과 사랑 사이에서 갈등함.
-                    용감한 세드릭 경: 과거의 괴로움에 시달리며 이졸드를 사랑하게 되는 기사.
-                    마법사 엘라라: 주인공들을 감정적 여정으로 이끄는 신비로운 요정.
-                """,
-            }
-        ]
-    else:
-        examples = [
-            {
-                "user_prompt": "Create a medieval fantasy novel setting.",
-                "answer": """
-                    Title: Hearts of Stone
-                    Genre: Medieval Romance Fantasy
-                    Theme: Love Against the Odds, Courage, and Redemption
-                    Tone: Poignant, Enchanting, and Tense
-                    Setting: The Kingdom of Eldoria is a vibrant realm characterized by vast plains, dense enchanted forests, and majestic castles. It is a land ruled by a feudal system where knights uphold honor and courage, and mythical creatures such as fairies, elves, and dragons inhabit hidden corners of the world. The kingdom stands on the brink of war, with political tensions and old rivalries threatening the fragile peace.
-                    Characters:
-                    Lady Isolde of Thornridge: A noblewoman with a strong will, torn between duty to her family and a desire for true love.
-                    Sir Cedric the Brave: A knight burdened by past sorrows, struggling with his growing feelings for Isolde.
-                    Elara the Sorceress: A mystical fae who guides Isolde and Cedric on an emotional journey.
-                """,
-            }
-        ]
+ELEMENTS_SYSTEM = "You are an expert in novel settings. Create detailed settings for a novel based on the user's input. Follow the structure shown in the examples."
 
-    example_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("human", "{user_prompt}"),
-            ("ai", "{answer}"),
-        ]
-    )
 
+def build_prompt(examples):
     example_prompt = FewShotChatMessagePromptTemplate(
-        example_prompt=example_prompt,
-        examples=examples,
+        example_prompt=ChatPromptTemplate.from_messages(
+            [
+                ("human", "{user_prompt}"),
+                ("ai", "{answer}"),
+            ]
+        ),
+        examples=list(examples),
     )
 
-    elements_prompt = ChatPromptTemplate.from_messages(
+    return ChatPromptTemplate.from_messages(
         [
-            (
-                "system",
-                "You are an expert in novel settings. Create detailed settings for a novel based on the user's input. Follow the structure shown in the examples."
-            ),
+            ("system", ELEMENTS_SYSTEM),
             example_prompt,
             ("human", "{user_prompt}"),
         ]
     )
 
-    elements_chain = elements_prompt | llm
-    elements = elements_chain.invoke({"user_prompt": user_prompt})
+
+# 토큰 예산 때문에 예시가 뒤에서부터 빠질 수 있으므로, 남는 예시 개수별로 미리 만들어 둠
+PROMPTS = {
+    language: tuple(build_prompt(examples[:count]) for count in range(len(examples) + 1))
+    for language, examples in EXAMPLES.items()
+}
+
+
+def language_key(language):
+    return "korean" if language.lower() == "korean" else "default"
+
+
+def generate_elements(user_prompt, language):
+    llm = get_chat_model(model="gpt-4o-mini", temperature=0.8)
+    examples = EXAMPLES[language_key(language)]
+
+    # 긴 사용자 입력은 토큰 예산에 맞게 자르고, 형식을 잡아주는 예시는 최대한 남김
+    builder = PromptBuilder(budget_for("elements"))
+    builder.add("user_prompt", user_prompt, priority=50)
+    builder.add_items("examples", examples, priority=60,
+                      render=lambda example: example["user_prompt"] + example["answer"])
+    segments = builder.build()
+    user_prompt = segments["user_prompt"]
+    elements_prompt = PROMPTS[language_key(language)][len(segments["examples"])]
+
+    elements = resilience.call(
+        "openai",
+        lambda timeout: (elements_prompt | llm.bind(timeout=timeout)).invoke({"user_prompt": user_prompt}),
+        stage="elements")
+    record_usage("elements", elements_prompt.format_prompt(user_prompt=user_prompt), elements)
 
     result_text = elements.content.strip()
     logging.debug(f"Generated Elements: {result_text}")
@@ -1,68 +1,80 @@
 import logging
-from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate, FewShotChatMessagePromptTemplate
-from config import secret
+from .. import resilience
+from ..clients import get_chat_model
+from .prompt_budget import record_usage
 
 
-def generate_prologue(elements):
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        api_key=secret.OPENAI_API_KEY,
-        max_tokens=500,
-        temperature=0.9,
-    )
-
-    examples = [
-        {
-            "setting": """
-                "title": "The Royal Heart's Resolve",
-                "genre": "Medieval Romance",
-                "theme": "Love, Courage, and Resilience",
-                "tone": "Romantic, Heartwarming, and Inspirational",
-                "setting": "Kingdom of Avaloria, Medieval Europe",
-                "characters": "Princess Elara: A kind-hearted and strong-willed princess..."
-            """,
-            "answer": """
-                Prologue:
-                The grand ballroom of the Ashford Manor was ablaze with candlelight...
-            """,
-        },
-        # 추가 예시들...
-    ]
+# 프롬프트 템플릿과 예시는 프로세스당 한 번만 만들어 재사용합니다.
+EXAMPLES = (
+    {
+        "setting": """
+            "title": "The Royal Heart's Resolve",
+            "genre": "Medieval Romance",
+            "theme": "Love, Courage, and Resilience",
+            "tone": "Romantic, Heartwarming, and Inspirational",
+            "setting": "Kingdom of Avaloria, Medieval Europe",
+            "characters": "Princess Elara: A kind-hearted and strong-willed princess..."
+        """,
+        "answer": """
+            Prologue:
+            The grand ballroom of the Ashford Manor was ablaze with candlelight...
+        """,
+    },
+    # 추가 예시들...
+)
 
-    example_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("human", "{setting}"),
-            ("ai", "{answer}"),
-        ]
-    )
-
-    example_prompt = FewShotChatMessagePromptTemplate(
-        example_prompt=example_prompt,
-        examples=examples,
-    )
-
-    prologue_prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                """
+PROLOGUE_SYSTEM = """
                 You are an expert in fiction.
                 You create only the prologue for your novel using the setting(Title, Genre, Theme, Tone, Setting, Characters) you've been given.
                 Prologue is a monologue or dialog that serves to set the scene and set the tone before the main story begins.
                 The novel is told from the point of view of one of the Characters.
                 Just tell me the answer to the input. Don't give interactive answers.
                 If there are no setting(Title, Genre, Theme, Tone, Setting, Characters) in the input, give a blank answer.
-                """,
-            ),
+                """
+
+
+def build_prompt(examples):
+    example_prompt = FewShotChatMessagePromptTemplate(
+        example_prompt=ChatPromptTemplate.from_messages(
+            [
+                ("human", "{setting}"),
+                ("ai", "{answer}"),
+            ]
+        ),
+        examples=list(examples),
+    )
+
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", PROLOGUE_SYSTEM),
             example_prompt,
             ("human", "{setting}"),
         ]
     )
 
-    prologue_chain = prologue_prompt | llm
 
-    prologue = prologue_chain.invoke({"setting": elements})
+PROLOGUE_PROMPT = build_prompt(EXAMPLES)
+
+
+def generate_prologue(elements, on_token=None):
+    llm = get_chat_model(model="gpt-4o-mini", temperature=0.9, max_tokens=500)
+    prologue_chain = PROLOGUE_PROMPT | llm
+
+    if on_token:
+        # 토큰이 생성되는 대로 on_token 으로 전달 (SSE 스트리밍용)
+        prologue = None
+        with resilience.guard("openai", stage="prologue"):
+            for chunk in prologue_chain.stream({"setting": elements}):
+                prologue = chunk if prologue is None else prologue + chunk
+                if chunk.content:
+                    on_token(chunk.content)
+    else:
+        prologue = resilience.call(
+            "openai",
+            lambda timeout: (PROLOGUE_PROMPT | llm.bind(timeout=timeout)).invoke({"setting": elements}),
+            stage="prologue")
+    record_usage("prologue", PROLOGUE_PROMPT.format_prompt(setting=elements), prologue)
     result_text = prologue.content.strip()
 
     try:
@@ -0,0 +1,180 @@
+"""
+토큰 예산 기반 프롬프트 조립과 호출별 토큰 사용량 기록
+
+프롬프트를 우선순위가 있는 구간(segment)으로 나누고, tiktoken 으로 각 구간의
+토큰 수를 로컬에서 센 뒤 ``settings.PROMPT_TOKEN_BUDGETS`` 의 예산을 넘으면
+우선순위가 낮은 구간부터 잘라냅니다. (예시 목록은 예시 단위로 버림)
+"""
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+from .. import metrics
+from ..clients import provider_backend
+
+
+DEFAULT_BUDGETS = {
+    "elements": 1500,
+    "summary": 3500,
+}
+
+_encoding = None
+_usage_lock = threading.Lock()
+usage = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+
+
+class ApproximateEncoding:
+    """
+    tiktoken 인코딩을 받을 수 없을 때(오프라인, 샌드박스) 쓰는 대체 인코딩
+    4글자를 토큰 하나로 셉니다. 예산 계산이 조금 부정확해질 뿐 생성은 계속됩니다.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def encode(self, text):
+        size = self.CHARS_PER_TOKEN
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+_approximate = ApproximateEncoding()
+
+
+def _load_encoding():
+    import tiktoken  # import 비용이 커서 처음 토큰을 셀 때 import
+    try:
+        return tiktoken.encoding_for_model("gpt-4o-mini")
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def get_encoding():
+    """
+    처음 호출할 때 tiktoken 이 BPE 파일을 내려받습니다. 실패하면 경고를 한 번 남기고
+    ``ApproximateEncoding`` 으로 대신합니다. (PRELOAD_PROVIDERS 면 앱 로딩 때 미리 받음)
+    가짜 provider 로 실행할 때는 네트워크 없이 돌도록 처음부터 대체 인코딩을 씁니다.
+    """
+    global _encoding
+    if provider_backend() == "fake":
+        return _approximate
+    if _encoding is None:
+        try:
+            _encoding = _load_encoding()
+        except Exception as e:
+            logging.warning(f"Could not load tiktoken encoding, estimating tokens from length: {e}")
+            _encoding = ApproximateEncoding()
+    return _encoding
+
+
+def count_tokens(text):
+    if not text:
+        return 0
+    return len(get_encoding().encode(str(text)))
+
+
+def budget_for(stage):
+    return {**DEFAULT_BUDGETS, **getattr(settings, "PROMPT_TOKEN_BUDGETS", {})}[stage]
+
+
+def _truncate(text, max_tokens, keep):
+    if max_tokens <= 0:
+        return ""
+    tokens = get_encoding().encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    kept = tokens[:max_tokens] if keep == "head" else tokens[-max_tokens:]
+    return get_encoding().decode(kept).strip()
+
+
+class PromptBuilder:
+    """
+    우선순위가 높은 구간일수록 나중까지 남습니다.
+    - ``add``: 텍스트 구간. ``keep`` 이 "head" 면 앞부분을, "tail" 이면 뒷부분을 남깁니다.
+    - ``add_items``: 예시 목록처럼 항목 단위로만 버릴 수 있는 구간
+    - ``trim=False`` 인 구간은 예산 계산에만 포함하고 자르지 않습니다.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.segments = []
+        self.report = {}
+
+    def add(self, name, text, priority=0, keep="head", trim=True):
+        self.segments.append({
+            "name": name, "value": str(text or ""), "priority": priority,
+            "keep": keep, "trim": trim, "items": False,
+        })
+        return self
+
+    def add_items(self, name, items, priority=0, render=str):
+        self.segments.append({
+            "name": name, "value": list(items), "priority": priority,
+            "render": render, "trim": True, "items": True,
+        })
+        return self
+
+    def _tokens(self, segment):
+        if segment["items"]:
+            return sum(count_tokens(segment["render"](item)) for item in segment["value"])
+        return count_tokens(segment["value"])
+
+    def build(self):
+        """예산에 맞게 자른 구간을 {name: value} 로 반환합니다."""
+        sizes = {segment["name"]: self._tokens(segment) for segment in self.segments}
+        total = sum(sizes.values())
+
+        for segment in sorted(self.segments, key=lambda s: s["priority"]):
+            if total <= self.budget:
+                break
+            if not segment["trim"]:
+                continue
+            name = segment["name"]
+            over = total - self.budget
+            if segment["items"]:
+                while segment["value"] and over > 0:
+                    dropped = count_tokens(segment["render"](segment["value"].pop()))
+                    over -= dropped
+                    total -= dropped
+                    sizes[name] -= dropped
+            else:
+                target = max(sizes[name] - over, 0)
+                segment["value"] = _truncate(segment["value"], target, segment["keep"])
+                total -= sizes[name] - target
+                sizes[name] = target
+
+        self.report = {"budget": self.budget, "total": total, "segments": sizes}
+        if total > self.budget:
+            logging.warning(f"Prompt exceeds token budget even after trimming: {self.report}")
+        return {segment["name"]: segment["value"] for segment in self.segments}
+
+
+def record_usage(stage, prompt, response):
+    """
+    호출 한 번의 prompt/completion 토큰 수를 기록합니다.
+    provider 가 사용량을 돌려주지 않으면(스트리밍 등) 로컬에서 센 값을 씁니다.
+    """
+    metadata = getattr(response, "response_metadata", None) or {}
+    token_usage = metadata.get("token_usage") or {}
+    prompt_tokens = token_usage.get("prompt_tokens")
+    completion_tokens = token_usage.get("completion_tokens")
+    if prompt_tokens is None:
+        if hasattr(prompt, "to_string"):
+            prompt = prompt.to_string()
+        prompt_tokens = count_tokens(prompt)
+    if completion_tokens is None:
+        completion_tokens = count_tokens(getattr(response, "content", ""))
+
+    metrics.record_tokens(stage, prompt_tokens, completion_tokens)
+    with _usage_lock:
+        stats = usage[stage]
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+
+    logging.info(
+        f"LLM usage stage={stage} prompt_tokens={prompt_tokens} completion_tokens={completion_tokens}")
+    return prompt_tokens, completion_tokens
@@ -1,90 +1,103 @@
 import logging
 import re
-import time
-from langchain_openai import ChatOpenAI
+from typing import List
 from langchain.prompts import ChatPromptTemplate, FewShotChatMessagePromptTemplate, MessagesPlaceholder
-from langchain.memory import ConversationSummaryBufferMemory
-from .ai_translation import translate_text
-from config import secret
+from langchain_core.messages import AIMessage
+from langchain_core.pydantic_v1 import BaseModel, Field, ValidationError
+from .. import executors, resilience, translation_router
+from ..clients import get_chat_model
+from .prompt_budget import PromptBuilder, budget_for, record_usage
 
 
-def generate_summary(chapter_num, summary, elements, prologue, language):
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        api_key=secret.OPENAI_API_KEY,
-        temperature=1.2
-    )
+# 프롬프트 템플릿과 예시는 프로세스당 한 번만 만들어 재사용합니다.
+STAGES = (
+    "writes Expositions that introduce the characters and setting of your novel and where events take place.",
+    "writes Development which a series of events leads to conflict between characters.",
+    "writes crises, where a reversal of events occurs, a new situation emerges, and the protagonist ultimately fails.",
+    "writes a climax in which a solution to a new situation is realized, the protagonist implements it, and the conflict shifts.",
+    "writes endings where the protagonist wraps up the case, all conflicts are resolved, and the story ends.",
+)
 
-    memory = ConversationSummaryBufferMemory(
-        llm=llm, max_token_limit=20000, memory_key="chat_history", return_messages=True
-    )
+EXAMPLES = (
+    {
+        "summary": "Write a concise summary of the first chapter where the protagonist meets a mysterious informant.",
+        "answer": """
+            James Worthington prowled the fog-drenched streets of Victorian London. A note directed him to a secluded meeting. As he approached, a man in a long, dark coat emerged from the mist. The informant's voice was urgent: "They're watching, detective." He handed over a ledger filled with cryptic entries, urging James to uncover the truth before disappearing into the fog.
+        """
+    },
+    {
+        "summary": "Write a concise summary of the chapter where the protagonist faces their first major obstacle.",
+        "answer": """
+            James's investigation led him to Lord Blackwood's mansion. Disguised as a social call, he navigated the grand halls to find crucial evidence. As he rifled through drawers, Lord Blackwood entered. "What are you doing here, Worthington?" A tense exchange ensued, and James narrowly escaped, realizing Blackwood was onto him.
+        """
+    },
+    {
+        "summary": "Write a concise summary of the chapter where the protagonist discovers a shocking secret.",
+        "answer": """
+            In an abandoned library, James found letters from his late father, revealing a link to a criminal syndicate. The final letter detailed his father's regret and attempt to escape the syndicate. This revelation shook James, fueling his determination to bring the truth to light.
+        """
+    },
+    {
+        "summary": "Write a concise summary of the chapter where the protagonist forms an unexpected alliance.",
+        "answer": """
+            In a seedy tavern, James met Lila, a master thief. Initially tense, they formed an uneasy alliance. Lila's underworld knowledge and James's quest for truth aligned, and they planned to infiltrate the syndicate's stronghold together.
+        """
+    },
+)
 
-    stages = [
-        "writes Expositions that introduce the characters and setting of your novel and where events take place.",
-        "writes Development which a series of events leads to conflict between characters.",
-        "writes crises, where a reversal of events occurs, a new situation emerges, and the protagonist ultimately fails.",
-        "writes a climax in which a solution to a new situation is realized, the protagonist implements it, and the conflict shifts.",
-        "writes endings where the protagonist wraps up the case, all conflicts are resolved, and the story ends.",
-    ]
+INSTRUCTIONS = """
+    Write a concise, realistic, and engaging summary of the next events in the story. Highlight both hope and despair in the narrative. Make it provocative and creative.
+    Ensure the summary continues smoothly from the prologue, without repeating information.
+    Focus on new developments, character arcs, and plot progression.
+    """
 
-    current_stage, next_stage = None, None
+SUMMARY_SYSTEM = """You are an experienced novelist who {current_stage}.
+                Write a concise, character-focused summary of the next events in the story.
+                Focus on the actions, decisions, and emotions of the characters.
+                Avoid generic descriptions of suspense or tension.
+                Ensure the summary flows smoothly from the prologue and adds new developments.
+                """
 
-    for i in range(5):
-        if (chapter_num-1)//6 == i:
-            current_stage = stages[i]
-            next_stage = stages[i+1] if chapter_num % 6 == 0 and i + \
-                1 < len(stages) else stages[i]
-
-    example_prompts = [
-        {
-            "summary": "Write a concise summary of the first chapter where the protagonist meets a mysterious informant.",
-            "answer": """
-                James Worthington prowled the fog-drenched streets of Victorian London. A note directed him to a secluded meeting. As he approached, a man in a long, dark coat emerged from the mist. The informant's voice was urgent: "They're watching, detective." He handed over a ledger filled with cryptic entries, urging James to uncover the truth before disappearing into the fog.
-            """
-        },
-        {
-            "summary": "Write a concise summary of the chapter where the protagonist faces their first major obstacle.",
-            "answer": """
-                James's investigation led him to Lord Blackwood's mansion. Disguised as a social call, he navigated the grand halls to find crucial evidence. As he rifled through drawers, Lord Blackwood entered. "What are you doing here, Worthington?" A tense exchange ensued, and James narrowly escaped, realizing Blackwood was onto him.
-            """
-        },
-        {
-            "summary": "Write a concise summary of the chapter where the protagonist discovers a shocking secret.",
-            "answer": """
-                In an abandoned library, James found letters from his late father, revealing a link to a criminal syndicate. The final letter detailed his father's regret and attempt to escape the syndicate. This revelation shook James, fueling his determination to bring the truth to light.
-            """
-        },
-        {
-            "summary": "Write a concise summary of the chapter where the protagonist forms an unexpected alliance.",
-            "answer": """
-                In a seedy tavern, James met Lila, a master thief. Initially tense, they formed an uneasy alliance. Lila's underworld knowledge and James's quest for truth aligned, and they planned to infiltrate the syndicate's stronghold together.
-            """
-        }
-    ]
-
-    example_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("human", "{summary}"),
-            ("ai", "{answer}"),
-        ]
-    )
+RECOMMEND_SYSTEM = """
+                You are an experienced novelist who {next_stage}.
+                Based on the current summary prompt, provide three compelling recommendations for the next part of the summary.
+                Be extremely contextual and realistic with your recommendations.
+                Each recommendation should have 'Title': 'Description'. For example: 'James discovers a hidden clue': 'James finds a hidden compartment in the desk, revealing a map that leads to a secret location.'
+                Limit the length of each description to 1-2 sentences.
+                """
 
+# 추천은 29화까지만 생성
+MAX_RECOMMENDATION_CHAPTER = 29
+
+RECOMMENDATION_PATHS = re.compile(r"Recommended summary paths:.*$", re.DOTALL)
+
+
+class Recommendation(BaseModel):
+    Title: str = Field(description="Short title of the next event")
+    Description: str = Field(description="1-2 sentence description of the next event")
+
+
+class Recommendations(BaseModel):
+    """Three recommendations for the next part of the story"""
+
+    recommendations: List[Recommendation] = Field(min_items=3, max_items=3)
+
+
+def build_templates(examples):
+    """예시 목록으로 (요약 템플릿, 추천 템플릿)을 만듭니다."""
     example_prompt = FewShotChatMessagePromptTemplate(
-        example_prompt=example_prompt,
-        examples=example_prompts,
+        example_prompt=ChatPromptTemplate.from_messages(
+            [
+                ("human", "{summary}"),
+                ("ai", "{answer}"),
+            ]
+        ),
+        examples=list(examples),
     )
 
     summary_template = ChatPromptTemplate.from_messages(
         [
-            (
-                "system",
-                f"""You are an experienced novelist who {{current_stage}}.
-                Write a concise, character-focused summary of the next events in the story.
-                Focus on the actions, decisions, and emotions of the characters.
-                Avoid generic descriptions of suspense or tension.
-                Ensure the summary flows smoothly from the prologue and adds new developments.
-                """,
-            ),
+            ("system", SUMMARY_SYSTEM),
             example_prompt,
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{prompt}"),
@@ -93,130 +106,202 @@ def generate_summary(chapter_num, summary, elements, prologue, language):
 
     recommend_template = ChatPromptTemplate.from_messages(
         [
-            (
-                "system",
-                f"""
-                You are an experienced novelist who {{next_stage}}.
-                Based on the current summary prompt, provide three compelling recommendations for the next part of the summary.
-                Be extremely contextual and realistic with your recommendations.
-                Each recommendation should have 'Title': 'Description'. For example: 'James discovers a hidden clue': 'James finds a hidden compartment in the desk, revealing a map that leads to a secret location.'
-                Limit the length of each description to 1-2 sentences.
-                """,
-            ),
+            ("system", RECOMMEND_SYSTEM),
             example_prompt,
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{current_story}"),
         ]
-    ) if chapter_num <= 29 else None
+    )
+    return summary_template, recommend_template
+
 
-    def load_memory():
-        return memory.load_memory_variables({})["chat_history"]
+# 토큰 예산 때문에 예시가 뒤에서부터 빠질 수 있으므로, 남는 예시 개수별로 미리 만들어 둠
+TEMPLATES = tuple(build_templates(EXAMPLES[:count])
+                  for count in range(len(EXAMPLES) + 1))
 
-    def parse_recommendations(recommendation_text):
-        recommendations = []
+
+def get_stages(chapter_num):
+    current_stage, next_stage = None, None
+
+    for i in range(len(STAGES)):
+        if (chapter_num-1)//6 == i:
+            current_stage = STAGES[i]
+            next_stage = STAGES[i+1] if chapter_num % 6 == 0 and i + \
+                1 < len(STAGES) else STAGES[i]
+    return current_stage, next_stage
+
+
+def _field(line, name):
+    """'**Title:** ...', '1. title: ...' 처럼 꾸밈이 붙은 줄에서도 값을 꺼냅니다."""
+    line = re.sub(r"^[\s\-\*\d\.\)#]+", "", line).replace("**", "")
+    if line.lower().startswith(f"{name.lower()}:"):
+        return line.split(":", 1)[1].strip().strip("'\"")
+    return None
+
+
+def parse_recommendations(recommendation_text):
+    """구조화된 응답을 받지 못했을 때 쓰는 텍스트 파서 (Title:/Description: 줄)"""
+    recommendations = []
+    try:
+        rec_lines = recommendation_text.split("\n")
+        title, description = None, None
+        for line in rec_lines:
+            if _field(line, "Title") is not None:
+                title = _field(line, "Title")
+                description = None
+            elif _field(line, "Description") is not None:
+                description = _field(line, "Description")
+                if title and description:
+                    recommendations.append(
+                        {"Title": title, "Description": description}
+                    )
+                    title, description = None, None
+            if len(recommendations) == 3:
+                break
+    except Exception as e:
+        logging.error(f"Error parsing recommendations: {e}")
+
+    return recommendations
+
+
+def _parse_structured(message):
+    """Recommendations 도구 호출 인자를 스키마로 검증합니다. 어긋나면 None"""
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        if tool_call.get("name") != "Recommendations":
+            continue
         try:
-            rec_lines = recommendation_text.split("\n")
-            title, description = None, None
-            for line in rec_lines:
-                if line.startswith("Title:"):
-                    if title and description:
-                        recommendations.append(
-                            {"Title": title, "Description": description}
-                        )
-                    title = line.split("Title:", 1)[1].strip()
-                    description = None
-                elif line.startswith("Description:"):
-                    description = line.split("Description:", 1)[1].strip()
-                    if title and description:
-                        recommendations.append(
-                            {"Title": title, "Description": description}
-                        )
-                        title, description = None, None
-                if len(recommendations) == 3:
-                    break
-        except Exception as e:
-            logging.error(f"Error parsing recommendations: {e}")
-
-        return recommendations
-
-    def generate_recommendations(chat_history, current_story, next_stage, language):
-        if not recommend_template:
+            return Recommendations.parse_obj(tool_call.get("args") or {})
+        except ValidationError as e:
+            logging.warning(f"Structured recommendation parsing failed: {e}")
+    return None
+
+
+def _from_tool_call(message):
+    """스키마 검증에는 실패했지만 tool call 인자에 쓸 만한 값이 있으면 꺼냅니다."""
+    recommendations = []
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        items = tool_call.get("args", {}).get("recommendations") or []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            fields = {key.lower(): value for key, value in item.items()}
+            if fields.get("title") and fields.get("description"):
+                recommendations.append(
+                    {"Title": str(fields["title"]), "Description": str(fields["description"])})
+    return recommendations[:3]
+
+
+def remove_recommendation_paths(final_summary):
+    return re.sub(RECOMMENDATION_PATHS, "", final_summary).strip()
+
+
+def generate_recommendations(llm, recommend_template, chat_history, current_story, next_stage, language):
+    formatted_recommendation_prompt = recommend_template.format(
+        chat_history=chat_history,
+        current_story=current_story,
+        next_stage=next_stage,
+    )
+    logging.debug(f"Formatted Recommendation Prompt: {formatted_recommendation_prompt}")
+
+    try:
+        # 스키마(function calling)로 한 번에 받고 검증. 형식이 어긋나면 같은 응답을 관대하게 파싱
+        # (with_structured_output 과 같은 도구 강제 호출이지만 시도별 timeout 을 넘기기 위해 직접 bind)
+        raw = resilience.call(
+            "openai",
+            lambda timeout: llm.bind_tools(
+                [Recommendations], tool_choice="Recommendations", timeout=timeout,
+            ).invoke(formatted_recommendation_prompt),
+            stage="recommendation")
+        record_usage("recommendation", formatted_recommendation_prompt, raw)
+
+        parsed = _parse_structured(raw)
+        if parsed is not None:
+            recommendations = [
+                {"Title": item.Title, "Description": item.Description}
+                for item in parsed.recommendations[:3]
+            ]
+        else:
+            recommendations = _from_tool_call(raw) or parse_recommendations(raw.content or "")
+
+        if not recommendations:
+            logging.warning("Recommendation response had no usable recommendations")
             return None
 
-        formatted_recommendation_prompt = recommend_template.format(
-            chat_history=chat_history,
-            current_story=current_story,
-            next_stage=next_stage,
-        )
-        logging.debug(f"Formatted Recommendation Prompt: {
-                      formatted_recommendation_prompt}")
+        # 제목/설명을 한 번의 배치 요청으로 번역
+        texts = []
+        for rec in recommendations:
+            texts.extend([rec["Title"], rec["Description"]])
+        translated = translation_router.translate(texts, language)
+        return [
+            {"Title": translated[i], "Description": translated[i + 1]}
+            for i in range(0, len(translated), 2)
+        ]
+
+    except Exception as e:
+        logging.error(f"Error during recommendation generation: {e}")
+    return None
+
+
+def generate_summary(chapter_num, summary, elements, prologue, language, on_token=None, story_memory=""):
+    llm = get_chat_model(model="gpt-4o-mini", temperature=1.2)
+    current_stage, next_stage = get_stages(chapter_num)
+
+    # 토큰 예산에 맞춰 프롬프트 구간을 조립 (우선순위가 낮은 구간부터 잘라냄)
+    builder = PromptBuilder(budget_for("summary"))
+    builder.add("instructions", INSTRUCTIONS, priority=100, trim=False)
+    builder.add("summary", summary, priority=100, trim=False)
+    builder.add("elements", elements, priority=90)
+    builder.add("story_memory", story_memory, priority=80, keep="tail")
+    builder.add("prologue", prologue, priority=50)
+    builder.add_items("examples", EXAMPLES, priority=10,
+                      render=lambda example: example["summary"] + example["answer"])
+    segments = builder.build()
+    logging.debug(f"Summary prompt token report: {builder.report}")
+
+    summary_template, recommend_template = TEMPLATES[len(segments["examples"])]
+
+    # 책마다 누적·압축된 줄거리(StoryMemory)를 한 개의 메시지로 전달
+    chat_history = []
+    if segments["story_memory"]:
+        chat_history = [AIMessage(content=f"Story so far: {segments['story_memory']}")]
 
-        try:
-            translations = {}
-            for attempt in range(3):
-                recommendation_result = llm.invoke(
-                    formatted_recommendation_prompt)
-                logging.debug(f"Recommendation Result: {
-                              recommendation_result.content}")
-
-                if recommendation_result.content:
-                    recommendations = parse_recommendations(
-                        recommendation_result.content)
-                    if recommendations:
-                        translated_recommendations = []
-                        for rec in recommendations:
-                            title = rec["Title"]
-                            description = rec["Description"]
-
-                            # 번역 결과를 캐싱하여 동일한 텍스트는 한 번만 번역
-                            if title not in translations:
-                                translations[title] = translate_text(
-                                    title, language)
-                            if description not in translations:
-                                translations[description] = translate_text(
-                                    description, language)
-
-                            translated_recommendations.append({
-                                "Title": translations[title],
-                                "Description": translations[description],
-                            })
-                        return translated_recommendations
-
-                logging.warning(f"Recommendation attempt {
-                                attempt + 1} failed, retrying...")
-                time.sleep(1 * (attempt + 1))  # 백오프 전략 적용
-
-        except Exception as e:
-            logging.error(f"Error during recommendation generation: {e}")
-            time.sleep(1 * (attempt + 1))
-        return None
-
-    def remove_recommendation_paths(final_summary):
-        pattern = re.compile(r"Recommended summary paths:.*$", re.DOTALL)
-        cleaned_story = re.sub(pattern, "", final_summary).strip()
-        return cleaned_story
-
-    chat_history = load_memory()
     prompt = f"""
-    Story Elements: {elements}
-    Prologue: {prologue}
+    Story Elements: {segments["elements"]}
+    Prologue: {segments["prologue"]}
     Story Prompt: {summary}
-    Previous Story: {chat_history}
-    Write a concise, realistic, and engaging summary of the next events in the story. Highlight both hope and despair in the narrative. Make it provocative and creative.
-    Ensure the summary continues smoothly from the prologue, without repeating information.
-    Focus on new developments, character arcs, and plot progression.
-    """
+    {INSTRUCTIONS}"""
     formatted_final_prompt = summary_template.format(
         chat_history=chat_history, prompt=prompt, current_stage=current_stage
     )
     logging.debug(f"Formatted Final Prompt: {formatted_final_prompt}")
-    result = llm.invoke(formatted_final_prompt)
+    if on_token:
+        # 토큰이 생성되는 대로 on_token 으로 전달 (SSE 스트리밍용)
+        result = None
+        with resilience.guard("openai", stage="summary"):
+            for chunk in llm.stream(formatted_final_prompt):
+                result = chunk if result is None else result + chunk
+                if chunk.content:
+                    on_token(chunk.content)
+    else:
+        result = resilience.call(
+            "openai", lambda timeout: llm.invoke(formatted_final_prompt, timeout=timeout),
+            stage="summary")
     logging.debug(f"Summary Result: {result.content}")
-    memory.save_context({"input": prompt}, {"output": result.content})
+    record_usage("summary", formatted_final_prompt, result)
 
-    cleaned_story = remove_recommendation_paths(result.content)
-    cleaned_story = translate_text(cleaned_story, language)
-    recommendations = generate_recommendations(
-        chat_history, result.content, next_stage, language
-    )
-    return {"final_summary": cleaned_story, "recommendations": recommendations}
+    # 본문 번역과 추천 생성(+번역)은 서로 독립적이므로 동시에 실행
+    original_story = remove_recommendation_paths(result.content)
+    translation_future = executors.submit(translation_router.translate, original_story, language)
+    recommendations_future = None
+    if chapter_num <= MAX_RECOMMENDATION_CHAPTER:
+        recommendations_future = executors.submit(
+            generate_recommendations, llm, recommend_template,
+            chat_history, result.content, next_stage, language,
+        )
+    cleaned_story = translation_future.result()
+    recommendations = recommendations_future.result() if recommendations_future else None
+    return {
+        "final_summary": cleaned_story,
+        "original_summary": original_story,
+        "recommendations": recommendations,
+    }
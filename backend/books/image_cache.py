@@ -0,0 +1,152 @@
+"""
+챕터 삽화 생성 결과 캐시 (DB)
+
+삽화 프롬프트는 책의 제목/톤/설정으로만 만들어지므로 같은 책의 챕터나 재시도는 모두
+같은 프롬프트를 보냅니다. 정규화한 프롬프트, 모델, 크기를 키로 이미 저장된 이미지를
+기억해 둡니다. 기본 정책("force")은 챕터마다 항상 새로 생성하고 캐시만 갱신하며,
+``settings.IMAGE_CACHE["POLICY"]`` 를 "reuse" 로 바꾸면 DALL·E 호출 대신 저장된 이미지를
+챕터에 연결합니다. (같은 책의 모든 챕터가 같은 삽화를 갖게 되므로 명시적으로 켜야 함)
+요청에서 ``regenerate`` 를 주면 정책과 상관없이 새로 생성합니다.
+
+content-addressed 스토리지(``books.blob_storage``)면 같은 blob 의 참조 수만 올리고,
+일반 스토리지면 원본이 다른 챕터와 함께 지워지지 않도록 파일을 복사합니다.
+"""
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.core.files.base import File
+from django.db.models import F
+from django.utils import timezone
+
+from .metrics import Counter, register
+from .models import ImagePromptCache
+
+
+DEFAULT_CACHE = {
+    "POLICY": "force",
+}
+
+POLICY_REUSE = "reuse"
+POLICY_FORCE = "force"
+
+lookups_total = register(Counter(
+    "storyteller_image_cache_lookups_total",
+    "Chapter image cache lookups by outcome (hit, miss, stale, bypassed).",
+    ("outcome",),
+))
+
+stats = {
+    "hits": 0,
+    "misses": 0,
+    "stale": 0,
+    "bypassed": 0,
+}
+# 삽화 작업이 백그라운드 스레드에서도 돌므로 카운터 갱신과 스냅샷을 잠금으로 묶음
+_stats_lock = threading.Lock()
+
+
+def cache_settings():
+    return {**DEFAULT_CACHE, **getattr(settings, "IMAGE_CACHE", {})}
+
+
+def _count(stat, outcome):
+    with _stats_lock:
+        stats[stat] += 1
+    lookups_total.inc(outcome=outcome)
+
+
+def normalize(prompt):
+    prompt = unicodedata.normalize("NFC", prompt).casefold()
+    return re.sub(r"\s+", " ", prompt).strip(" .,!?")
+
+
+def make_key(prompt, model, size):
+    raw = f"{model}\x00{size}\x00{normalize(prompt)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def should_reuse(force=False):
+    if force or cache_settings()["POLICY"] == POLICY_FORCE:
+        _count("bypassed", "bypassed")
+        return False
+    return True
+
+
+def lookup(prompt, model, size, storage):
+    """재사용할 수 있는 캐시 항목. 없거나 파일이 지워졌으면 None"""
+    try:
+        entry = ImagePromptCache.objects.filter(key=make_key(prompt, model, size)).first()
+    except Exception as e:
+        logging.error(f"Error reading image cache: {e}")
+        return None
+
+    if entry is None:
+        _count("misses", "miss")
+        return None
+    if not storage.exists(entry.image_name):
+        # 일반 스토리지에서 원본 챕터 이미지를 다시 생성하며 지운 경우
+        entry.delete()
+        _count("stale", "stale")
+        return None
+
+    ImagePromptCache.objects.filter(pk=entry.pk).update(
+        hits=F("hits") + 1, last_used_at=timezone.now())
+    _count("hits", "hit")
+    return entry
+
+
+def attach(field_file, entry, name):
+    """
+    캐시된 이미지를 필드에 연결합니다. (모델 save 는 호출한 쪽에서)
+    그사이 blob 이 정리돼 연결하지 못했으면 False
+    """
+    storage = field_file.storage
+    if hasattr(storage, "retain"):
+        if not storage.retain(entry.image_name):
+            entry.delete()
+            return False
+        field_file.name = entry.image_name
+        return True
+    with storage.open(entry.image_name, "rb") as cached:
+        field_file.save(name, File(cached, name), save=False)
+    return True
+
+
+def put(prompt, model, size, field_file):
+    storage = field_file.storage
+    key = make_key(prompt, model, size)
+    try:
+        previous = ImagePromptCache.objects.filter(key=key).values_list("image_name", flat=True).first()
+        ImagePromptCache.objects.update_or_create(
+            key=key,
+            defaults={
+                "prompt": prompt,
+                "model": model,
+                "size": size,
+                "image_name": field_file.name,
+            },
+        )
+    except Exception as e:
+        logging.error(f"Error writing image cache: {e}")
+        return
+
+    # content-addressed 스토리지에서는 캐시 항목도 blob 을 참조하는 것으로 셈
+    if hasattr(storage, "retain"):
+        storage.retain(field_file.name)
+        if previous:
+            storage.delete(previous)
+
+
+def snapshot():
+    with _stats_lock:
+        counts = dict(stats)
+    lookups = counts["hits"] + counts["misses"] + counts["stale"]
+    return {
+        **counts,
+        "policy": cache_settings()["POLICY"],
+        "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0,
+    }
@@ -0,0 +1,164 @@
+"""
+이미지 파생본(썸네일/중간 크기, WebP/JPEG)
+
+``Book.image``, ``Chapter.image``, ``User.profile_image`` 가 바뀌어 저장되면
+post_save 에서 "image_variants" 작업을 등록하고, 작업이 원본을 읽어
+``settings.IMAGE_VARIANTS["SIZES"]`` 크기별로 ``FORMATS`` 파생본을 원본과 같은
+스토리지에 저장한 뒤, 저장된 이름을 모델의 ``image_variants`` JSON 필드에 기록합니다.
+
+    {"source": "books/a.png", "thumb": {"webp": "...", "jpeg": "..."}, "medium": {...}}
+
+``source`` 가 현재 원본 이름과 다르면(이미지를 바꿨으면) 다시 만들고 이전 파생본은 지웁니다.
+"""
+import io
+import logging
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_save
+
+
+DEFAULT_VARIANTS = {
+    "SIZES": {"thumb": 256, "medium": 640},
+    "FORMATS": ["webp", "jpeg"],
+    "QUALITY": 80,
+}
+
+# 파생본을 만드는 (모델, 이미지 필드)
+IMAGE_FIELDS = {
+    "books.book": "image",
+    "books.chapter": "image",
+    "accounts.user": "profile_image",
+}
+
+PIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+
+def variant_settings():
+    return {**DEFAULT_VARIANTS, **getattr(settings, "IMAGE_VARIANTS", {})}
+
+
+def variant_name(source, size_key, fmt):
+    directory, filename = os.path.split(source)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, "variants", f"{stem}_{size_key}.{EXTENSIONS[fmt]}")
+
+
+def _encode(image, fmt, quality):
+    if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+        # JPEG 은 알파 채널이 없으므로 흰 배경에 합성
+        from PIL import Image
+
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, PIL_FORMATS[fmt], quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def build_variants(field_file):
+    """원본 이미지로 파생본을 만들어 저장하고 image_variants 에 넣을 딕셔너리를 돌려줍니다."""
+    from PIL import Image
+
+    config = variant_settings()
+    storage = field_file.storage
+    with field_file.open("rb") as source:
+        original = Image.open(source)
+        original.load()
+    if original.mode not in ("RGB", "RGBA", "L"):
+        original = original.convert("RGBA")
+
+    variants = {"source": field_file.name}
+    for size_key, max_side in config["SIZES"].items():
+        resized = original.copy()
+        # 원본보다 크게 늘리지는 않음
+        resized.thumbnail((max_side, max_side), Image.LANCZOS)
+        variants[size_key] = {}
+        for fmt in config["FORMATS"]:
+            name = variant_name(field_file.name, size_key, fmt)
+            content = ContentFile(_encode(resized, fmt, config["QUALITY"]))
+            variants[size_key][fmt] = storage.save(name, content)
+    return variants
+
+
+def stored_names(variants):
+    return [
+        name
+        for key, formats in (variants or {}).items() if key != "source"
+        for name in formats.values()
+    ]
+
+
+def delete_names(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception as e:
+            logging.warning(f"Could not delete image variant {name}: {e}")
+
+
+def is_stale(instance, field_name):
+    field_file = getattr(instance, field_name)
+    source = (instance.image_variants or {}).get("source")
+    return (field_file.name or None) != source
+
+
+def update_variants(instance, field_name, force=False):
+    """원본이 바뀌었으면(또는 force) 파생본을 다시 만들고 기록합니다. 바뀐 게 있으면 True"""
+    if not force and not is_stale(instance, field_name):
+        return False
+
+    field_file = getattr(instance, field_name)
+    previous = instance.image_variants or {}
+    variants = build_variants(field_file) if field_file else {}
+    # save() 를 거치지 않아 updated_at 과 post_save 가 다시 돌지 않음
+    type(instance).objects.filter(pk=instance.pk).update(image_variants=variants)
+    instance.image_variants = variants
+
+    # 새 파생본은 저장할 때마다 참조를 하나씩 얻으므로(content-addressed 스토리지에서 같은 blob 이어도)
+    # 이전 이름은 겹치더라도 모두 놓아야 참조 수가 늘어나지 않음
+    delete_names(field_file.storage, stored_names(previous))
+    return True
+
+
+def variant_urls(instance, request=None):
+    """{"thumb": {"webp": url, "jpeg": url}, ...} 형태의 URL. 파생본이 없으면 None"""
+    variants = instance.image_variants or {}
+    field_name = IMAGE_FIELDS[instance._meta.label_lower]
+    if not variants or is_stale(instance, field_name):
+        return None
+    storage = getattr(instance, field_name).storage
+    urls = {}
+    for size_key, formats in variants.items():
+        if size_key == "source":
+            continue
+        urls[size_key] = {}
+        for fmt, name in formats.items():
+            url = storage.url(name)
+            urls[size_key][fmt] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def _on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    field_name = IMAGE_FIELDS[sender._meta.label_lower]
+    if raw or (update_fields and field_name not in update_fields):
+        return
+    if not is_stale(instance, field_name):
+        return
+
+    from . import jobs
+
+    payload = {"model": sender._meta.label_lower, "pk": instance.pk}
+    transaction.on_commit(
+        lambda: jobs.enqueue(jobs.IMAGE_VARIANTS, payload, background=True))
+
+
+def connect():
+    for label in IMAGE_FIELDS:
+        post_save.connect(
+            _on_save, sender=apps.get_model(label), dispatch_uid=f"image_variants:{label}")
@@ -0,0 +1,63 @@
+"""
+챕터 삽화 생성 (DALL·E → 다운로드 → Chapter.image 저장)
+
+요청 처리 중에 15~30초씩 워커를 붙잡지 않도록 ``books.jobs`` 의 "chapter_image" 작업으로 실행합니다.
+이미지는 메모리에 통째로 받지 않고 ``books.downloads`` 로 스토리지에 바로 스트리밍하고,
+``IMAGE_CACHE["POLICY"]`` 가 "reuse" 면 같은 프롬프트로 만든 이미지를 ``books.image_cache`` 에서 재사용합니다.
+"""
+import logging
+
+from . import image_cache, resilience
+from .clients import get_openai_client
+from .downloads import open_image
+
+
+MODEL = "dall-e-3"
+SIZE = "1024x1024"
+
+
+def build_prompt(title, tone, setting):
+    return f"{title}, {tone}, {setting}"
+
+
+def generate_chapter_image(chapter, title, tone, setting, force=False):
+    """
+    이미지를 생성해서 챕터에 저장하고 저장된 이미지 URL 을 돌려줍니다.
+    ``force`` 면 캐시된 이미지가 있어도 새로 생성합니다.
+    """
+    prompt = build_prompt(title, tone, setting)
+    previous = chapter.image.name
+    name = f"{title}_chapter_{chapter.chapter_num}.png"
+
+    entry = None
+    if image_cache.should_reuse(force):
+        entry = image_cache.lookup(prompt, MODEL, SIZE, chapter.image.storage)
+    if entry is not None and entry.image_name == previous:
+        return chapter.image.url
+    if entry is None or not image_cache.attach(chapter.image, entry, name):
+        client = get_openai_client()
+        response = resilience.call("openai_images", lambda timeout: client.images.generate(
+            model=MODEL,
+            prompt=prompt,
+            size=SIZE,
+            quality="standard",
+            n=1,
+            timeout=timeout,
+        ), attempts=2, stage="image")
+        image_url = response.data[0].url
+
+        def download(timeout):
+            # 스트림은 다시 읽을 수 없으므로 재시도할 때마다 새로 열어서 저장
+            with open_image(image_url, name, timeout=timeout) as image_file:
+                chapter.image.save(name, image_file, save=False)
+
+        resilience.call("image_download", download, stage="image")
+        image_cache.put(prompt, MODEL, SIZE, chapter.image)
+
+    # 챕터에 이미지 저장
+    chapter.save()
+    if previous and previous != chapter.image.name:
+        # 다시 생성한 경우 이전 이미지 참조를 놓음 (content-addressed 스토리지면 참조 수만 내려감)
+        chapter.image.storage.delete(previous)
+    logging.info(f"Saved image for chapter {chapter.id}: {chapter.image.name}")
+    return chapter.image.url
@@ -0,0 +1,387 @@
+"""
+외부 브로커 없이 DB 테이블(GenerationJob)로 동작하는 작업 큐
+
+요청 처리 중에는 ``enqueue`` 로 작업만 등록하고, 실제 생성은
+``python manage.py run_generation_worker`` 가 띄운 워커 프로세스에서 실행합니다.
+작업 종류별 처리 함수는 ``@register("kind")`` 로 등록합니다.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import executors, image_variants, images, services
+from .models import Book, Chapter, GenerationJob
+
+
+DEFAULT_JOBS = {
+    "ASYNC": True,
+    "WORKERS": 2,
+    "POLL_INTERVAL": 1.0,
+    "STALE_AFTER": 600,
+    # 워커 루프에서 requeue_stale 을 다시 실행하는 간격(초)
+    "STALE_CHECK_INTERVAL": 60,
+    "MAX_ATTEMPTS": 2,
+    # 동기 모드에서 중복 요청이 먼저 들어온 작업의 결과를 기다리는 최대 시간(초)
+    "JOIN_TIMEOUT": 60,
+    # 챕터 요청이 생성 중인 프롤로그 초안을 기다리는 최대 시간(초), 넘으면 직접 생성
+    "DRAFT_WAIT": 15,
+    # 종류별로 동시에 실행(running)할 수 있는 최대 작업 수 (전체 워커 기준)
+    "KIND_LIMITS": {"chapter_image": 2},
+    # 종류별로 사용자 한 명이 동시에 걸어 둘 수 있는(pending/running) 최대 작업 수
+    "PER_USER_LIMITS": {"chapter_image": 2},
+}
+
+HANDLERS = {}
+
+# 동기 모드에서 종류별 동시 실행 수(KIND_LIMITS)를 제한하는 세마포어 {(kind, limit): semaphore}
+_slots = {}
+_slots_lock = threading.Lock()
+
+CHAPTER = "chapter"
+PROLOGUE_DRAFT = "prologue_draft"
+CHAPTER_IMAGE = "chapter_image"
+IMAGE_VARIANTS = "image_variants"
+
+# 책마다 하나만 대기/실행할 수 있는 작업 종류
+# (챕터 번호를 마지막 챕터 다음으로 정하므로 동시에 두 개가 돌면 같은 번호로 저장됨)
+EXCLUSIVE_PER_BOOK = {CHAPTER}
+
+
+class JobLimitExceeded(Exception):
+    """사용자별 동시 작업 수 제한을 넘었을 때"""
+
+
+class JobConflict(Exception):
+    """같은 책에 같은 종류의 작업이 이미 대기/실행 중일 때"""
+
+
+def job_settings():
+    return {**DEFAULT_JOBS, **getattr(settings, "GENERATION_JOBS", {})}
+
+
+def register(kind):
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def fingerprint(kind, payload, user=None, book=None):
+    data = json.dumps(
+        {
+            "kind": kind,
+            "user": getattr(user, "pk", None),
+            "book": getattr(book, "pk", None),
+            "payload": payload,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def find_active(key):
+    return GenerationJob.objects.filter(
+        fingerprint=key, status__in=GenerationJob.ACTIVE_STATUSES
+    ).order_by("created_at").first()
+
+
+def _lock_owners(user=None, book=None):
+    """
+    사용자/책 행을 잠가, 같은 사용자·책에 대한 동시 요청이 제한 확인과 등록을 차례로 하게 합니다.
+    (트랜잭션 안에서 호출. 교착을 피하려고 항상 사용자 → 책 순서로 잠금)
+    """
+    if user is not None:
+        type(user).objects.select_for_update().filter(pk=user.pk).exists()
+    if book is not None:
+        Book.objects.select_for_update().filter(pk=book.pk).exists()
+
+
+def _book_busy(kind, book):
+    return book is not None and GenerationJob.objects.filter(
+        kind=kind, book=book, status__in=GenerationJob.ACTIVE_STATUSES).exists()
+
+
+def enqueue(kind, payload, user=None, book=None, dedupe=True, background=False):
+    """
+    작업을 등록합니다. ``dedupe`` 이면 같은 요청으로 진행 중인 작업이 있을 때
+    새로 만들지 않고 그 작업을 반환합니다. (더블 클릭, 타임아웃 재시도 대비)
+    사용자별 제한(PER_USER_LIMITS)을 넘으면 JobLimitExceeded, 책마다 하나만 도는 종류
+    (EXCLUSIVE_PER_BOOK)에 다른 요청이 진행 중이면 JobConflict 를 냅니다.
+    동기 모드(ASYNC=False)에서 ``background`` 면 요청 안에서 기다리지 않고 백그라운드 전용 풀에서 실행합니다.
+    """
+    key = fingerprint(kind, payload, user, book) if dedupe else ""
+    if key:
+        existing = find_active(key)
+        if existing is not None:
+            logging.info(f"Attached duplicate {kind} request to job {existing.id}")
+            return existing
+
+    limit = job_settings()["PER_USER_LIMITS"].get(kind)
+    exclusive = kind in EXCLUSIVE_PER_BOOK
+    try:
+        with transaction.atomic():
+            if (limit and user is not None) or exclusive:
+                # 확인과 등록 사이에 다른 요청이 끼어들지 않도록 잠근 뒤 다시 확인
+                _lock_owners(user if limit else None, book if exclusive else None)
+                existing = find_active(key) if key else None
+                if existing is not None:
+                    logging.info(f"Attached duplicate {kind} request to job {existing.id}")
+                    return existing
+                if limit and user is not None and active_count(kind, user) >= limit:
+                    raise JobLimitExceeded(f"Too many active {kind} jobs for user {user.pk}")
+                if exclusive and _book_busy(kind, book):
+                    raise JobConflict(f"A {kind} job is already active for book {book.pk}")
+            job = GenerationJob.objects.create(
+                kind=kind, payload=payload, user=user, book=book, fingerprint=key)
+    except IntegrityError:
+        # 다른 워커가 같은 요청을 방금 등록함 (unique_active_generation_job)
+        existing = find_active(key)
+        if existing is None:
+            raise
+        return existing
+
+    if not job_settings()["ASYNC"]:
+        if background:
+            executors.submit_background(run_limited, job.id, kind)
+            return job
+        run_limited(job.id, kind)
+        job.refresh_from_db()
+    return job
+
+
+def start(kind, payload, user=None, book=None):
+    """
+    워커를 거치지 않고 호출한 쪽에서 직접 실행할 작업을 running 상태로 등록합니다. (SSE 스트리밍)
+    ``enqueue`` 와 같은 fingerprint 를 쓰므로 그사이 들어온 같은 요청은 이 작업에 붙습니다.
+    같은 책에 같은 종류의 작업이 대기/실행 중이면 JobConflict. 끝나면 ``finish`` 로 결과를 남깁니다.
+    """
+    key = fingerprint(kind, payload, user, book)
+    try:
+        with transaction.atomic():
+            _lock_owners(book=book)
+            if _book_busy(kind, book):
+                raise JobConflict(f"A {kind} job is already active for book {getattr(book, 'pk', None)}")
+            return GenerationJob.objects.create(
+                kind=kind, payload=payload, user=user, book=book, fingerprint=key,
+                status=GenerationJob.STATUS_RUNNING, started_at=timezone.now(), attempts=1)
+    except IntegrityError:
+        # 같은 요청이 방금 등록됨 (unique_active_generation_job)
+        raise JobConflict(f"A {kind} job is already active for book {getattr(book, 'pk', None)}")
+
+
+def finish(job, result=None, error=""):
+    """
+    running 작업을 성공/실패로 끝냅니다.
+    실행 중에 취소(FAILED)되거나 지워진 작업은 덮어쓰거나 되살리지 않고 False
+    """
+    job.status = GenerationJob.STATUS_FAILED if error else GenerationJob.STATUS_SUCCEEDED
+    job.result = result
+    job.error = error
+    job.finished_at = timezone.now()
+    finished = GenerationJob.objects.filter(
+        pk=job.pk, status=GenerationJob.STATUS_RUNNING
+    ).update(status=job.status, result=job.result, error=job.error,
+             finished_at=job.finished_at)
+    if not finished:
+        logging.info(f"Discarded result of cancelled generation job {job.id} ({job.kind})")
+    return bool(finished)
+
+
+def wait(job, timeout=None):
+    """작업이 끝날 때까지(또는 timeout 까지) 상태를 다시 읽으며 기다립니다."""
+    config = job_settings()
+    timeout = config["JOIN_TIMEOUT"] if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    while not job.is_finished and time.monotonic() < deadline:
+        time.sleep(min(config["POLL_INTERVAL"], max(deadline - time.monotonic(), 0)))
+        job.refresh_from_db()
+    return job
+
+
+def active_count(kind, user=None):
+    queryset = GenerationJob.objects.filter(
+        kind=kind, status__in=GenerationJob.ACTIVE_STATUSES)
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    return queryset.count()
+
+
+def saturated_kinds():
+    """KIND_LIMITS 만큼 이미 실행 중인 작업 종류 (이미지 작업이 워커를 다 차지하지 않도록)"""
+    limits = job_settings()["KIND_LIMITS"]
+    if not limits:
+        return []
+    running = dict(
+        GenerationJob.objects.filter(status=GenerationJob.STATUS_RUNNING, kind__in=limits)
+        .values_list("kind")
+        .annotate(count=Count("id"))
+    )
+    return [kind for kind, limit in limits.items() if running.get(kind, 0) >= limit]
+
+
+def claim_next(kinds=None):
+    """대기 중인 작업 하나를 running 으로 바꾸고 반환합니다. 없으면 None"""
+    with transaction.atomic():
+        queryset = GenerationJob.objects.select_for_update(skip_locked=True).filter(
+            status=GenerationJob.STATUS_PENDING
+        )
+        if kinds:
+            queryset = queryset.filter(kind__in=kinds)
+        # 실행 중인 수는 잠그지 않고 세므로 워커가 동시에 잡으면 제한을 잠깐 넘을 수 있음
+        saturated = saturated_kinds()
+        if saturated:
+            queryset = queryset.exclude(kind__in=saturated)
+        job = queryset.order_by("created_at").first()
+        if job is None:
+            return None
+        job.status = GenerationJob.STATUS_RUNNING
+        job.started_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=["status", "started_at", "attempts"])
+        return job
+
+
+def requeue_stale():
+    """워커가 죽어서 running 으로 남은 작업을 다시 대기열에 넣거나 실패 처리합니다."""
+    config = job_settings()
+    cutoff = timezone.now() - timedelta(seconds=config["STALE_AFTER"])
+    stale = GenerationJob.objects.filter(
+        status=GenerationJob.STATUS_RUNNING, started_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=config["MAX_ATTEMPTS"]).update(
+        status=GenerationJob.STATUS_FAILED,
+        error="Job timed out.",
+        finished_at=timezone.now(),
+    )
+    requeued = stale.update(status=GenerationJob.STATUS_PENDING)
+    return requeued, failed
+
+
+def release(job_id, error=""):
+    """
+    실행되지 못한 running 작업을 다시 대기열에 넣습니다. (워커 프로세스가 죽은 경우)
+    이미 MAX_ATTEMPTS 만큼 시도했으면 실패 처리합니다.
+    """
+    running = GenerationJob.objects.filter(pk=job_id, status=GenerationJob.STATUS_RUNNING)
+    failed = running.filter(attempts__gte=job_settings()["MAX_ATTEMPTS"]).update(
+        status=GenerationJob.STATUS_FAILED,
+        error=error or "Worker process crashed.",
+        finished_at=timezone.now(),
+    )
+    if failed:
+        return GenerationJob.STATUS_FAILED
+    running.update(status=GenerationJob.STATUS_PENDING, started_at=None)
+    return GenerationJob.STATUS_PENDING
+
+
+def run_job(job_id):
+    job = GenerationJob.objects.select_related("book", "user").filter(id=job_id).first()
+    if job is None:
+        return None
+    handler = HANDLERS.get(job.kind)
+    if job.status == GenerationJob.STATUS_PENDING:
+        # 동기 모드에서는 워커의 claim_next 대신 여기서 running 으로 바꿈.
+        # 그사이 취소(take_prologue_draft 등)됐으면 실행하지 않음
+        started_at = timezone.now()
+        claimed = GenerationJob.objects.filter(
+            pk=job.pk, status=GenerationJob.STATUS_PENDING
+        ).update(status=GenerationJob.STATUS_RUNNING, started_at=started_at,
+                 attempts=F("attempts") + 1)
+        if not claimed:
+            logging.info(f"Generation job {job.id} ({job.kind}) was claimed or cancelled elsewhere")
+            return GenerationJob.objects.filter(pk=job.pk).first()
+        job.status = GenerationJob.STATUS_RUNNING
+        job.started_at = started_at
+        job.attempts += 1
+    elif job.status != GenerationJob.STATUS_RUNNING:
+        return job
+
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        result = handler(job)
+    except Exception as e:
+        logging.error(f"Generation job {job.id} ({job.kind}) failed: {e}")
+        finish(job, error=str(e) or e.__class__.__name__)
+    else:
+        finish(job, result=result)
+    return job
+
+
+def _kind_slots(kind):
+    limit = job_settings()["KIND_LIMITS"].get(kind)
+    if not limit:
+        return None
+    with _slots_lock:
+        # 제한 값이 바뀌면(설정 변경) 새 세마포어를 씀
+        slots = _slots.get((kind, limit))
+        if slots is None:
+            slots = _slots[(kind, limit)] = threading.BoundedSemaphore(limit)
+    return slots
+
+
+def run_limited(job_id, kind):
+    """
+    동기 모드에서 워커의 claim_next 대신 KIND_LIMITS 를 지키며 run_job 을 실행합니다.
+    제한만큼 이미 실행 중이면 자리가 날 때까지 기다립니다.
+    """
+    slots = _kind_slots(kind)
+    if slots is None:
+        return run_job(job_id)
+    with slots:
+        return run_job(job_id)
+
+
+@register(CHAPTER)
+def _run_chapter(job):
+    book = job.book or Book.objects.get(id=job.payload["book_id"])
+    return services.generate_chapter(
+        book,
+        job.payload.get("language", "EN-US"),
+        summary=job.payload.get("summary"),
+    )
+
+
+@register(PROLOGUE_DRAFT)
+def _run_prologue_draft(job):
+    book = job.book or Book.objects.get(id=job.payload["book_id"])
+    return services.generate_prologue_draft(book, job.payload.get("language"))
+
+
+@register(CHAPTER_IMAGE)
+def _run_chapter_image(job):
+    chapter = Chapter.objects.select_related("book_id").get(id=job.payload["chapter_id"])
+    image_url = images.generate_chapter_image(
+        chapter, job.payload["title"], job.payload["tone"], job.payload["setting"],
+        force=job.payload.get("force", False))
+    return {"chapter_id": chapter.id, "image_url": image_url}
+
+
+@register(IMAGE_VARIANTS)
+def _run_image_variants(job):
+    label = job.payload["model"]
+    instance = apps.get_model(label).objects.get(pk=job.payload["pk"])
+    updated = image_variants.update_variants(instance, image_variants.IMAGE_FIELDS[label])
+    return {"updated": updated, "variants": instance.image_variants}
+
+
+def _reset_after_fork():
+    global _slots_lock
+    # 부모 스레드가 잡고 있던 자리는 자식 프로세스에서 풀리지 않으므로 새로 만듭니다.
+    _slots_lock = threading.Lock()
+    _slots.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,112 @@
+"""
+외부 의존성 없는 간단한 언어 감지
+
+번역 전에 원문이 이미 대상 언어인지 확인해서, 영어 본문을 영어로 "번역" 하는 것처럼
+필요 없는 provider 호출을 건너뛰기 위한 용도입니다.
+- 한글/가나/한자/키릴 문자는 문자 비율로 판단합니다.
+- 라틴 문자는 언어별 자주 쓰이는 단어(불용어)로 판단합니다. 불용어가 없는 짧은 문구(제목, 장르 등)는
+  ASCII 라도 영어라고 단정하지 않습니다. ("Hola mundo", "Guten Morgen")
+확신이 없으면 None 을 돌려주며, 이 경우 번역을 그대로 진행합니다.
+"""
+import re
+import threading
+
+from .metrics import Counter, register
+
+
+# DeepL 언어 코드(EN-US, PT-BR 등)와 언어 이름을 기본 언어 코드로 변환
+LANGUAGE_NAMES = {
+    "korean": "ko",
+    "english": "en",
+    "japanese": "ja",
+    "chinese": "zh",
+    "german": "de",
+    "french": "fr",
+    "spanish": "es",
+    "italian": "it",
+    "portuguese": "pt",
+    "russian": "ru",
+}
+
+STOPWORDS = {
+    "en": {"the", "and", "of", "to", "is", "was", "in", "that", "with", "his", "her", "a", "for", "as"},
+    "de": {"der", "die", "und", "das", "ist", "nicht", "mit", "ein", "eine", "sich", "den", "auf"},
+    "fr": {"le", "la", "les", "et", "est", "des", "une", "dans", "que", "pour", "qui", "sur"},
+    "es": {"el", "la", "los", "las", "y", "es", "que", "del", "una", "por", "con", "se"},
+    "it": {"il", "che", "di", "la", "e", "una", "per", "non", "gli", "della", "con", "si"},
+    "pt": {"o", "que", "de", "não", "uma", "com", "os", "do", "da", "em", "se", "por"},
+}
+
+SCRIPTS = (
+    ("ko", re.compile(r"[가-힣ᄀ-ᇿ㄰-㆏]")),
+    ("ja", re.compile(r"[぀-ヿ]")),
+    ("zh", re.compile(r"[一-鿿]")),
+    ("ru", re.compile(r"[Ѐ-ӿ]")),
+)
+
+LETTERS = re.compile(r"[^\W\d_]", re.UNICODE)
+WORDS = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+skipped_total = register(Counter(
+    "storyteller_translation_skipped_total",
+    "Translation calls skipped because the text was already in the target language.",
+    ("provider",),
+))
+
+stats = {"skipped": 0, "translated": 0}
+_stats_lock = threading.Lock()
+
+
+def normalize_language(language):
+    """'EN-US', 'english', 'Korean' 같은 값을 'en', 'ko' 로 바꿉니다."""
+    if not language:
+        return None
+    language = language.strip().lower()
+    if language in LANGUAGE_NAMES:
+        return LANGUAGE_NAMES[language]
+    return language.split("-")[0].split("_")[0]
+
+
+def detect(text):
+    """원문의 언어 코드를 추정합니다. 확신할 수 없으면 None"""
+    if not isinstance(text, str):
+        return None
+    letters = LETTERS.findall(text)
+    if not letters:
+        return None
+
+    # 일본어 문장에도 한자가 섞이므로 가나를 한자보다 먼저 확인
+    for code, pattern in SCRIPTS:
+        count = len(pattern.findall(text))
+        if count and count / len(letters) >= (0.1 if code == "ja" else 0.3):
+            return code
+
+    words = [word.lower() for word in WORDS.findall(text)]
+    scores = {code: sum(1 for word in words if word in stopwords)
+              for code, stopwords in STOPWORDS.items()}
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best, best_score), (_, second_score) = ranked[0], ranked[1]
+    if best_score >= 2 and best_score >= 2 * second_score:
+        return best
+    return None
+
+
+def is_same_language(text, language):
+    target = normalize_language(language)
+    return target is not None and detect(text) == target
+
+
+def should_translate(text, language, provider):
+    """이미 대상 언어로 쓰인 텍스트면 False 를 돌려주고 건너뛴 횟수를 셉니다."""
+    same = is_same_language(text, language)
+    with _stats_lock:
+        stats["skipped" if same else "translated"] += 1
+    if same:
+        skipped_total.inc(provider=provider)
+    return not same
+
+
+def snapshot():
+    with _stats_lock:
+        total = stats["skipped"] + stats["translated"]
+        return {**stats, "skip_rate": round(stats["skipped"] / total, 4) if total else 0.0}
@@ -0,0 +1,71 @@
+"""
+무거운 provider SDK(langchain, openai, deepl, tiktoken)와 생성기 모듈의 지연 로딩
+
+``books.views`` 를 import 하는 모든 명령(마이그레이션, 워커 부팅, 댓글/좋아요 요청 등)이
+생성기 import 비용을 치르지 않도록, 생성기 모듈은 ``lazy_module`` 로 감싸 두고
+속성에 처음 접근할 때 import 합니다.
+
+fork 하는 서버(gunicorn --preload, run_generation_worker)는 ``settings.PRELOAD_PROVIDERS`` 를
+켜면 마스터 프로세스에서 ``preload()`` 로 미리 올려 두어 자식들이 메모리를 공유하게 할 수 있습니다.
+"""
+import importlib
+import logging
+import threading
+import time
+
+
+# preload() 가 미리 올리는 모듈 (lazy_module 로 등록한 모듈도 함께 올림)
+PROVIDER_MODULES = [
+    "openai",
+    "langchain_openai",
+    "langchain_core.messages",
+    "deepl",
+    "tiktoken",
+]
+
+_registered = []
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """처음 속성에 접근할 때 실제 모듈을 import 하는 대리 객체"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_module(name):
+    module = LazyModule(name)
+    _registered.append(module)
+    return module
+
+
+def preload():
+    """SDK 와 등록된 생성기 모듈을 모두 import 하고 모듈별 소요 시간(초)을 돌려줍니다."""
+    timings = {}
+    for name in PROVIDER_MODULES + [module._name for module in _registered]:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logging.warning(f"Could not preload {name}: {e}")
+            continue
+        timings[name] = time.perf_counter() - started
+    for module in _registered:
+        module._load()
+    return timings
@@ -0,0 +1,81 @@
+"""
+벤치마크용 로컬 OpenAI 호환 스텁 서버
+
+``/v1/chat/completions`` 요청에 고정된 응답을 돌려주고, 새로 열린 TCP 커넥션 수와
+처리한 요청 수를 기록합니다. keep-alive 를 지원하도록 HTTP/1.1 로 응답합니다.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        body = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4o-mini",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.server.reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        }).encode()
+
+        with self.server.stats_lock:
+            self.server.requests += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, reply="stub"):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.reply = reply
+        self.stats_lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.connections = 0
+            self.requests = 0
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from langchain_openai import ChatOpenAI
+
+from books import clients
+from ._stub_openai import StubOpenAIServer
+
+
+class Command(BaseCommand):
+    help = "로컬 스텁 OpenAI 서버를 대상으로 요청당 커넥션 생성 수를 비교합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--latency", type=float, default=0.0,
+                            help="스텁 서버의 응답 지연(초)")
+
+    def handle(self, *args, **options):
+        n = options["requests"]
+
+        with StubOpenAIServer(latency=options["latency"]) as server:
+            # 기존 방식: 호출마다 ChatOpenAI 생성
+            def per_call():
+                llm = ChatOpenAI(
+                    model="gpt-4o-mini",
+                    api_key="stub",
+                    base_url=server.base_url,
+                    temperature=0.7,
+                )
+                llm.invoke("ping")
+
+            # 레지스트리 방식: 공유 클라이언트 재사용
+            clients.reset_clients()
+
+            def pooled():
+                llm = clients.get_chat_model(
+                    model="gpt-4o-mini", temperature=0.7, base_url=server.base_url
+                )
+                llm.invoke("ping")
+
+            for label, call in (("per-call ChatOpenAI", per_call), ("pooled registry", pooled)):
+                server.reset_stats()
+                started = time.perf_counter()
+                for _ in range(n):
+                    call()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{label:>20}: {server.requests} requests, "
+                    f"{server.connections} connections "
+                    f"({server.connections / max(server.requests, 1):.2f}/request), "
+                    f"{elapsed / n * 1000:.1f} ms/request"
+                )
+
+        clients.reset_clients()
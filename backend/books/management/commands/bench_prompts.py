@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from books.generators import elements_generator, prologue_generator, summary_generator
+
+
+class Command(BaseCommand):
+    help = "요청마다 프롬프트 템플릿을 만드는 경우와 미리 만든 템플릿을 쓰는 경우를 비교합니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=500)
+
+    def handle(self, *args, **options):
+        n = options["iterations"]
+        elements_examples = elements_generator.EXAMPLES["default"]
+
+        # 기존 방식: 요청마다 템플릿 객체를 새로 만든 뒤 포맷
+        def per_request():
+            elements_generator.build_prompt(elements_examples).format_prompt(
+                user_prompt="A medieval fantasy")
+            prologue_generator.build_prompt(prologue_generator.EXAMPLES).format_prompt(
+                setting="Title: Hearts of Stone")
+            summary_template, _ = summary_generator.build_templates(summary_generator.EXAMPLES)
+            summary_template.format(chat_history=[], prompt="next", current_stage="writes")
+
+        # 현재 방식: import 시점에 만들어 둔 템플릿을 재사용
+        def precompiled():
+            elements_generator.PROMPTS["default"][len(elements_examples)].format_prompt(
+                user_prompt="A medieval fantasy")
+            prologue_generator.PROLOGUE_PROMPT.format_prompt(
+                setting="Title: Hearts of Stone")
+            summary_template, _ = summary_generator.TEMPLATES[len(summary_generator.EXAMPLES)]
+            summary_template.format(chat_history=[], prompt="next", current_stage="writes")
+
+        for label, call in (("per-request build", per_request), ("precompiled", precompiled)):
+            started = time.perf_counter()
+            for _ in range(n):
+                call()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{label:>18}: {elapsed / n * 1e6:.1f} us/request")
@@ -0,0 +1,41 @@
+import logging
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from books import image_variants
+
+
+class Command(BaseCommand):
+    help = "기존 책/챕터/프로필 이미지의 썸네일·중간 크기 파생본(WebP/JPEG)을 만듭니다."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", action="append", choices=list(image_variants.IMAGE_FIELDS),
+                            help="처리할 모델 (여러 번 지정 가능, 기본: 전부)")
+        parser.add_argument("--force", action="store_true",
+                            help="이미 파생본이 있어도 다시 만듦 (크기/품질 설정을 바꾼 뒤)")
+        parser.add_argument("--limit", type=int, default=None,
+                            help="모델별 최대 처리 개수")
+
+    def handle(self, *args, **options):
+        labels = options["model"] or list(image_variants.IMAGE_FIELDS)
+        for label in labels:
+            field_name = image_variants.IMAGE_FIELDS[label]
+            model = apps.get_model(label)
+            queryset = model.objects.exclude(**{field_name: ""}).exclude(
+                **{f"{field_name}__isnull": True}).order_by("pk")
+            if options["limit"]:
+                queryset = queryset[:options["limit"]]
+
+            updated = skipped = failed = 0
+            for instance in queryset.iterator(chunk_size=200):
+                try:
+                    if image_variants.update_variants(instance, field_name, force=options["force"]):
+                        updated += 1
+                    else:
+                        skipped += 1
+                except Exception as e:
+                    failed += 1
+                    logging.error(f"Could not build image variants for {label} {instance.pk}: {e}")
+            self.stdout.write(
+                f"{label}: {updated} updated, {skipped} up to date, {failed} failed")
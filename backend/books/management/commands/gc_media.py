@@ -0,0 +1,121 @@
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from books import image_variants
+from books.blob_storage import blob_settings
+from books.models import ImagePromptCache, StoredBlob
+
+
+class Command(BaseCommand):
+    help = (
+        "DB 에서 실제 참조를 다시 세어 StoredBlob 참조 수를 맞추고, "
+        "삭제된 책/챕터/프로필이 남긴 고아 미디어 파일을 지웁니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="지울 파일만 출력하고 실제로 지우지 않음")
+        parser.add_argument("--grace", type=int, default=None,
+                            help="참조가 없어진 뒤 이 시간(초)이 지난 파일만 지움 (기본: BLOB_STORAGE['GRACE_PERIOD'])")
+
+    def handle(self, *args, **options):
+        config = blob_settings()
+        grace = config["GRACE_PERIOD"] if options["grace"] is None else options["grace"]
+        cutoff = timezone.now() - timedelta(seconds=grace)
+        dry_run = options["dry_run"]
+        referenced = self.count_references()
+
+        # 1) 참조 수를 실제 값으로 맞추고, 유예 시간이 지난 참조 없는 blob 삭제
+        reconciled = removed = 0
+        for blob in StoredBlob.objects.iterator(chunk_size=500):
+            actual = referenced.get(blob.name, 0)
+            if blob.refcount != actual and not dry_run:
+                # 세는 동안 저장/retain 으로 참조가 바뀐 blob 은 건드리지 않음
+                reconciled += StoredBlob.objects.filter(
+                    pk=blob.pk, refcount=blob.refcount,
+                    last_referenced_at=blob.last_referenced_at,
+                ).update(refcount=actual)
+            if actual == 0 and blob.last_referenced_at < cutoff:
+                if dry_run:
+                    self.remove(blob.name, dry_run)
+                    removed += 1
+                elif self.remove_blob(blob.pk, cutoff):
+                    removed += 1
+
+        # 2) StoredBlob 행도 없고 어떤 필드도 가리키지 않는 파일 (이전 이름 방식, 롤백된 저장)
+        known = set(StoredBlob.objects.values_list("name", flat=True))
+        orphans = 0
+        for directory in self.scan_directories(config["PREFIX"]):
+            for name in self.walk(directory):
+                if name in referenced or name in known:
+                    continue
+                if default_storage.get_modified_time(name) >= cutoff:
+                    continue
+                self.remove(name, dry_run)
+                orphans += 1
+
+        verb = "would remove" if dry_run else "removed"
+        self.stdout.write(
+            f"{reconciled} refcounts reconciled, {verb} {removed} blobs and {orphans} orphaned files")
+
+    def count_references(self):
+        referenced = Counter()
+        for label, field_name in image_variants.IMAGE_FIELDS.items():
+            rows = apps.get_model(label).objects.values_list(field_name, "image_variants")
+            for name, variants in rows.iterator(chunk_size=1000):
+                if name:
+                    referenced[name] += 1
+                for variant in image_variants.stored_names(variants):
+                    referenced[variant] += 1
+        # 챕터가 지워져도 삽화 캐시가 가리키는 이미지는 남김 (books.image_cache)
+        for name in ImagePromptCache.objects.values_list("image_name", flat=True).iterator():
+            referenced[name] += 1
+        return referenced
+
+    def scan_directories(self, prefix):
+        directories = {prefix}
+        for label, field_name in image_variants.IMAGE_FIELDS.items():
+            upload_to = apps.get_model(label)._meta.get_field(field_name).upload_to
+            if isinstance(upload_to, str) and upload_to:
+                directories.add(upload_to.rstrip("/"))
+        return sorted(directories)
+
+    def walk(self, directory):
+        try:
+            subdirectories, files = default_storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        for filename in files:
+            yield f"{directory}/{filename}"
+        for subdirectory in subdirectories:
+            yield from self.walk(f"{directory}/{subdirectory}")
+
+    def remove_blob(self, pk, cutoff):
+        """
+        행을 잠그고 참조가 여전히 0 이고 유예 시간이 지났는지 다시 확인한 뒤에만 지웁니다.
+        같은 내용을 저장하는 쪽은 이 잠금이 풀릴 때까지 기다렸다가 새로 올립니다.
+        """
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(
+                pk=pk, refcount=0, last_referenced_at__lt=cutoff).first()
+            if blob is None:
+                return False
+            self.remove(blob.name, dry_run=False)
+            blob.delete()
+        return True
+
+    def remove(self, name, dry_run):
+        self.stdout.write(f"{'[dry-run] ' if dry_run else ''}delete {name}")
+        if dry_run:
+            return
+        try:
+            getattr(default_storage, "purge", default_storage.delete)(name)
+        except Exception as e:
+            logging.warning(f"Could not delete media file {name}: {e}")
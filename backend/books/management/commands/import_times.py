@@ -0,0 +1,55 @@
+import os
+import re
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+SETUP_CODE = "import django; django.setup(); import {module}"
+PRELOAD_CODE = "from books import lazy; lazy.preload()"
+
+
+class Command(BaseCommand):
+    help = (
+        "새 인터프리터에서 모듈을 import 하며 모듈별 import 시간을 측정합니다. "
+        "(python -X importtime)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", default="books.views",
+                            help="측정할 모듈 (기본: books.views)")
+        parser.add_argument("--limit", type=int, default=20,
+                            help="누적 시간이 긴 순으로 보여줄 모듈 수")
+        parser.add_argument("--preload", action="store_true",
+                            help="provider SDK/생성기 모듈까지 미리 올렸을 때의 시간도 측정")
+
+    def handle(self, *args, **options):
+        code = SETUP_CODE.format(module=options["module"])
+        if options["preload"]:
+            code = f"{code}; {PRELOAD_CODE}"
+
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get(
+            "DJANGO_SETTINGS_MODULE", "config.settings")}
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True, text=True, env=env,
+        )
+        if completed.returncode != 0:
+            raise CommandError(completed.stderr.strip().splitlines()[-1])
+
+        rows = []
+        for line in completed.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, name = match.groups()
+                rows.append((int(cumulative_us), int(self_us), (len(indent) - 1) // 2, name))
+
+        # 최상위 import(들여쓰기 0)의 누적 시간 합이 전체 시간
+        total_us = sum(cumulative for cumulative, _, depth, _ in rows if depth == 0)
+        self.stdout.write(f"Total import time: {total_us / 1000:.1f} ms ({len(rows)} modules)")
+        self.stdout.write(f"{'cumulative':>12} {'self':>10}  module")
+        for cumulative, self_us, _, name in sorted(rows, reverse=True)[:options["limit"]]:
+            self.stdout.write(f"{cumulative / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name}")
@@ -0,0 +1,172 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from books import clients
+from books.models import Book, Chapter
+
+
+SCENARIOS = ("synopsis", "chapter", "image")
+
+
+def percentile(values, p):
+    """nearest-rank 방식 백분위수"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        "생성 엔드포인트(시놉시스, 챕터, 이미지)에 동시 요청을 보내고 "
+        "처리량과 p50/p95/p99 지연 시간을 출력합니다. 기본은 가짜 provider 를 사용합니다."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20,
+                            help="시나리오별 요청 수")
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                            help="실행할 시나리오 (synopsis,chapter,image)")
+        parser.add_argument("--latency", type=float, default=None,
+                            help="가짜 provider 의 호출당 지연(초)")
+        parser.add_argument("--failure-rate", type=float, default=None,
+                            help="가짜 provider 의 실패 비율 (0~1)")
+        parser.add_argument("--real", action="store_true",
+                            help="가짜 대신 설정된 실제 provider 를 호출 (비용 발생)")
+        parser.add_argument("--keep", action="store_true",
+                            help="만든 책/챕터를 지우지 않고 남김")
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options["scenarios"].split(",") if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        fake = dict(getattr(settings, "FAKE_PROVIDER", {}))
+        if options["latency"] is not None:
+            fake["LATENCY"] = options["latency"]
+        if options["failure_rate"] is not None:
+            fake["FAILURE_RATE"] = options["failure_rate"]
+
+        overrides = {
+            "ALLOWED_HOSTS": ["*"],
+            "FAKE_PROVIDER": fake,
+            # 요청 안에서 생성이 끝나야 지연 시간을 잴 수 있으므로 작업 큐는 동기 실행
+            "GENERATION_JOBS": {**getattr(settings, "GENERATION_JOBS", {}), "ASYNC": False},
+        }
+        if not options["real"]:
+            overrides["AI_PROVIDER_BACKEND"] = "fake"
+
+        user, created = get_user_model().objects.get_or_create(
+            email="loadtest@example.com", defaults={"nickname": "loadtest"})
+
+        with override_settings(**overrides):
+            clients.reset_clients()
+            self.stdout.write(
+                f"backend={settings.AI_PROVIDER_BACKEND} requests={options['requests']} "
+                f"concurrency={options['concurrency']}"
+            )
+            try:
+                self.run(user, scenarios, options)
+            finally:
+                clients.reset_clients()
+                if not options["keep"]:
+                    # 이번 실행에서 만든 사용자는 책/챕터와 함께 지움
+                    if created:
+                        user.delete()
+                    else:
+                        Book.objects.filter(user_id=user).delete()
+
+    def run(self, user, scenarios, options):
+        n = options["requests"]
+        state = {"books": [], "chapters": []}
+
+        def synopsis(i):
+            response = self.client(user).post(
+                "/api/books/",
+                {"prompt": f"Load test fantasy novel #{i}", "language": "EN-US", "tags": []},
+                format="json",
+            )
+            if response.status_code == 201:
+                state["books"].append(response.data["book_id"])
+            return response.status_code == 201
+
+        def chapter(i):
+            book = self.book_for(user, state["books"], i)
+            response = self.client(user).post(
+                f"/api/books/{book.id}/",
+                {"language": "EN-US", "summary": f"Chapter request #{i}"},
+                format="json",
+            )
+            if response.status_code == 201:
+                state["chapters"].append(
+                    Chapter.objects.filter(book_id=book.id).order_by("-chapter_num").values_list("id", flat=True).first()
+                )
+            return response.status_code == 201
+
+        def image(i):
+            chapter_id = self.chapter_for(user, state["chapters"], i)
+            response = self.client(user).post(
+                f"/api/books/chapters/{chapter_id}/generate-image/", {}, format="json")
+            return response.status_code in (200, 201, 202)
+
+        handlers = {"synopsis": synopsis, "chapter": chapter, "image": image}
+        for name in scenarios:
+            self.report(name, self.measure(handlers[name], n, options["concurrency"]))
+
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def book_for(self, user, books, i):
+        # 같은 책에 챕터를 동시에 쓰지 않도록 요청마다 다른 책을 사용
+        if i < len(books):
+            return Book.objects.get(id=books[i])
+        return Book.objects.create(
+            title=f"Load test #{i}", genre="Fantasy", theme="Courage", tone="Tense",
+            setting="A kingdom on the brink of war", characters="Aria, Ronan", user_id=user,
+        )
+
+    def chapter_for(self, user, chapters, i):
+        if i < len(chapters) and chapters[i]:
+            return chapters[i]
+        book = self.book_for(user, [], i)
+        return Chapter.objects.create(book_id=book, content="Prologue").id
+
+    def measure(self, func, n, concurrency):
+        def timed(i):
+            started = time.perf_counter()
+            try:
+                ok = func(i)
+            except Exception:
+                ok = False
+            finally:
+                close_old_connections()
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(timed, range(n)))
+        return time.perf_counter() - started, results
+
+    def report(self, name, measured):
+        elapsed, results = measured
+        latencies = [latency for latency, _ in results]
+        failures = sum(1 for _, ok in results if not ok)
+        self.stdout.write(
+            f"{name:>9}: {len(results)} requests in {elapsed:.2f}s "
+            f"({len(results) / elapsed if elapsed else 0:.2f} req/s), failures={failures}, "
+            f"p50={percentile(latencies, 50) * 1000:.0f}ms "
+            f"p95={percentile(latencies, 95) * 1000:.0f}ms "
+            f"p99={percentile(latencies, 99) * 1000:.0f}ms"
+        )
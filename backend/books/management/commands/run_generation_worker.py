@@ -0,0 +1,103 @@
+import logging
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from books import jobs, lazy
+
+
+def _init_worker():
+    # fork 된 자식은 부모의 DB 커넥션을 공유하면 안 됩니다.
+    django.setup()
+    connections.close_all()
+
+
+def _run(job_id):
+    try:
+        job = jobs.run_job(job_id)
+        return job.status if job else None
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "DB 작업 큐(GenerationJob)를 처리하는 워커 프로세스 풀을 실행합니다."
+
+    def add_arguments(self, parser):
+        config = jobs.job_settings()
+        parser.add_argument("--processes", type=int, default=config["WORKERS"])
+        parser.add_argument("--poll-interval", type=float,
+                            default=config["POLL_INTERVAL"])
+        parser.add_argument("--kinds", nargs="*", default=None,
+                            help="처리할 작업 종류 (기본: 전체)")
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        poll_interval = options["poll_interval"]
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        requeued, failed = jobs.requeue_stale()
+        if requeued or failed:
+            self.stdout.write(
+                f"Requeued {requeued} stale job(s), failed {failed}.")
+
+        if settings.PRELOAD_PROVIDERS:
+            # fork 전에 SDK/생성기 모듈을 올려 두면 자식 프로세스가 import 없이 바로 시작
+            timings = lazy.preload()
+            self.stdout.write(f"Preloaded provider modules in {sum(timings.values()):.2f}s.")
+
+        connections.close_all()
+        # 실행 중인 future -> job id
+        running = {}
+        stale_check_interval = jobs.job_settings()["STALE_CHECK_INTERVAL"]
+        next_stale_check = time.monotonic() + stale_check_interval
+        pool = self._new_pool(processes)
+        self.stdout.write(
+            f"Generation worker started with {processes} process(es).")
+        try:
+            while not self._stopping:
+                for future in [future for future in running if future.done()]:
+                    job_id = running.pop(future)
+                    if isinstance(future.exception(), BrokenProcessPool):
+                        status = jobs.release(job_id)
+                        logging.error(f"Worker process died while running job {job_id}, marked {status}")
+
+                if time.monotonic() >= next_stale_check:
+                    # 워커가 떠 있는 동안 running 으로 남은 작업도 주기적으로 정리
+                    requeued, failed = jobs.requeue_stale()
+                    if requeued or failed:
+                        self.stdout.write(f"Requeued {requeued} stale job(s), failed {failed}.")
+                    next_stale_check = time.monotonic() + stale_check_interval
+
+                job = None
+                if len(running) < processes:
+                    job = jobs.claim_next(kinds=options["kinds"])
+                if job is None:
+                    time.sleep(poll_interval)
+                    continue
+                try:
+                    running[pool.submit(_run, job.id)] = job.id
+                except BrokenProcessPool:
+                    # 자식 프로세스가 죽으면 풀 전체가 망가지므로 새로 만들고 작업은 되돌림
+                    logging.error("Worker process pool is broken, recreating it")
+                    jobs.release(job.id)
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._new_pool(processes)
+
+            self.stdout.write("Waiting for running jobs to finish...")
+        finally:
+            pool.shutdown(wait=True)
+
+    def _new_pool(self, processes):
+        return ProcessPoolExecutor(max_workers=processes, initializer=_init_worker)
+
+    def _stop(self, signum, frame):
+        self._stopping = True
@@ -0,0 +1,176 @@
+"""
+provider 호출 계측과 Prometheus 텍스트 포맷 출력
+
+외부 라이브러리 없이 프로세스 안에서 카운터/히스토그램을 모으고,
+``render()`` 가 Prometheus exposition format(0.0.4) 문자열을 만듭니다.
+provider 호출은 ``books.resilience.call``/``guard`` 에 ``stage`` 를 넘기면 자동으로 기록됩니다.
+
+주의: 값은 프로세스마다 따로 쌓이므로 워커가 여러 개면 워커별로 수집해야 합니다.
+"""
+import math
+import threading
+from collections import defaultdict
+
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, math.inf)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self.values[key] += amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self.values.items()]
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["counts"][i] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def samples(self):
+        with self._lock:
+            result = []
+            for key, entry in self.values.items():
+                for bound, count in zip(self.buckets, entry["counts"]):
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    result.append((f"{self.name}_bucket", key + (le,), count))
+                result.append((f"{self.name}_sum", key, entry["sum"]))
+                result.append((f"{self.name}_count", key, entry["count"]))
+            return result
+
+
+provider_calls = Counter(
+    "storyteller_provider_calls_total",
+    "Provider calls by stage, provider and outcome.",
+    ("stage", "provider", "outcome"),
+)
+provider_retries = Counter(
+    "storyteller_provider_retries_total",
+    "Retried provider attempts by stage and provider.",
+    ("stage", "provider"),
+)
+provider_latency = Histogram(
+    "storyteller_provider_call_seconds",
+    "Provider call latency including retries, by stage and provider.",
+    ("stage", "provider"),
+)
+llm_tokens = Counter(
+    "storyteller_llm_tokens_total",
+    "LLM tokens by stage and type (prompt/completion).",
+    ("stage", "type"),
+)
+
+METRICS = [provider_calls, provider_retries, provider_latency, llm_tokens]
+
+
+def register(metric):
+    """다른 모듈에서 만든 Counter/Histogram 을 /metrics 출력에 추가합니다."""
+    METRICS.append(metric)
+    return metric
+
+
+def record_call(stage, provider, seconds, outcome):
+    provider_calls.inc(stage=stage, provider=provider, outcome=outcome)
+    provider_latency.observe(seconds, stage=stage, provider=provider)
+
+
+def record_retry(stage, provider):
+    provider_retries.inc(stage=stage, provider=provider)
+
+
+def record_tokens(stage, prompt_tokens, completion_tokens):
+    llm_tokens.inc(prompt_tokens, stage=stage, type="prompt")
+    llm_tokens.inc(completion_tokens, stage=stage, type="completion")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_sample(name, label_names, label_values, value):
+    if label_names:
+        labels = ",".join(
+            f'{label}="{_escape(label_value)}"' for label, label_value in zip(label_names, label_values)
+        )
+        name = f"{name}{{{labels}}}"
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return f"{name} {value}"
+
+
+def _gauges():
+    """요청 시점에 다른 모듈의 상태를 읽어 만드는 gauge 들"""
+    from . import elements_cache, resilience, translation_cache
+
+    gauges = []
+    states = {"closed": 0, "half_open": 1, "open": 2}
+    breakers = resilience.snapshot()
+    gauges.append((
+        "storyteller_circuit_state",
+        "Circuit breaker state per provider (0=closed, 1=half_open, 2=open).",
+        ("provider",),
+        [((provider,), states[snapshot["state"]]) for provider, snapshot in breakers.items()],
+    ))
+
+    caches = {
+        "translation": translation_cache.snapshot(),
+        "elements": elements_cache.snapshot(),
+    }
+    gauges.append((
+        "storyteller_cache_hit_ratio",
+        "Hit ratio of in-process caches.",
+        ("cache",),
+        [((name,), snapshot["memory"]["hit_rate"]) for name, snapshot in caches.items()],
+    ))
+    gauges.append((
+        "storyteller_cache_entries",
+        "Entries held by in-process caches.",
+        ("cache",),
+        [((name,), snapshot["memory"]["size"]) for name, snapshot in caches.items()],
+    ))
+    return gauges
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        kind = "histogram" if isinstance(metric, Histogram) else "counter"
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {kind}")
+        for name, key, value in metric.samples():
+            label_names = metric.labels + (("le",) if name.endswith("_bucket") else ())
+            lines.append(_format_sample(name, label_names, key, value))
+
+    for name, help_text, label_names, samples in _gauges():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for key, value in samples:
+            lines.append(_format_sample(name, label_names, key, value))
+    return "\n".join(lines) + "\n"
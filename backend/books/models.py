@@ -19,6 +19,8 @@ class Book(models.Model):
     setting = models.CharField(max_length=1000)
     characters = models.TextField()
     image = models.ImageField(upload_to='books', null=True, blank=True)
+    # 썸네일/중간 크기 파생본의 스토리지 이름 (books.image_variants)
+    image_variants = models.JSONField(default=dict, blank=True)
 
     full_text = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -79,6 +81,7 @@ class Chapter(models.Model):
     content = models.TextField()
     image = models.ImageField(upload_to='chapters',
                               null=True, blank=True)  # 이미지 필드 추가
+    image_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     book_id = models.ForeignKey(
@@ -105,6 +108,106 @@ class Chapter(models.Model):
         book.save()
 
 
+class StoryMemory(models.Model):
+    """책마다 챕터가 추가될 때마다 압축해 갱신하는 줄거리 요약"""
+
+    book = models.OneToOneField(
+        Book, on_delete=models.CASCADE, related_name="story_memory")
+    summary = models.TextField(blank=True)
+    last_chapter_num = models.IntegerField(default=-1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class TranslationCache(models.Model):
+    """번역 결과를 (정규화된 원문 해시, 언어, 제공자) 단위로 저장"""
+
+    key = models.CharField(max_length=64, unique=True)
+    provider = models.CharField(max_length=20)
+    language = models.CharField(max_length=20)
+    source_text = models.TextField()
+    translated_text = models.TextField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+
+class ImagePromptCache(models.Model):
+    """(정규화된 프롬프트 해시, 모델, 크기) 별로 생성해 둔 챕터 삽화 (books.image_cache)"""
+
+    key = models.CharField(max_length=64, unique=True)
+    prompt = models.TextField()
+    model = models.CharField(max_length=50)
+    size = models.CharField(max_length=20)
+    image_name = models.CharField(max_length=255)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+
+class GenerationJob(models.Model):
+    """워커 프로세스가 처리하는 생성 작업(DB 기반 큐)"""
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+    kind = models.CharField(max_length=50)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # 같은 (종류, 사용자, 책, 요청 내용)의 중복 요청을 묶기 위한 해시
+    fingerprint = models.CharField(max_length=64, blank=True, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Foriegn Key
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        related_name="generation_jobs", null=True, blank=True,
+    )
+    book = models.ForeignKey(
+        Book, on_delete=models.CASCADE, related_name="generation_jobs",
+        null=True, blank=True,
+    )
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+        constraints = [
+            # 진행 중인 작업은 fingerprint 당 하나만 존재 (워커/프로세스 간 single-flight)
+            models.UniqueConstraint(
+                fields=["fingerprint"],
+                condition=models.Q(status__in=["pending", "running"]) & ~models.Q(fingerprint=""),
+                name="unique_active_generation_job",
+            ),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
+
+class StoredBlob(models.Model):
+    """내용 해시로 저장된 미디어 파일과 그 파일을 가리키는 필드 수 (books.blob_storage)"""
+
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_referenced_at = models.DateTimeField(auto_now_add=True)
+
+
 class RecentSearch(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="recentsearches")
@@ -0,0 +1,257 @@
+"""
+외부 provider(OpenAI, DeepL, 이미지) 호출용 재시도/서킷 브레이커 계층
+
+- 재시도는 지터가 있는 지수 백오프(full jitter)로, 호출 전체에 마감 시간(deadline)을 둡니다.
+- provider 별 서킷 브레이커가 연속 실패를 세다가 임계치를 넘으면 열려서
+  ``RESET_TIMEOUT`` 동안 호출을 바로 실패시킵니다. (워커가 sleep 에 묶이지 않도록)
+- 설정은 ``settings.PROVIDER_RESILIENCE`` 의 "default" 와 provider 별 값을 합쳐 씁니다.
+- 재시도와 장애 집계는 일시적인 오류(연결/타임아웃, 429, 5xx)만 대상으로 하고,
+  그 밖의 예외(4xx, 우리 쪽 파싱 오류 등)는 바로 다시 던집니다.
+- ``func`` 는 이번 시도에 남은 시간(초)을 ``timeout`` 인자로 받아 클라이언트 타임아웃으로 넘깁니다.
+- ``stage`` (elements, summary, translation, image ...) 를 넘기면 호출 지연 시간, 재시도,
+  실패 횟수가 ``books.metrics`` 에 기록됩니다.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+import requests
+from django.conf import settings
+
+from . import metrics
+
+
+DEFAULT_POLICY = {
+    "ATTEMPTS": 3,
+    "BASE_DELAY": 0.5,
+    "MAX_DELAY": 8.0,
+    "DEADLINE": 60.0,
+    "FAILURE_THRESHOLD": 5,
+    "RESET_TIMEOUT": 30.0,
+}
+
+# 재시도할 상태 코드 (그 밖의 4xx 는 요청 자체가 잘못된 경우라 재시도해도 소용없음)
+RETRYABLE_STATUS = {408, 429}
+
+# SDK 를 import 하지 않고 이름으로 구분하는 연결/타임아웃 예외 (openai, deepl)
+TRANSIENT_ERROR_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "ConnectionException",
+    "TooManyRequestsException",
+}
+
+TRANSIENT_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    httpx.TransportError,
+    requests.ConnectionError,
+    requests.Timeout,
+)
+
+
+class ProviderUnavailable(Exception):
+    """서킷이 열려 있어 provider 호출을 시도하지 않았을 때"""
+
+
+class DeadlineExceeded(Exception):
+    """재시도 중 호출 마감 시간을 넘겼을 때"""
+
+
+def policy_for(provider):
+    config = getattr(settings, "PROVIDER_RESILIENCE", {})
+    return {**DEFAULT_POLICY, **config.get("default", {}), **config.get(provider, {})}
+
+
+def status_code_of(error):
+    status_code = getattr(error, "status_code", None) or getattr(error, "http_status_code", None)
+    response = getattr(error, "response", None)
+    if status_code is None and response is not None:
+        status_code = getattr(response, "status_code", None)
+    return status_code
+
+
+def is_retryable(error):
+    """연결/타임아웃 오류와 429, 5xx 응답만 재시도하고 provider 장애로 셉니다."""
+    if isinstance(error, (ProviderUnavailable, DeadlineExceeded)):
+        return False
+    status_code = status_code_of(error)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS or status_code >= 500
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, provider, failure_threshold, reset_timeout):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # 시험 삼아 한 번만 통과시키고 결과에 따라 닫거나 다시 엶
+                self.state = self.HALF_OPEN
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.stats["successes"] += 1
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.stats["failures"] += 1
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.stats["opened"] += 1
+                    logging.warning(f"Circuit opened for provider '{self.provider}'")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                **self.stats,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider):
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(provider)
+            if breaker is None:
+                policy = policy_for(provider)
+                breaker = CircuitBreaker(
+                    provider, policy["FAILURE_THRESHOLD"], policy["RESET_TIMEOUT"])
+                _breakers[provider] = breaker
+    return breaker
+
+
+@contextmanager
+def _guarded(provider):
+    breaker = get_breaker(provider)
+    if not breaker.allow():
+        raise ProviderUnavailable(f"Provider '{provider}' is unavailable (circuit open)")
+    try:
+        yield
+    except Exception as e:
+        if is_retryable(e):
+            breaker.record_failure()
+        else:
+            # 요청 오류(4xx)나 응답 처리 중 오류는 provider 가 응답했다는 뜻이므로 장애로 세지 않음
+            breaker.record_success()
+        raise
+    else:
+        breaker.record_success()
+
+
+def _outcome(error):
+    if error is None:
+        return "success"
+    if isinstance(error, ProviderUnavailable):
+        return "rejected"
+    if isinstance(error, DeadlineExceeded):
+        return "deadline"
+    return "error"
+
+
+@contextmanager
+def guard(provider, stage="unknown"):
+    """
+    재시도 없이 서킷 브레이커만 적용합니다. (스트리밍처럼 다시 시도할 수 없는 호출용)
+    """
+    started = time.monotonic()
+    error = None
+    try:
+        with _guarded(provider):
+            yield
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        metrics.record_call(stage, provider, time.monotonic() - started, _outcome(error))
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+# 스레드별 call() 횟수. 캐시에서 끝난 요청과 실제 provider 호출을 구분할 때 씀
+_local = threading.local()
+
+
+def calls_made():
+    """현재 스레드에서 지금까지 call() 로 provider 를 부른 횟수"""
+    return getattr(_local, "calls", 0)
+
+
+def call(provider, func, attempts=None, deadline=None, stage="unknown"):
+    """
+    ``func(timeout)`` 을 provider 정책에 따라 재시도하며 호출합니다.
+    ``timeout`` 은 마감 시간까지 남은 초로, 한 번의 느린 시도가 마감을 넘기지 않도록
+    호출하는 쪽이 클라이언트 타임아웃으로 넘겨야 합니다.
+    서킷이 열려 있으면 ProviderUnavailable, 마감 시간을 넘기면 DeadlineExceeded 를 냅니다.
+    """
+    _local.calls = calls_made() + 1
+    policy = policy_for(provider)
+    attempts = attempts or policy["ATTEMPTS"]
+    started = time.monotonic()
+    deadline_at = started + (deadline or policy["DEADLINE"])
+    error = None
+
+    try:
+        for attempt in range(attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Provider '{provider}' call exceeded its deadline")
+            try:
+                with _guarded(provider):
+                    return func(remaining)
+            except Exception as e:
+                if not is_retryable(e) or attempt + 1 >= attempts:
+                    raise
+                delay = backoff_delay(attempt, policy["BASE_DELAY"], policy["MAX_DELAY"])
+                if time.monotonic() + delay >= deadline_at:
+                    raise DeadlineExceeded(
+                        f"Provider '{provider}' call exceeded its deadline") from e
+                logging.warning(
+                    f"Provider '{provider}' call failed (attempt {attempt + 1}/{attempts}): {e}; retrying in {delay:.2f}s")
+                metrics.record_retry(stage, provider)
+                time.sleep(delay)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        metrics.record_call(stage, provider, time.monotonic() - started, _outcome(error))
+
+
+def snapshot():
+    return {provider: breaker.snapshot() for provider, breaker in list(_breakers.items())}
@@ -1,19 +1,26 @@
 from django.db.models import Avg
 from rest_framework import serializers
-from .models import Book, Chapter, Comment, Rating, Tag
+from . import image_variants
+from .models import Book, Chapter, Comment, GenerationJob, Rating, Tag
 
 
 class ChapterSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Chapter
         fields = "__all__"
 
+    def get_image_variants(self, obj):
+        return image_variants.variant_urls(obj, self.context.get('request'))
+
 
 class BookSerializer(serializers.ModelSerializer):
     average_rating = serializers.SerializerMethodField()
     user_nickname = serializers.SerializerMethodField()
     chapters = ChapterSerializer(many=True, read_only=True)
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     tags = serializers.StringRelatedField(many=True)
 
     class Meta:
@@ -21,7 +28,7 @@ class BookSerializer(serializers.ModelSerializer):
         fields = [
             "id", "title", "genre", "theme", "tone", "setting", "characters",
             "created_at", "updated_at", "user_id", "image", "average_rating",
-            "user_nickname", "chapters", "image_url", "tags"
+            "user_nickname", "chapters", "image_url", "image_variants", "tags"
         ]
 
     def create(self, validated_data):
@@ -46,6 +53,10 @@ class BookSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.image.url)
         return None
 
+    def get_image_variants(self, obj):
+        # {"thumb": {"webp": ..., "jpeg": ...}, "medium": {...}}, 아직 없으면 None
+        return image_variants.variant_urls(obj, self.context.get('request'))
+
 
 class BookLikeSerializer(BookSerializer):
     total_likes = serializers.IntegerField(read_only=True)
@@ -92,3 +103,12 @@ class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ['id', 'name']
+
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GenerationJob
+        fields = [
+            "id", "kind", "status", "result", "error", "book",
+            "created_at", "started_at", "finished_at",
+        ]
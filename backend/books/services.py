@@ -0,0 +1,124 @@
+from django.utils import timezone
+
+from .models import Chapter, GenerationJob
+from .serializers import ChapterSerializer, ElementsSerializer
+from . import jobs, story_memory, translation_router
+from .lazy import lazy_module
+
+# langchain 을 끌어오므로 챕터를 실제로 생성할 때 import
+summary_generator = lazy_module("books.generators.summary_generator")
+prologue_generator = lazy_module("books.generators.prologue_generator")
+
+
+def resolve_summary_prompt(data):
+    """요청 데이터에서 다음 챕터의 요약 프롬프트를 만듭니다. (선택한 추천 > 직접 입력)"""
+    selected_recommendation = data.get("selected_recommendation", None)
+    if selected_recommendation:
+        return f"{selected_recommendation['Title']}: {selected_recommendation['Description']}"
+    return data.get("summary")
+
+
+def generate_chapter(book, language, summary=None, on_token=None):
+    """
+    책의 다음 챕터를 생성하고 저장합니다.
+    챕터가 없으면 프롤로그(0번)를, 있으면 summary 를 바탕으로 다음 챕터를 만듭니다.
+    on_token 을 주면 생성되는 토큰을 순서대로 전달받습니다.
+    """
+    chapter = Chapter.objects.filter(book_id=book.id).last()
+    elements = ElementsSerializer(book).data
+
+    if not chapter:
+        chapter_num = 0
+        draft = take_prologue_draft(book, language)
+        if draft:
+            result = {}
+            original, content = draft
+            if on_token:
+                on_token(original)
+        else:
+            result = prologue_generator.generate_prologue(elements, on_token=on_token)
+            original = result["prologue"]
+            content = translation_router.translate(original, language)
+
+    else:
+        if not summary:
+            raise ValueError("Missing summary prompt")
+
+        chapter_num = chapter.chapter_num + 1
+        prologue = Chapter.objects.filter(
+            book_id=book.id, chapter_num=0).first()
+        result = summary_generator.generate_summary(
+            chapter_num,
+            summary,
+            elements,
+            prologue.content if prologue else "",
+            language,
+            on_token=on_token,
+            story_memory=story_memory.get_summary(book),
+        )
+        original = result["original_summary"]
+        content = result["final_summary"]
+
+    serializer = ChapterSerializer(
+        data={"content": content, "book_id": book.id,
+              "chapter_num": chapter_num}
+    )
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+    story_memory.update(book, chapter_num, original)
+    return {
+        "book_id": book.id,
+        "translated_content": content,
+        "chapter_num": chapter_num,
+        "recommendations": result.get("recommendations", []),
+    }
+
+
+def generate_prologue_draft(book, language=None):
+    """책 생성 직후 미리 만들어 두는 프롤로그 초안 (챕터로 저장하지 않음)"""
+    original = prologue_generator.generate_prologue(ElementsSerializer(book).data)["prologue"]
+    return {
+        "prologue": original,
+        "language": language,
+        "translated": translation_router.translate(original, language) if language else original,
+    }
+
+
+def take_prologue_draft(book, language):
+    """
+    미리 생성한 프롤로그 초안이 있으면 (원문, 번역문)을 돌려주고 초안을 지웁니다.
+    생성 중이면 DRAFT_WAIT 까지 기다리고, 아직 시작 전이거나 그때까지 안 끝나면 취소한 뒤 None 을 돌려줍니다.
+    """
+    job = GenerationJob.objects.filter(
+        book=book, kind=jobs.PROLOGUE_DRAFT).order_by("-created_at").first()
+    if job is None:
+        return None
+
+    if job.status == GenerationJob.STATUS_PENDING:
+        # 워커가 아직 잡지 않았으면 기다리지 않고 직접 생성하는 편이 빠름
+        GenerationJob.objects.filter(pk=job.pk, status=GenerationJob.STATUS_PENDING).update(
+            status=GenerationJob.STATUS_FAILED,
+            error="Superseded by chapter request.",
+            finished_at=timezone.now(),
+        )
+        job.refresh_from_db()
+    if job.status == GenerationJob.STATUS_RUNNING:
+        # 챕터 워커가 오래 묶이지 않도록 DRAFT_WAIT 까지만 기다리고, 그래도 안 끝나면 취소 후 직접 생성
+        jobs.wait(job, timeout=jobs.job_settings()["DRAFT_WAIT"])
+        GenerationJob.objects.filter(pk=job.pk, status=GenerationJob.STATUS_RUNNING).update(
+            status=GenerationJob.STATUS_FAILED,
+            error="Superseded by chapter request.",
+            finished_at=timezone.now(),
+        )
+        job.refresh_from_db()
+
+    draft = job.result if job.status == GenerationJob.STATUS_SUCCEEDED else None
+    GenerationJob.objects.filter(book=book, kind=jobs.PROLOGUE_DRAFT, status__in=(
+        GenerationJob.STATUS_SUCCEEDED, GenerationJob.STATUS_FAILED)).delete()
+    if not draft or not draft.get("prologue"):
+        return None
+
+    original = draft["prologue"]
+    if draft.get("language") == language:
+        return original, draft["translated"]
+    return original, translation_router.translate(original, language)
@@ -0,0 +1,103 @@
+"""
+책별 줄거리 메모리(StoryMemory)
+
+챕터가 저장될 때마다(커밋 후 백그라운드에서) "지금까지의 요약 + 새 챕터"를 다시 압축해 저장합니다.
+다음 챕터 프롬프트에는 이 요약만 들어가므로 이전 챕터 수와 상관없이
+히스토리 토큰 수가 일정하게 유지됩니다. 요약 길이는
+``settings.STORY_MEMORY_MAX_TOKENS`` 로 제한합니다.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import executors, resilience
+from .clients import get_chat_model
+from .generators.prompt_budget import record_usage
+from .models import Chapter, StoryMemory
+
+
+COMPRESS_PROMPT = """You maintain a running summary of a novel.
+Merge the new chapter into the story so far and rewrite it as one compact summary of at most {max_words} words.
+Keep the names of characters, their goals and relationships, unresolved conflicts and the most recent events.
+Drop scene details and dialogue. Return only the summary.
+
+Story so far:
+{story_so_far}
+
+New chapter {chapter_num}:
+{chapter}
+"""
+
+
+def max_tokens():
+    return getattr(settings, "STORY_MEMORY_MAX_TOKENS", 400)
+
+
+def get_summary(book):
+    memory = StoryMemory.objects.filter(book=book).first()
+    return memory.summary if memory else ""
+
+
+def compress(story_so_far, chapter_num, chapter):
+    limit = max_tokens()
+    llm = get_chat_model(
+        model="gpt-4o-mini", temperature=0.3, max_tokens=limit)
+    prompt = COMPRESS_PROMPT.format(
+        max_words=int(limit * 0.75),
+        story_so_far=story_so_far or "(none)",
+        chapter_num=chapter_num,
+        chapter=chapter,
+    )
+    response = resilience.call(
+        "openai", lambda timeout: llm.invoke(prompt, timeout=timeout), stage="story_memory")
+    record_usage("story_memory", prompt, response)
+    return response.content.strip()
+
+
+def update(book, chapter_num, chapter):
+    """
+    새 챕터를 줄거리 메모리에 반영하도록 예약합니다. (챕터를 저장한 트랜잭션이 커밋된 뒤 백그라운드에서)
+    압축은 LLM 호출이라 챕터 응답 경로와 행 잠금 밖에서 실행합니다.
+    """
+    if not chapter:
+        return
+    book_id = book.id
+    transaction.on_commit(
+        lambda: executors.submit_background(catch_up, book_id, {chapter_num: chapter}))
+
+
+def catch_up(book_id, originals=None):
+    """
+    아직 반영하지 않은 챕터를 순서대로 압축해 반영합니다.
+    압축에 실패한 챕터는 last_chapter_num 을 올리지 않고 남겨 두어 다음 챕터 때 다시 시도합니다.
+    ``originals`` 는 {chapter_num: 번역 전 원문}, 없으면 저장된 챕터 내용을 씁니다.
+    """
+    originals = originals or {}
+    memory, _ = StoryMemory.objects.get_or_create(book_id=book_id)
+    pending = Chapter.objects.filter(
+        book_id=book_id, chapter_num__gt=memory.last_chapter_num
+    ).order_by("chapter_num").values_list("chapter_num", "content")
+
+    for chapter_num, content in pending:
+        try:
+            summary = compress(memory.summary, chapter_num, originals.get(chapter_num, content))
+        except Exception as e:
+            logging.error(f"Error updating story memory for book {book_id} "
+                          f"(chapter {chapter_num} left pending): {e}")
+            return memory
+
+        # 잠금 없이 압축했으므로 그사이 다른 스레드가 먼저 반영했으면 버림
+        updated = StoryMemory.objects.filter(
+            pk=memory.pk, last_chapter_num=memory.last_chapter_num
+        ).update(summary=summary, last_chapter_num=chapter_num, updated_at=timezone.now())
+        if not updated:
+            return StoryMemory.objects.get(pk=memory.pk)
+        memory.summary = summary
+        memory.last_chapter_num = chapter_num
+    return memory
+
+
+def reset(book_id):
+    StoryMemory.objects.filter(book_id=book_id).delete()
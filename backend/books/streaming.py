@@ -0,0 +1,65 @@
+"""
+챕터 생성 결과를 Server-Sent Events 로 흘려보내는 비동기 제너레이터
+
+생성(동기 langchain 호출)은 별도 스레드에서 실행하고, 토큰이 나올 때마다
+이벤트 루프 쪽 큐로 넘겨 바로 클라이언트에 씁니다. ASGI(config.asgi)로
+서비스할 때 토큰 단위로 전달되며, WSGI 에서는 응답이 끝난 뒤 한꺼번에 전달됩니다.
+
+이벤트 형식
+- ``token``: 생성 중인 본문 조각 (번역 전 원문)
+- ``done``: 저장된 챕터 정보 (번역된 본문, 추천 목록 포함)
+- ``error``: 생성 실패
+
+스트리밍 생성도 ``jobs.start`` 로 running 작업 행을 남기므로, 그동안 들어온 같은
+비스트리밍 요청은 이 작업에 붙고 결과는 ``jobs.finish`` 로 기록됩니다.
+"""
+import asyncio
+import json
+import logging
+
+from django.db import connections
+
+from . import jobs
+from .services import generate_chapter
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_chapter(book, language, summary=None, job=None):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+
+    def on_token(token):
+        loop.call_soon_threadsafe(queue.put_nowait, ("token", token))
+
+    def run():
+        try:
+            result = generate_chapter(
+                book, language, summary=summary, on_token=on_token)
+            if job is not None:
+                jobs.finish(job, result=result)
+            loop.call_soon_threadsafe(queue.put_nowait, ("done", result))
+        except Exception as e:
+            logging.error(f"Error streaming chapter for book {book.id}: {e}")
+            if job is not None:
+                jobs.finish(job, error=str(e) or e.__class__.__name__)
+            loop.call_soon_threadsafe(
+                queue.put_nowait, ("error", {"error": "Failed to generate chapter."}))
+        finally:
+            connections.close_all()
+            loop.call_soon_threadsafe(queue.put_nowait, (done, None))
+
+    worker = loop.run_in_executor(None, run)
+    # 프록시 버퍼를 밀어내기 위해 첫 바이트를 바로 보냅니다.
+    yield ": stream-start\n\n"
+
+    while True:
+        event, data = await queue.get()
+        if event is done:
+            break
+        yield format_event(event, data)
+
+    await worker
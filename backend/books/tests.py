@@ -1,3 +1,1421 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from langchain_core.messages import AIMessage
+from rest_framework.test import APIClient
+
+from accounts.models import User
+
+from . import (
+    bulk, clients, downloads, elements_cache, fake_providers, image_cache, image_variants, images, jobs, metrics, resilience, services,
+    translation_cache, translation_router,
+)
+from . import language as language_detection
+from .blob_storage import ContentAddressedFileSystemStorage
+from .generators import ai_translation, prompt_budget, summary_generator
+from .models import Book, Chapter, GenerationJob, ImagePromptCache, StoredBlob, TranslationCache
+
+
+# 가짜 provider 는 지연 없이, 실패 없이 응답
+FAKE_PROVIDERS = {
+    "AI_PROVIDER_BACKEND": "fake",
+    "FAKE_PROVIDER": {"LATENCY": 0, "TOKEN_DELAY": 0, "FAILURE_RATE": 0.0, "IMAGE_LATENCY": 0},
+}
+
+# 워커 없이 요청 안에서 바로 실행하고, 기다리는 작업은 바로 포기
+SYNC_JOBS = {
+    "ASYNC": False,
+    "JOIN_TIMEOUT": 0,
+    "DRAFT_WAIT": 0,
+    "POLL_INTERVAL": 0.01,
+    "MAX_ATTEMPTS": 2,
+    "KIND_LIMITS": {},
+    "PER_USER_LIMITS": {},
+}
+
+
+def create_book(user, title="The Silent Forest"):
+    return Book.objects.create(
+        user_id=user,
+        title=title,
+        genre="Fantasy",
+        theme="Courage",
+        tone="Tense",
+        setting="A castle at the edge of a silent forest.",
+        characters="Aria: a knight.",
+    )
+
+
+class ScriptedChatModel:
+    """
+    배치 요청(bind(response_format=...))에는 정해 둔 응답을, 필드별 요청에는
+    "[EN] 원문" 을 돌려주는 채팅 모델. 받은 프롬프트를 기록합니다.
+    """
+
+    def __init__(self, batch_reply=None, error=None):
+        self.batch_reply = batch_reply
+        self.error = error
+        self.batch_prompts = []
+        self.prompts = []
+
+    def bind(self, **kwargs):
+        return mock.Mock(invoke=self._invoke_batch)
+
+    def _invoke_batch(self, prompt, timeout=None):
+        self.batch_prompts.append(prompt)
+        if self.error is not None:
+            raise self.error
+        return AIMessage(content=self.batch_reply)
+
+    def invoke(self, prompt, timeout=None):
+        self.prompts.append(prompt)
+        return AIMessage(content=f"[EN] {prompt.split(': ', 1)[1]}")
+
+
+@override_settings(**FAKE_PROVIDERS)
+class TranslateBatchTests(TestCase):
+    def translate(self, content, llm, **kwargs):
+        with mock.patch.object(ai_translation, "get_chat_model", return_value=llm):
+            return ai_translation.translate_batch(content, "EN-US", **kwargs)
+
+    def test_translates_all_fields_in_one_request(self):
+        llm = ScriptedChatModel(json.dumps({"title": "The Silent Forest", "genre": "Fantasy"}))
+
+        result = self.translate({"title": "고요한 숲의 기사", "genre": "판타지 소설", "pages": 3}, llm)
+
+        self.assertEqual(result, {"title": "The Silent Forest", "genre": "Fantasy", "pages": "3"})
+        self.assertEqual(len(llm.batch_prompts), 1)
+        self.assertEqual(llm.prompts, [])
+
+    def test_malformed_json_falls_back_to_per_field_translation(self):
+        llm = ScriptedChatModel("Sure! Here is the translation: {title: ...")
+
+        result = self.translate({"title": "붉은 성의 마지막 밤", "genre": "궁정 음모극"}, llm)
+
+        self.assertEqual(result, {"title": "[EN] 붉은 성의 마지막 밤", "genre": "[EN] 궁정 음모극"})
+        self.assertEqual(len(llm.prompts), 2)
+
+    def test_missing_key_falls_back_to_per_field_translation(self):
+        llm = ScriptedChatModel(json.dumps({"0": "The first letter"}))
+
+        result = self.translate(["여왕이 보낸 첫 번째 편지", "전쟁이 시작되기 전날 밤"], llm)
+
+        self.assertEqual(result, ["[EN] 여왕이 보낸 첫 번째 편지", "[EN] 전쟁이 시작되기 전날 밤"])
+
+    def test_provider_error_keeps_originals_or_raises(self):
+        content = {"title": "폭풍이 몰려오는 성벽 위에서"}
+
+        result = self.translate(content, ScriptedChatModel(error=RuntimeError("boom")))
+        self.assertEqual(result, content)
+        with self.assertRaises(RuntimeError):
+            self.translate(content, ScriptedChatModel(error=RuntimeError("boom")), raise_errors=True)
+
+
+class TranslationCacheTests(TestCase):
+    def setUp(self):
+        translation_cache.clear()
+        self.addCleanup(translation_cache.clear)
+
+    def assertCounted(self, stat, action):
+        before = translation_cache.snapshot()[stat]
+        result = action()
+        self.assertEqual(translation_cache.snapshot()[stat], before + 1)
+        return result
+
+    def test_memory_miss_falls_through_to_database(self):
+        translation_cache.put("고요한 숲", "EN-US", "llm", "The silent forest")
+        self.assertEqual(TranslationCache.objects.get().translated_text, "The silent forest")
+        translation_cache.clear()
+
+        found = self.assertCounted(
+            "db_hits", lambda: translation_cache.get("고요한  숲", "en-us", "llm"))
+        self.assertEqual(found, "The silent forest")
+        self.assertEqual(TranslationCache.objects.get().hits, 1)
+        # DB 에서 읽은 값은 LRU 에 다시 올라감
+        self.assertCounted("memory_hits", lambda: translation_cache.get("고요한 숲", "EN-US", "llm"))
+
+    def test_key_includes_language_and_provider(self):
+        translation_cache.put("고요한 숲", "EN-US", "llm", "The silent forest")
+
+        self.assertIsNone(self.assertCounted(
+            "misses", lambda: translation_cache.get("고요한 숲", "EN-US", "deepl")))
+        self.assertIsNone(translation_cache.get("고요한 숲", "JA", "llm"))
+
+    @override_settings(TRANSLATION_CACHE={"MAX_ENTRIES": 2, "PERSIST": False})
+    def test_evicts_least_recently_used_without_persisting(self):
+        for text in ("하나", "둘", "셋"):
+            translation_cache.put(text, "EN-US", "llm", f"translated {text}")
+
+        self.assertIsNone(translation_cache.get("하나", "EN-US", "llm"))
+        self.assertEqual(translation_cache.get("셋", "EN-US", "llm"), "translated 셋")
+        self.assertEqual(translation_cache.snapshot()["memory"]["size"], 2)
+        self.assertFalse(TranslationCache.objects.exists())
+
+
+@override_settings(GENERATION_JOBS=SYNC_JOBS, **FAKE_PROVIDERS)
+class JobTestCase(TestCase):
+    """동기 모드 작업 큐 + 테스트용 작업 종류(echo, boom)"""
+
+    def setUp(self):
+        clients.reset_clients()
+        self.user = User.objects.create_user("writer@example.com", "password", nickname="writer")
+        self.book = create_book(self.user)
+        handlers = mock.patch.dict(jobs.HANDLERS, {
+            "echo": lambda job: {"echo": job.payload["value"]},
+            "boom": self._boom,
+        })
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+    @staticmethod
+    def _boom(job):
+        raise RuntimeError("provider exploded")
+
+    def create_job(self, kind="echo", status=GenerationJob.STATUS_PENDING, **fields):
+        return GenerationJob.objects.create(
+            kind=kind, status=status, payload=fields.pop("payload", {"value": 1}),
+            user=fields.pop("user", self.user), book=fields.pop("book", self.book), **fields)
+
+
+class GenerationJobTests(JobTestCase):
+    def test_enqueue_runs_inline_in_sync_mode(self):
+        job = jobs.enqueue("echo", {"value": 3}, user=self.user, book=self.book)
+
+        self.assertEqual(job.status, GenerationJob.STATUS_SUCCEEDED)
+        self.assertEqual(job.result, {"echo": 3})
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.started_at)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failed_handler_marks_job_failed(self):
+        job = jobs.enqueue("boom", {}, user=self.user, book=self.book)
+
+        self.assertEqual(job.status, GenerationJob.STATUS_FAILED)
+        self.assertEqual(job.error, "provider exploded")
+        self.assertIsNone(job.result)
+
+    def test_claim_next_takes_oldest_pending_job(self):
+        first = self.create_job()
+        self.create_job(kind="boom")
+        self.create_job(status=GenerationJob.STATUS_SUCCEEDED)
+
+        claimed = jobs.claim_next()
+
+        self.assertEqual(claimed.id, first.id)
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.status, GenerationJob.STATUS_RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(jobs.claim_next(kinds=["echo"]))
+
+    def test_release_requeues_until_max_attempts(self):
+        job = self.create_job(status=GenerationJob.STATUS_RUNNING, attempts=1, started_at=timezone.now())
+        self.assertEqual(jobs.release(job.id), GenerationJob.STATUS_PENDING)
+        job.refresh_from_db()
+        self.assertIsNone(job.started_at)
+
+        GenerationJob.objects.filter(pk=job.pk).update(status=GenerationJob.STATUS_RUNNING, attempts=2)
+        self.assertEqual(jobs.release(job.id, "Worker process crashed."), GenerationJob.STATUS_FAILED)
+
+    def test_requeue_stale_running_jobs(self):
+        old = timezone.now() - timedelta(hours=1)
+        retry = self.create_job(status=GenerationJob.STATUS_RUNNING, attempts=1, started_at=old)
+        exhausted = self.create_job(kind="boom", status=GenerationJob.STATUS_RUNNING, attempts=2, started_at=old)
+
+        self.assertEqual(jobs.requeue_stale(), (1, 1))
+        retry.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual(retry.status, GenerationJob.STATUS_PENDING)
+        self.assertEqual(exhausted.status, GenerationJob.STATUS_FAILED)
+
+    def test_wait_returns_when_finished_or_timed_out(self):
+        running = self.create_job(status=GenerationJob.STATUS_RUNNING, started_at=timezone.now())
+        started = time.monotonic()
+        self.assertEqual(jobs.wait(running, timeout=0.05).status, GenerationJob.STATUS_RUNNING)
+        self.assertLess(time.monotonic() - started, 1)
+
+        GenerationJob.objects.filter(pk=running.pk).update(status=GenerationJob.STATUS_SUCCEEDED)
+        self.assertEqual(jobs.wait(running, timeout=1).status, GenerationJob.STATUS_SUCCEEDED)
+
+
+@override_settings(AI_PROVIDER_BACKEND="fake")
+class PromptBuilderTests(TestCase):
+    """가짜 provider 에서는 4글자를 토큰 하나로 세는 대체 인코딩을 씀"""
+
+    def builder(self, budget, history="h" * 40):
+        return (
+            prompt_budget.PromptBuilder(budget)
+            .add("instructions", "i" * 40, priority=10, trim=False)
+            .add_items("examples", ["e" * 16, "f" * 16, "g" * 16], priority=1)
+            .add("history", history, priority=0, keep="tail")
+        )
+
+    def tokens(self, parts):
+        return sum(
+            sum(prompt_budget.count_tokens(item) for item in value) if isinstance(value, list)
+            else prompt_budget.count_tokens(value)
+            for value in parts.values()
+        )
+
+    def test_within_budget_is_unchanged(self):
+        builder = self.builder(100)
+        parts = builder.build()
+
+        self.assertEqual(parts["history"], "h" * 40)
+        self.assertEqual(len(parts["examples"]), 3)
+        self.assertEqual(builder.report["total"], 32)
+
+    def test_trims_lowest_priority_first(self):
+        parts = self.builder(20).build()
+
+        # history(10) 를 먼저 다 잘라도 넘치므로 예시를 뒤에서부터 하나 버림
+        self.assertEqual(parts["history"], "")
+        self.assertEqual(parts["examples"], ["e" * 16, "f" * 16])
+        self.assertEqual(parts["instructions"], "i" * 40)
+        self.assertLessEqual(self.tokens(parts), 20)
+
+    def test_keeps_tail_of_history(self):
+        parts = self.builder(24, history="x" * 16 + "TAIL").build()
+
+        self.assertEqual(parts["history"], "xxxxTAIL")
+        self.assertEqual(len(parts["examples"]), 3)
+
+    def test_never_exceeds_budget_and_keeps_required_sections(self):
+        for budget in range(10, 40):
+            with self.subTest(budget=budget):
+                parts = self.builder(budget).build()
+                self.assertLessEqual(self.tokens(parts), budget)
+                self.assertEqual(parts["instructions"], "i" * 40)
+
+    def test_required_sections_survive_an_impossible_budget(self):
+        builder = self.builder(5)
+        with self.assertLogs(level="WARNING"):
+            parts = builder.build()
+
+        self.assertEqual(parts["instructions"], "i" * 40)
+        self.assertEqual(parts["examples"], [])
+        self.assertEqual(builder.report["total"], 10)
+
+    @override_settings(AI_PROVIDER_BACKEND="openai")
+    def test_falls_back_to_length_estimate_without_tiktoken(self):
+        with mock.patch.object(prompt_budget, "_encoding", None), \
+                mock.patch.object(prompt_budget, "_load_encoding", side_effect=OSError("offline")), \
+                self.assertLogs(level="WARNING"):
+            encoding = prompt_budget.get_encoding()
+            self.assertEqual(prompt_budget.count_tokens("a" * 9), 3)
+
+        self.assertIsInstance(encoding, prompt_budget.ApproximateEncoding)
+        self.assertEqual(encoding.decode(encoding.encode("숲 속의 성")), "숲 속의 성")
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeClock:
+    """resilience 의 time 대신 쓰는 시계. sleep 하면 시간만 앞으로 감"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@override_settings(PROVIDER_RESILIENCE={"default": {
+    "ATTEMPTS": 3, "BASE_DELAY": 0.5, "MAX_DELAY": 8.0, "DEADLINE": 10.0,
+    "FAILURE_THRESHOLD": 3, "RESET_TIMEOUT": 30.0,
+}})
+class ResilienceTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for patcher in (
+            mock.patch.object(resilience, "time", self.clock),
+            # 지터 없이 항상 최대 지연을 고름
+            mock.patch.object(resilience.random, "uniform", side_effect=lambda low, high: high),
+            mock.patch.dict(resilience._breakers, clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def script(self, *outcomes, elapsed=0.0):
+        """호출마다 outcomes 를 차례로 돌려주거나 던지는 func 와 받은 timeout 목록"""
+        outcomes = list(outcomes)
+        timeouts = []
+
+        def func(timeout):
+            timeouts.append(timeout)
+            self.clock.now += elapsed
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        return func, timeouts
+
+    def test_retries_rate_limits_and_server_errors(self):
+        func, timeouts = self.script(ProviderError(429), ProviderError(503), "ok")
+
+        self.assertEqual(resilience.call("test", func), "ok")
+        self.assertEqual(self.clock.sleeps, [0.5, 1.0])
+        self.assertEqual(timeouts, [10.0, 9.5, 8.5])
+
+    def test_does_not_retry_client_errors(self):
+        func, timeouts = self.script(ProviderError(400), "ok")
+
+        with self.assertRaises(ProviderError):
+            resilience.call("test", func)
+        self.assertEqual(len(timeouts), 1)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(resilience.get_breaker("test").state, resilience.CircuitBreaker.CLOSED)
+
+    def test_transient_exceptions_are_retried(self):
+        func, _ = self.script(ConnectionError("reset"), TimeoutError("slow"), "ok")
+
+        self.assertEqual(resilience.call("test", func), "ok")
+
+    def test_gives_up_when_retry_would_pass_deadline(self):
+        func, timeouts = self.script(ProviderError(503), ProviderError(503), "ok", elapsed=4.5)
+
+        with self.assertRaises(resilience.DeadlineExceeded):
+            resilience.call("test", func)
+        # 4.5 + 0.5 + 4.5 = 9.5 초 뒤 다음 백오프(1.0)가 마감(10)을 넘음
+        self.assertEqual(timeouts, [10.0, 5.0])
+
+    def test_exhausts_attempts(self):
+        func, timeouts = self.script(*[ProviderError(503)] * 3)
+
+        with self.assertRaises(ProviderError):
+            resilience.call("test", func)
+        self.assertEqual(len(timeouts), 3)
+
+    def test_circuit_opens_half_opens_and_closes(self):
+        breaker = resilience.get_breaker("test")
+        for _ in range(3):
+            func, _ = self.script(ProviderError(503))
+            with self.assertRaises(ProviderError):
+                resilience.call("test", func, attempts=1)
+        self.assertEqual(breaker.state, resilience.CircuitBreaker.OPEN)
+
+        func, timeouts = self.script("ok")
+        with self.assertRaises(resilience.ProviderUnavailable):
+            resilience.call("test", func)
+        self.assertEqual(timeouts, [])
+
+        # RESET_TIMEOUT 뒤 한 번 시험 호출, 실패하면 바로 다시 열림
+        self.clock.now += 30
+        func, _ = self.script(ProviderError(503))
+        with self.assertRaises(ProviderError):
+            resilience.call("test", func, attempts=1)
+        self.assertEqual(breaker.state, resilience.CircuitBreaker.OPEN)
+
+        self.clock.now += 30
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, resilience.CircuitBreaker.HALF_OPEN)
+        breaker.record_success()
+        self.assertEqual(breaker.state, resilience.CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.snapshot()["opened"], 2)
+
+
+class SingleFlightTests(JobTestCase):
+    def chapter_payload(self, summary=None):
+        return {"book_id": self.book.id, "language": "korean", "summary": summary}
+
+    def test_enqueue_attaches_duplicate_to_active_job(self):
+        payload = {"value": 1}
+        active = self.create_job(
+            fingerprint=jobs.fingerprint("echo", payload, self.user, self.book), payload=payload)
+
+        job = jobs.enqueue("echo", payload, user=self.user, book=self.book)
+
+        self.assertEqual(job.id, active.id)
+        self.assertEqual(GenerationJob.objects.count(), 1)
+
+    def test_second_chapter_for_same_book_conflicts(self):
+        payload = self.chapter_payload("The queen's letter")
+        active = self.create_job(
+            kind=jobs.CHAPTER, payload=payload,
+            fingerprint=jobs.fingerprint(jobs.CHAPTER, payload, self.user, self.book))
+
+        # 같은 요청은 진행 중인 작업에 붙고, 요약이 다른 요청은 같은 챕터 번호로 저장되지 않도록 거절
+        self.assertEqual(jobs.enqueue(jobs.CHAPTER, payload, user=self.user, book=self.book).id, active.id)
+        with self.assertRaises(jobs.JobConflict):
+            jobs.enqueue(jobs.CHAPTER, self.chapter_payload("The storm"), user=self.user, book=self.book)
+
+        other_book = create_book(self.user, title="Another Book")
+        GenerationJob.objects.filter(pk=active.pk).update(status=GenerationJob.STATUS_SUCCEEDED)
+        with mock.patch.dict(jobs.HANDLERS, {jobs.CHAPTER: lambda job: {"chapter_num": 0}}):
+            self.assertEqual(
+                jobs.enqueue(jobs.CHAPTER, self.chapter_payload("The storm"),
+                             user=self.user, book=self.book).status,
+                GenerationJob.STATUS_SUCCEEDED)
+            jobs.enqueue(jobs.CHAPTER, {**self.chapter_payload(), "book_id": other_book.id},
+                         user=self.user, book=other_book)
+
+    def test_chapter_endpoint_returns_conflict(self):
+        self.create_job(kind=jobs.CHAPTER, payload=self.chapter_payload("The queen's letter"))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post(f"/api/books/{self.book.id}/", {"summary": "The storm"}, format="json")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(GenerationJob.objects.filter(kind=jobs.CHAPTER).count(), 1)
+
+    def test_per_user_limit(self):
+        self.create_job(status=GenerationJob.STATUS_RUNNING, started_at=timezone.now())
+
+        with override_settings(GENERATION_JOBS={**SYNC_JOBS, "PER_USER_LIMITS": {"echo": 1}}):
+            with self.assertRaises(jobs.JobLimitExceeded):
+                jobs.enqueue("echo", {"value": 2}, user=self.user, book=self.book)
+            other = User.objects.create_user("reader@example.com", "password", nickname="reader")
+            self.assertEqual(jobs.enqueue("echo", {"value": 2}, user=other).status,
+                             GenerationJob.STATUS_SUCCEEDED)
+
+    def test_started_job_conflicts_and_absorbs_duplicates(self):
+        payload = self.chapter_payload()
+        job = jobs.start(jobs.CHAPTER, payload, user=self.user, book=self.book)
+        self.assertEqual(job.status, GenerationJob.STATUS_RUNNING)
+
+        with self.assertRaises(jobs.JobConflict):
+            jobs.start(jobs.CHAPTER, {**payload, "language": "EN-US"}, user=self.user, book=self.book)
+        self.assertEqual(jobs.enqueue(jobs.CHAPTER, payload, user=self.user, book=self.book).id, job.id)
+
+        self.assertTrue(jobs.finish(job, result={"chapter_num": 0}))
+        job.refresh_from_db()
+        self.assertEqual(job.status, GenerationJob.STATUS_SUCCEEDED)
+        self.assertFalse(jobs.finish(job, error="late"))
+
+
+@override_settings(ELEMENTS_CACHE={"ENABLED": True, "MAX_ENTRIES": 16, "TTL": 60, "VARIANTS": 3})
+class ElementsCacheTests(TestCase):
+    PROMPT = "중세 판타지 소설"
+
+    def setUp(self):
+        elements_cache.clear()
+        self.addCleanup(elements_cache.clear)
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+        patcher = mock.patch(
+            "books.generators.elements_generator.generate_elements", side_effect=self.generate)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def generate(self, prompt, language):
+        with self.calls_lock:
+            self.calls += 1
+            number = self.calls
+        return {"title": f"Title {number}", "genre": "Fantasy"}
+
+    def test_collects_variants_then_serves_copies(self):
+        titles = {elements_cache.get_elements(self.PROMPT, "korean")["title"] for _ in range(3)}
+        self.assertEqual(titles, {"Title 1", "Title 2", "Title 3"})
+
+        cached = elements_cache.get_elements("  중세 판타지 소설.", "korean")
+        self.assertIn(cached["title"], titles)
+        self.assertEqual(self.calls, 3)
+        cached["user_id"] = 1
+        self.assertNotIn("user_id", elements_cache.get_elements(self.PROMPT, "korean"))
+
+    def test_concurrent_generations_keep_every_variant(self):
+        barrier = threading.Barrier(3)
+
+        def generate(prompt, language):
+            # 세 스레드가 모두 빈 캐시를 읽은 뒤에 저장하도록 맞춤
+            barrier.wait(timeout=5)
+            return self.generate(prompt, language)
+
+        with mock.patch("books.generators.elements_generator.generate_elements", side_effect=generate):
+            threads = [threading.Thread(target=elements_cache.get_elements, args=(self.PROMPT, "korean"))
+                       for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        before = elements_cache.snapshot()["hits"]
+        elements_cache.get_elements(self.PROMPT, "korean")
+        self.assertEqual(elements_cache.snapshot()["hits"], before + 1)
+        self.assertEqual(self.calls, 3)
+
+    def test_disabled_by_settings(self):
+        with override_settings(ELEMENTS_CACHE={"ENABLED": False}):
+            elements_cache.get_elements(self.PROMPT, "korean")
+            elements_cache.get_elements(self.PROMPT, "korean")
+        self.assertEqual(self.calls, 2)
+        self.assertFalse(elements_cache.snapshot()["memory"]["size"])
+
+
+@override_settings(METRICS_TOKEN="scrape-secret")
+class MetricsEndpointTests(TestCase):
+    URL = "/api/books/metrics/"
+
+    def setUp(self):
+        self.client = APIClient()
+        metrics.record_call("test", "fake", 0.2, "ok")
+
+    def test_rejects_scrape_without_valid_token(self):
+        self.assertEqual(self.client.get(self.URL).status_code, 401)
+        response = self.client.get(self.URL, HTTP_X_METRICS_TOKEN="wrong")
+        self.assertEqual(response.status_code, 401)
+
+        user = User.objects.create_user("writer@example.com", "password", nickname="writer")
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get(self.URL).status_code, 401)
+
+    def test_token_scrape_renders_prometheus_text(self):
+        response = self.client.get(self.URL, HTTP_X_METRICS_TOKEN="scrape-secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+
+        lines = response.content.decode().splitlines()
+        self.assertIn("# TYPE storyteller_provider_calls_total counter", lines)
+        self.assertIn("# TYPE storyteller_provider_call_seconds histogram", lines)
+        self.assertIn("# TYPE storyteller_circuit_state gauge", lines)
+        self.assertIn('storyteller_provider_call_seconds_bucket{stage="test",provider="fake",le="+Inf"} '
+                      + str(metrics.provider_latency.values[("test", "fake")]["count"]), lines)
+        self.assertTrue(any(line.startswith('storyteller_provider_calls_total{stage="test",provider="fake",'
+                                            'outcome="ok"} ') for line in lines))
+
+    def test_staff_can_scrape_without_token(self):
+        staff = User.objects.create_user("admin@example.com", "password", nickname="admin", is_staff=True)
+        self.client.force_authenticate(staff)
+        self.assertEqual(self.client.get(self.URL).status_code, 200)
+
+    def test_label_values_are_escaped(self):
+        sample = metrics._format_sample("storyteller_test_total", ("name",), ('say "hi"\n',), 1.0)
+        self.assertEqual(sample, r'storyteller_test_total{name="say \"hi\"\n"} 1')
+
+
+@override_settings(**FAKE_PROVIDERS)
+class FakeProviderTests(TestCase):
+    def setUp(self):
+        clients.reset_clients()
+        self.addCleanup(clients.reset_clients)
+        patcher = mock.patch.object(fake_providers, "_rng", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_settings(self, **overrides):
+        return override_settings(FAKE_PROVIDER={**FAKE_PROVIDERS["FAKE_PROVIDER"], **overrides})
+
+    def failures(self, n):
+        pattern = []
+        for _ in range(n):
+            try:
+                fake_providers._maybe_fail("llm")
+                pattern.append(False)
+            except fake_providers.FakeProviderError:
+                pattern.append(True)
+        return pattern
+
+    def test_same_prompt_and_seed_give_same_output(self):
+        llm = clients.get_chat_model()
+        self.assertIsInstance(llm, fake_providers.FakeChatModel)
+        first = llm.invoke("Write the prologue of a fantasy novel").content
+        self.assertEqual(llm.invoke("Write the prologue of a fantasy novel").content, first)
+        self.assertEqual("".join(chunk.content for chunk in llm.stream("Write the prologue of a fantasy novel")), first)
+        self.assertNotEqual(llm.invoke("Write the epilogue of a fantasy novel").content, first)
+
+        with self.fake_settings(FAILURE_RATE=0.5, SEED=3):
+            pattern = self.failures(20)
+            fake_providers._rng = None
+            self.assertEqual(self.failures(20), pattern)
+        self.assertIn(True, pattern)
+        self.assertIn(False, pattern)
+
+    @override_settings(PROVIDER_RESILIENCE={"default": {
+        "ATTEMPTS": 3, "BASE_DELAY": 0.5, "MAX_DELAY": 8.0, "DEADLINE": 10.0,
+        "FAILURE_THRESHOLD": 5, "RESET_TIMEOUT": 30.0,
+    }})
+    def test_failure_rate_raises_503_that_resilience_retries(self):
+        clock = FakeClock()
+        llm = clients.get_chat_model()
+        with mock.patch.object(resilience, "time", clock), \
+                mock.patch.dict(resilience._breakers, clear=True):
+            # SEED 7 의 첫 두 난수(0.32, 0.15)는 실패, 세 번째(0.65)는 성공
+            with self.fake_settings(FAILURE_RATE=0.5, SEED=7):
+                reply = resilience.call("llm", lambda timeout: llm.invoke("Hello"))
+            self.assertEqual(reply.content, fake_providers.fake_reply("human: Hello"))
+            self.assertEqual(len(clock.sleeps), 2)
+
+            with self.fake_settings(FAILURE_RATE=1.0):
+                with self.assertRaises(fake_providers.FakeProviderError) as raised:
+                    resilience.call("llm", lambda timeout: llm.invoke("Hello"))
+            self.assertEqual(resilience.status_code_of(raised.exception), 503)
+            self.assertEqual(len(clock.sleeps), 4)
+
+    def test_fake_image_urls_download_as_png(self):
+        from PIL import Image
+
+        response = clients.get_openai_client().images.generate(prompt="A castle at dawn", size="64x32")
+        url = response.data[0].url
+        self.assertTrue(url.startswith("fake://"))
+
+        image = downloads.open_image(url, "castle.png")
+        data = image.read()
+        self.assertTrue(data.startswith(b"\x89PNG"))
+        image.seek(0)
+        self.assertEqual(Image.open(image).size, (64, 32))
+        self.assertEqual(downloads.open_image(url, "castle.png").read(), data)
+
+
+class LanguageDetectionTests(TestCase):
+    def test_detects_scripts(self):
+        self.assertEqual(language_detection.detect("오늘은 숲으로 떠나는 날이다."), "ko")
+        self.assertEqual(language_detection.detect("これは森の物語です。"), "ja")
+        self.assertEqual(language_detection.detect("我们今天去森林。"), "zh")
+        self.assertEqual(language_detection.detect("Рыцарь вошёл в лес."), "ru")
+
+    def test_detects_latin_languages_by_stopwords(self):
+        self.assertEqual(language_detection.detect("The knight and the queen walked to the castle."), "en")
+        self.assertEqual(language_detection.detect("Der Ritter und die Königin sind nicht mit dem Heer."), "de")
+        self.assertEqual(language_detection.detect("Le chevalier et la reine sont dans les bois."), "fr")
+
+    def test_short_phrases_without_stopwords_are_inconclusive(self):
+        for phrase in ("Hola mundo", "Bonjour mon ami", "Guten Morgen", "Ciao bella", "Dark Fantasy"):
+            with self.subTest(phrase=phrase):
+                self.assertIsNone(language_detection.detect(phrase))
+
+    def test_unknown_text(self):
+        self.assertIsNone(language_detection.detect("1234 !!"))
+        self.assertIsNone(language_detection.detect(None))
+        self.assertIsNone(language_detection.detect("lorem ipsum dolor sit amet consectetur adipiscing elit"))
+
+    def test_normalize_language(self):
+        self.assertEqual(language_detection.normalize_language("EN-US"), "en")
+        self.assertEqual(language_detection.normalize_language("Korean"), "ko")
+        self.assertEqual(language_detection.normalize_language("pt_BR"), "pt")
+        self.assertIsNone(language_detection.normalize_language(""))
+
+    def test_should_translate_skips_text_already_in_target_language(self):
+        before = language_detection.snapshot()["skipped"]
+        self.assertFalse(language_detection.should_translate(
+            "The knight and the queen walked to the castle.", "EN-US", "deepl"))
+        self.assertTrue(language_detection.should_translate("오늘은 숲으로 떠나는 날이다.", "EN-US", "deepl"))
+        self.assertTrue(language_detection.should_translate("Hola mundo", "EN-US", "deepl"))
+        self.assertEqual(language_detection.snapshot()["skipped"], before + 1)
+
+
+@override_settings(TRANSLATION_ROUTER={"EXPLORE_RATE": 0}, **FAKE_PROVIDERS)
+class TranslationRouterTests(TestCase):
+    TEXTS = {"title": "고요한 숲의 기사", "genre": "판타지"}
+
+    def setUp(self):
+        self.called = []
+        for patcher in (
+            mock.patch.dict(translation_router._latency, clear=True),
+            mock.patch.dict(resilience._breakers, clear=True),
+            mock.patch.dict(translation_router.TRANSLATORS, {
+                "deepl": self.translator("deepl"), "llm": self.translator("llm")}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.failing = set()
+        self.cached = set()
+
+    def translator(self, provider):
+        def translate(texts, language):
+            self.called.append(provider)
+            if provider in self.cached:
+                return {key: f"[{provider}] {text}" for key, text in texts.items()}
+
+            def request(timeout):
+                if provider in self.failing:
+                    raise ValueError(f"{provider} rejected the request")
+                return {key: f"[{provider}] {text}" for key, text in texts.items()}
+
+            return resilience.call(translation_router._breaker_name(provider), request, attempts=1)
+        return translate
+
+    def routed(self, provider, outcome):
+        return translation_router.routed_total.values[(provider, "small", outcome)]
+
+    def test_prefers_provider_with_lower_latency_estimate(self):
+        self.assertEqual(translation_router.candidates("EN-US", 100), ["deepl", "llm"])
+        self.assertEqual(translation_router.candidates("Swahili", 100), ["llm"])
+
+        translation_router.observe("deepl", "small", 5.0)
+        self.assertEqual(translation_router.candidates("EN-US", 100), ["llm", "deepl"])
+
+    def test_failing_deepl_fails_over_to_llm(self):
+        self.failing.add("deepl")
+        before = self.routed("deepl", "failover")
+
+        result = translation_router.translate(self.TEXTS, "EN-US")
+
+        self.assertEqual(result, {"title": "[llm] 고요한 숲의 기사", "genre": "[llm] 판타지"})
+        self.assertEqual(self.called, ["deepl", "llm"])
+        self.assertEqual(self.routed("deepl", "failover"), before + 1)
+        self.assertIn(("llm", "small"), translation_router._latency)
+        self.assertNotIn(("deepl", "small"), translation_router._latency)
+
+    def test_all_providers_failing_returns_originals(self):
+        self.failing.update({"deepl", "llm"})
+
+        self.assertEqual(translation_router.translate(["고요한 숲의 기사"], "EN-US"), ["고요한 숲의 기사"])
+        self.assertEqual(self.called, ["deepl", "llm"])
+
+    def test_open_circuit_moves_provider_to_the_back(self):
+        breaker = resilience.get_breaker("deepl")
+        with mock.patch.object(breaker, "state", resilience.CircuitBreaker.OPEN):
+            self.assertEqual(translation_router.candidates("EN-US", 100), ["llm", "deepl"])
+
+    def test_cached_or_skipped_requests_do_not_move_latency_estimate(self):
+        self.cached.add("deepl")
+        before = self.routed("deepl", "cached")
+
+        self.assertEqual(translation_router.translate("고요한 숲의 기사", "EN-US"), "[deepl] 고요한 숲의 기사")
+
+        self.assertEqual(translation_router._latency, {})
+        self.assertEqual(self.routed("deepl", "cached"), before + 1)
+        self.assertEqual(translation_router.estimated_latency("deepl", "small"), 0.6)
+
+
+class RecommendationParserTests(TestCase):
+    def tool_call(self, args, name="Recommendations"):
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": "call_1"}])
+
+    def items(self, count, **extra):
+        return [{"Title": f"Event {i}", "Description": f"Something happens {i}.", **extra}
+                for i in range(count)]
+
+    def test_text_parser_reads_decorated_lines(self):
+        text = "\n".join([
+            "Here are my ideas:",
+            "1. **Title:** The hidden map",
+            "   **Description:** 'James finds a map in the desk.'",
+            "- title: An orphaned title",
+            "- Title: The informant returns",
+            "- Description: The man in the dark coat is back.",
+            "### Title: The last letter",
+            "Description: The queen's letter is decoded.",
+            "Title: One too many",
+            "Description: Ignored.",
+        ])
+
+        self.assertEqual(summary_generator.parse_recommendations(text), [
+            {"Title": "The hidden map", "Description": "James finds a map in the desk."},
+            {"Title": "The informant returns", "Description": "The man in the dark coat is back."},
+            {"Title": "The last letter", "Description": "The queen's letter is decoded."},
+        ])
+        self.assertEqual(summary_generator.parse_recommendations("No recommendations today."), [])
+
+    def test_structured_tool_call_is_validated(self):
+        parsed = summary_generator._parse_structured(self.tool_call({"recommendations": self.items(3)}))
+
+        self.assertEqual([item.Title for item in parsed.recommendations], ["Event 0", "Event 1", "Event 2"])
+        self.assertIsNone(summary_generator._parse_structured(AIMessage(content="Title: x")))
+        self.assertIsNone(summary_generator._parse_structured(
+            self.tool_call({"recommendations": self.items(3)}, name="Other")))
+
+    def test_malformed_tool_args_fall_back_to_lenient_parsing(self):
+        items = [{"title": "Lowercase keys", "description": "Still usable."}, "not a dict",
+                 {"Title": "No description"}, *self.items(2)]
+        message = self.tool_call({"recommendations": items})
+
+        self.assertIsNone(summary_generator._parse_structured(message))
+        self.assertIsNone(summary_generator._parse_structured(self.tool_call({"recommendations": "oops"})))
+        self.assertEqual(summary_generator._from_tool_call(message), [
+            {"Title": "Lowercase keys", "Description": "Still usable."},
+            {"Title": "Event 0", "Description": "Something happens 0."},
+            {"Title": "Event 1", "Description": "Something happens 1."},
+        ])
+
+    @override_settings(**FAKE_PROVIDERS)
+    def test_fake_model_tool_call_parses(self):
+        llm = fake_providers.FakeChatModel()
+        raw = llm.bind_tools(
+            [summary_generator.Recommendations], tool_choice="Recommendations",
+        ).invoke("Provide three recommendations for the next chapter")
+
+        parsed = summary_generator._parse_structured(raw)
+        self.assertEqual(len(parsed.recommendations), 3)
+
+
+@override_settings(BULK_SYNOPSIS={"MAX_PROMPTS": 10, "CONCURRENCY": 4, "BATCH_SIZE": 10, "GLOBAL_CONCURRENCY": 2})
+class BulkSynopsisTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "editor@example.com", "password", nickname="editor", is_staff=True)
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        for patcher in (
+            mock.patch.object(bulk, "_slots", None),
+            mock.patch.object(elements_cache, "get_elements", side_effect=self.generate),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def generate(self, prompt, language):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(0.02)
+            if "broken" in prompt:
+                raise RuntimeError("provider exploded")
+            return {"title": prompt.title(), "genre": "Fantasy", "theme": "Courage", "tone": "Tense",
+                    "setting": "A castle at the edge of a silent forest.", "characters": "Aria"}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def run_bulk(self, prompts):
+        results = list(bulk.generate_synopses(prompts, "korean", self.user, ["bulk"]))
+        return {item["index"]: item for item in results}
+
+    def test_failed_generation_does_not_affect_other_prompts(self):
+        results = self.run_bulk(["first tale", "broken tale", "third tale"])
+
+        self.assertEqual({index: item["status"] for index, item in results.items()},
+                         {0: "created", 1: "failed", 2: "created"})
+        self.assertEqual(sorted(Book.objects.values_list("title", flat=True)), ["First Tale", "Third Tale"])
+        self.assertEqual(Book.objects.filter(tags__name="bulk").count(), 2)
+
+    def test_generations_share_a_process_wide_limit(self):
+        self.assertIs(bulk._global_slots(), bulk._global_slots())
+        # 일괄 요청 두 개가 CONCURRENCY(4)씩 동시에 생성하는 상황
+        threads = [threading.Thread(target=bulk._generate, args=(f"tale {i}", "korean")) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.peak, 2)
+
+    def test_database_error_saves_the_rest_of_the_batch(self):
+        bulk_create = Book.objects.bulk_create
+
+        def failing_bulk_create(books, *args, **kwargs):
+            if any(book.title == "Cursed Tale" for book in books):
+                raise IntegrityError("constraint failed")
+            return bulk_create(books, *args, **kwargs)
+
+        with mock.patch.object(Book.objects, "bulk_create", side_effect=failing_bulk_create):
+            results = self.run_bulk(["first tale", "cursed tale", "third tale"])
+
+        self.assertEqual({index: item["status"] for index, item in results.items()},
+                         {0: "created", 1: "failed", 2: "created"})
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertEqual(Book.objects.filter(tags__name="bulk").count(), 2)
+
+    def test_rejects_languages_no_provider_supports(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for language in ("Klingon", "", None, "xx-YY"):
+            with self.subTest(language=language):
+                response = client.post("/api/books/bulk/", {"prompts": ["a tale"], "language": language},
+                                       format="json")
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Book.objects.exists())
+
+        for language in ("korean", "EN-GB", "Italian", "pt-BR"):
+            with self.subTest(language=language):
+                self.assertTrue(translation_router.supports(language))
+
+
+class PrologueDraftTests(JobTestCase):
+    def test_run_job_does_not_run_cancelled_job(self):
+        job = self.create_job(status=GenerationJob.STATUS_FAILED, error="Superseded by chapter request.")
+
+        with mock.patch.dict(jobs.HANDLERS, {"echo": mock.Mock()}) as handlers:
+            jobs.run_job(job.id)
+            handlers["echo"].assert_not_called()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, GenerationJob.STATUS_FAILED)
+        self.assertEqual(job.attempts, 0)
+
+    def test_run_job_discards_result_of_job_cancelled_while_running(self):
+        def cancel_midway(job):
+            GenerationJob.objects.filter(pk=job.pk).update(
+                status=GenerationJob.STATUS_FAILED, error="Superseded by chapter request.")
+            return {"echo": 1}
+
+        job = self.create_job()
+        with mock.patch.dict(jobs.HANDLERS, {"echo": cancel_midway}):
+            jobs.run_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, GenerationJob.STATUS_FAILED)
+        self.assertIsNone(job.result)
+
+
+    def test_prologue_draft_is_taken_by_chapter_request(self):
+        job = jobs.enqueue(jobs.PROLOGUE_DRAFT, {"book_id": self.book.id, "language": "korean"},
+                           user=self.user, book=self.book)
+        self.assertEqual(job.status, GenerationJob.STATUS_SUCCEEDED)
+
+        original, translated = services.take_prologue_draft(self.book, "korean")
+
+        self.assertEqual(original, job.result["prologue"])
+        self.assertEqual(translated, original)
+        self.assertFalse(GenerationJob.objects.filter(kind=jobs.PROLOGUE_DRAFT).exists())
+
+    def test_pending_prologue_draft_is_superseded(self):
+        job = self.create_job(kind=jobs.PROLOGUE_DRAFT, payload={"book_id": self.book.id})
+
+        self.assertIsNone(services.take_prologue_draft(self.book, "korean"))
+        self.assertFalse(GenerationJob.objects.filter(pk=job.pk).exists())
+        # 취소된 초안은 나중에 실행되더라도 다시 running 으로 살아나지 않음
+        self.assertIsNone(jobs.run_job(job.id))
+
+    def test_running_prologue_draft_is_superseded_after_wait(self):
+        job = self.create_job(kind=jobs.PROLOGUE_DRAFT, status=GenerationJob.STATUS_RUNNING,
+                              payload={"book_id": self.book.id}, started_at=timezone.now())
+
+        # DRAFT_WAIT(0) 안에 끝나지 않았으므로 취소하고 챕터 쪽에서 직접 생성
+        self.assertIsNone(services.take_prologue_draft(self.book, "korean"))
+        self.assertFalse(GenerationJob.objects.filter(pk=job.pk).exists())
+
+
+class ChapterImageJobTests(JobTestCase):
+    def setUp(self):
+        super().setUp()
+        self.chapter = Chapter.objects.create(book_id=self.book, content="Prologue")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_claim_next_skips_saturated_kinds(self):
+        self.create_job(status=GenerationJob.STATUS_RUNNING, started_at=timezone.now())
+        pending = self.create_job()
+
+        with override_settings(GENERATION_JOBS={**SYNC_JOBS, "KIND_LIMITS": {"echo": 1}}):
+            self.assertIsNone(jobs.claim_next())
+        self.assertEqual(jobs.claim_next().id, pending.id)
+
+
+    def test_sync_mode_runs_image_job_in_background(self):
+        with mock.patch.object(jobs.executors, "submit_background") as submit:
+            response = self.client.post(f"/api/books/chapters/{self.chapter.id}/generate-image/", {}, format="json")
+
+        self.assertEqual(response.status_code, 202)
+        job = GenerationJob.objects.get(id=response.data["job_id"])
+        self.assertEqual(job.status, GenerationJob.STATUS_PENDING)
+        submit.assert_called_once_with(jobs.run_limited, job.id, jobs.CHAPTER_IMAGE)
+
+    def test_run_limited_respects_kind_limits(self):
+        active, peak = 0, 0
+        lock = threading.Lock()
+
+        def run_job(job_id):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+        with override_settings(GENERATION_JOBS={**SYNC_JOBS, "KIND_LIMITS": {"echo": 2}}), \
+                mock.patch.object(jobs, "run_job", side_effect=run_job):
+            threads = [threading.Thread(target=jobs.run_limited, args=(i, "echo")) for i in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(peak, 2)
+
+
+class FakeResponse:
+    """requests 스트리밍 응답 대역. iter_content 가 청크를 내보낼 때마다 on_chunk 를 부름"""
+
+    def __init__(self, chunks, content_type="image/png", length=None, on_chunk=None):
+        self.chunks = chunks
+        self.headers = {"Content-Type": content_type}
+        if length is not None:
+            self.headers["Content-Length"] = str(length)
+        self.on_chunk = on_chunk
+        self.consumed = 0
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            if self.on_chunk:
+                self.on_chunk()
+            self.consumed += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+@override_settings(IMAGE_DOWNLOAD={
+    "POOL_SIZE": 1, "CONNECT_TIMEOUT": 5.0, "READ_TIMEOUT": 30.0, "MAX_BYTES": 100, "CHUNK_SIZE": 16,
+})
+class ImageDownloadTests(TestCase):
+    URL = "https://images.example.com/castle.png"
+
+    def open(self, response, **kwargs):
+        session = mock.Mock()
+        session.get.return_value = response
+        with mock.patch.object(downloads, "get_download_session", return_value=session):
+            return downloads.open_image(self.URL, "castle.png", **kwargs), session
+
+    def test_streams_body_within_limit(self):
+        response = FakeResponse([b"x" * 40, b"y" * 40], length=80)
+
+        image, session = self.open(response)
+
+        self.assertEqual(image.size, 80)
+        self.assertEqual(response.consumed, 0)
+        self.assertEqual(image.read(), b"x" * 40 + b"y" * 40)
+        self.assertEqual(image.bytes_read, 80)
+        image.close()
+        self.assertTrue(response.closed)
+        session.get.assert_called_once_with(self.URL, stream=True, timeout=(5.0, 30.0))
+
+    def test_rejects_oversized_content_length_before_reading(self):
+        response = FakeResponse([b"x" * 200], length=200)
+
+        with self.assertRaises(downloads.ImageTooLarge):
+            self.open(response)
+        self.assertEqual(response.consumed, 0)
+        self.assertTrue(response.closed)
+
+    def test_stops_oversized_body_while_streaming(self):
+        # Content-Length 없이 오는 응답은 읽는 도중에 잘라냄
+        response = FakeResponse([b"x" * 60, b"y" * 60, b"z" * 60])
+
+        image, _ = self.open(response)
+        self.assertIsNone(image.size)
+        with self.assertRaises(downloads.ImageTooLarge):
+            image.read()
+        self.assertEqual(response.consumed, 2)
+
+    def test_rejects_non_image_response(self):
+        response = FakeResponse([b"<html>"], content_type="text/html")
+
+        with self.assertRaises(downloads.ImageDownloadError):
+            self.open(response)
+        self.assertTrue(response.closed)
+
+    def test_timeout_limits_whole_download(self):
+        clock = FakeClock()
+
+        def slow_chunk():
+            clock.now += 2
+
+        response = FakeResponse([b"x" * 10] * 5, on_chunk=slow_chunk)
+        with mock.patch.object(downloads, "time", clock):
+            image, session = self.open(response, timeout=3)
+            with self.assertRaises(TimeoutError):
+                image.read()
+
+        self.assertEqual(response.consumed, 2)
+        session.get.assert_called_once_with(self.URL, stream=True, timeout=(3, 3))
+
+
+def png_bytes(size, color=(200, 40, 40, 128)):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGBA", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@override_settings(IMAGE_VARIANTS={"SIZES": {"thumb": 64, "medium": 160}, "FORMATS": ["webp", "jpeg"], "QUALITY": 80})
+class ImageVariantsTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        user = User.objects.create_user("writer@example.com", "password", nickname="writer")
+        self.book = create_book(user)
+        self.book.image.save("castle.png", ContentFile(png_bytes((400, 200))))
+
+    def open_variant(self, name):
+        from PIL import Image
+
+        with self.book.image.storage.open(name, "rb") as f:
+            image = Image.open(f)
+            image.load()
+        return image
+
+    def test_builds_webp_and_jpeg_variants_per_size(self):
+        self.assertIsNone(image_variants.variant_urls(self.book))
+        self.assertTrue(image_variants.update_variants(self.book, "image"))
+
+        variants = self.book.image_variants
+        self.assertEqual(variants["source"], self.book.image.name)
+        for size_key, expected in (("thumb", (64, 32)), ("medium", (160, 80))):
+            for fmt, pil_format in (("webp", "WEBP"), ("jpeg", "JPEG")):
+                with self.subTest(size=size_key, fmt=fmt):
+                    image = self.open_variant(variants[size_key][fmt])
+                    self.assertEqual(image.format, pil_format)
+                    self.assertEqual(image.size, expected)
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.image_variants, variants)
+        self.assertEqual(set(image_variants.variant_urls(self.book)), {"thumb", "medium"})
+        self.assertFalse(image_variants.update_variants(self.book, "image"))
+
+    def test_rebuilds_when_source_changes(self):
+        image_variants.update_variants(self.book, "image")
+        previous = self.book.image_variants
+
+        self.book.image.save("forest.png", ContentFile(png_bytes((100, 300), color=(20, 120, 40, 255))))
+        self.assertTrue(image_variants.is_stale(self.book, "image"))
+        self.assertIsNone(image_variants.variant_urls(self.book))
+        self.assertTrue(image_variants.update_variants(self.book, "image"))
+
+        variants = self.book.image_variants
+        self.assertEqual(variants["source"], self.book.image.name)
+        self.assertNotEqual(variants["thumb"], previous["thumb"])
+        self.assertEqual(self.open_variant(variants["thumb"]["jpeg"]).size, (21, 64))
+        self.assertEqual(self.open_variant(variants["medium"]["webp"]).size, (53, 160))
+
+
+class MediaTestCase(TestCase):
+    """임시 MEDIA_ROOT 위의 content-addressed 스토리지"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.storage = ContentAddressedFileSystemStorage(location=self.media_root)
+
+    def write_raw(self, name, data=b"raw"):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def age(self, path, seconds):
+        past = time.time() - seconds
+        os.utime(path, (past, past))
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+    def test_same_content_is_stored_once_and_counted(self):
+        first = self.storage.save("books/a.png", ContentFile(b"image-bytes"))
+        second = self.storage.save("chapters/b.png", ContentFile(b"image-bytes"))
+
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith("blobs/"))
+        self.assertTrue(first.endswith(".png"))
+        self.assertTrue(self.storage.exists(first))
+        self.assertEqual(StoredBlob.objects.get(name=first).refcount, 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(self.storage.path(first)))), 1)
+
+    def test_delete_only_drops_reference(self):
+        name = self.storage.save("books/a.png", ContentFile(b"image-bytes"))
+        self.storage.save("books/a.png", ContentFile(b"image-bytes"))
+
+        self.storage.delete(name)
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 1)
+        self.storage.delete(name)
+        self.storage.delete(name)
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 0)
+        self.assertTrue(self.storage.exists(name))
+
+    def test_saving_again_restores_missing_file(self):
+        name = self.storage.save("books/a.png", ContentFile(b"image-bytes"))
+        self.storage.purge(name)
+
+        self.assertEqual(self.storage.save("books/a.png", ContentFile(b"image-bytes")), name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 2)
+
+    def test_retain_and_plain_files(self):
+        name = self.storage.save("books/a.png", ContentFile(b"image-bytes"))
+        self.assertTrue(self.storage.retain(name))
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 2)
+        self.assertFalse(self.storage.retain("blobs/00/missing.png"))
+
+        self.write_raw("books/legacy.png")
+        self.storage.delete("books/legacy.png")
+        self.assertFalse(self.storage.exists("books/legacy.png"))
+
+
+    def test_file_removed_by_gc_before_reference_is_uploaded_again(self):
+        name = self.storage.save("books/a.png", ContentFile(b"image-bytes"))
+        StoredBlob.objects.filter(name=name).update(refcount=0)
+        exists = self.storage.exists
+        checks = []
+
+        def exists_then_collected(blob_name):
+            # 처음 확인할 때는 파일이 있었지만 참조를 올리기 전에 gc_media 가 지움
+            checks.append(blob_name)
+            if len(checks) == 1:
+                self.storage.purge(blob_name)
+                return True
+            return exists(blob_name)
+
+        with mock.patch.object(self.storage, "exists", side_effect=exists_then_collected):
+            self.assertEqual(self.storage.save("chapters/b.png", ContentFile(b"image-bytes")), name)
+
+        self.assertEqual(len(checks), 2)
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b"image-bytes")
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 1)
+
+
+class GcMediaTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch("books.management.commands.gc_media.default_storage", self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def gc_media(self, *args):
+        out = StringIO()
+        call_command("gc_media", *args, "--grace", "60", stdout=out)
+        return out.getvalue()
+
+    def unreferenced_blob(self, data=b"orphan-blob", refcount=0):
+        name = self.storage.save("chapters/a.png", ContentFile(data))
+        StoredBlob.objects.filter(name=name).update(
+            refcount=refcount, last_referenced_at=timezone.now() - timedelta(hours=1))
+        return name
+
+    def test_dry_run_reports_without_deleting(self):
+        blob = self.unreferenced_blob(refcount=3)
+        orphan = self.write_raw("books/old.png")
+        self.age(orphan, 3600)
+        fresh = self.write_raw("books/new.png")
+
+        output = self.gc_media("--dry-run")
+
+        self.assertIn(f"[dry-run] delete {blob}", output)
+        self.assertIn("[dry-run] delete books/old.png", output)
+        self.assertNotIn("books/new.png", output)
+        self.assertIn("0 refcounts reconciled, would remove 1 blobs and 1 orphaned files", output)
+        self.assertTrue(self.storage.exists(blob))
+        self.assertTrue(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(fresh))
+        self.assertEqual(StoredBlob.objects.get(name=blob).refcount, 3)
+
+    def test_removes_unreferenced_blobs_after_grace_period(self):
+        blob = self.unreferenced_blob()
+        recent = self.storage.save("chapters/b.png", ContentFile(b"recent-blob"))
+        self.storage.delete(recent)
+
+        output = self.gc_media()
+
+        self.assertIn("removed 1 blobs", output)
+        self.assertFalse(self.storage.exists(blob))
+        self.assertFalse(StoredBlob.objects.filter(name=blob).exists())
+        self.assertTrue(self.storage.exists(recent))
+
+    def test_keeps_blobs_referenced_by_image_cache(self):
+        blob = self.unreferenced_blob()
+        ImagePromptCache.objects.create(
+            key="k" * 64, prompt="castle", model="dall-e-3", size="1024x1024", image_name=blob)
+
+        output = self.gc_media()
+
+        self.assertIn("1 refcounts reconciled, removed 0 blobs", output)
+        self.assertEqual(StoredBlob.objects.get(name=blob).refcount, 1)
+
+
+class ImageCacheTests(MediaTestCase):
+    PROMPT = "A castle at the edge of a silent forest"
+    MODEL = "dall-e-3"
+    SIZE = "1024x1024"
+
+    def cache(self, image_name):
+        return ImagePromptCache.objects.create(
+            key=image_cache.make_key(self.PROMPT, self.MODEL, self.SIZE),
+            prompt=self.PROMPT, model=self.MODEL, size=self.SIZE, image_name=image_name)
+
+    def lookup(self):
+        return image_cache.lookup(self.PROMPT, self.MODEL, self.SIZE, self.storage)
+
+    def assertCounted(self, stat, action):
+        before = image_cache.snapshot()[stat]
+        result = action()
+        self.assertEqual(image_cache.snapshot()[stat], before + 1)
+        return result
+
+    def test_key_ignores_case_whitespace_and_trailing_punctuation(self):
+        self.assertEqual(
+            image_cache.make_key("A  castle\nat dusk.", self.MODEL, self.SIZE),
+            image_cache.make_key("a castle at dusk", self.MODEL, self.SIZE),
+        )
+        self.assertNotEqual(
+            image_cache.make_key("a castle at dusk", self.MODEL, self.SIZE),
+            image_cache.make_key("a castle at dusk", self.MODEL, "512x512"),
+        )
+
+    def test_miss(self):
+        self.assertIsNone(self.assertCounted("misses", self.lookup))
+
+    def test_hit(self):
+        entry = self.cache(self.storage.save("chapters/a.png", ContentFile(b"image-bytes")))
+
+        found = self.assertCounted("hits", self.lookup)
+
+        self.assertEqual(found.pk, entry.pk)
+        entry.refresh_from_db()
+        self.assertEqual(entry.hits, 1)
+
+    def test_stale_entry_is_dropped(self):
+        entry = self.cache("chapters/deleted.png")
+
+        self.assertIsNone(self.assertCounted("stale", self.lookup))
+        self.assertFalse(ImagePromptCache.objects.filter(pk=entry.pk).exists())
+
+    def test_force_is_the_default_policy(self):
+        self.assertFalse(self.assertCounted("bypassed", image_cache.should_reuse))
+        with override_settings(IMAGE_CACHE={"POLICY": image_cache.POLICY_REUSE}):
+            self.assertTrue(image_cache.should_reuse())
+            self.assertFalse(self.assertCounted("bypassed", lambda: image_cache.should_reuse(force=True)))
+
+    def generate_for_two_chapters(self):
+        book = create_book(User.objects.create_user("writer@example.com", "password", nickname="writer"))
+        chapters = [Chapter.objects.create(book_id=book, content=f"Chapter {n}", chapter_num=n) for n in (1, 2)]
+        with override_settings(MEDIA_ROOT=self.media_root, **FAKE_PROVIDERS), \
+                mock.patch.object(fake_providers.FakeImages, "generate", autospec=True,
+                                  side_effect=fake_providers.FakeImages.generate) as generate:
+            clients.reset_clients()
+            self.addCleanup(clients.reset_clients)
+            for chapter in chapters:
+                images.generate_chapter_image(chapter, book.title, book.tone, book.setting)
+        return generate.call_count, chapters
+
+    def test_chapters_get_new_images_by_default(self):
+        calls, chapters = self.generate_for_two_chapters()
+
+        self.assertEqual(calls, 2)
+        self.assertEqual(ImagePromptCache.objects.count(), 1)
+        self.assertNotEqual(chapters[0].image.name, chapters[1].image.name)
+
+    @override_settings(IMAGE_CACHE={"POLICY": image_cache.POLICY_REUSE})
+    def test_reuse_policy_attaches_cached_image(self):
+        before = image_cache.snapshot()["hits"]
+
+        calls, chapters = self.generate_for_two_chapters()
+
+        self.assertEqual(calls, 1)
+        self.assertEqual(image_cache.snapshot()["hits"], before + 1)
+        first, second = (os.path.join(self.media_root, chapter.image.name) for chapter in chapters)
+        with open(first, "rb") as f, open(second, "rb") as g:
+            self.assertEqual(f.read(), g.read())
@@ -0,0 +1,122 @@
+"""
+번역 결과 2단 캐시 (프로세스 내 LRU + DB)
+
+키는 정규화된 원문의 해시, 대상 언어, 번역 제공자(llm/deepl)로 만듭니다.
+같은 문장을 다시 번역하면 API 호출 대신 조회만 하게 됩니다.
+"""
+import hashlib
+import logging
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import LRUCache
+from .models import TranslationCache
+
+
+DEFAULT_CACHE = {
+    "MAX_ENTRIES": 2048,
+    "PERSIST": True,
+}
+
+_memory = LRUCache(maxsize=DEFAULT_CACHE["MAX_ENTRIES"])
+
+stats = {
+    "memory_hits": 0,
+    "db_hits": 0,
+    "misses": 0,
+}
+# get() 은 executor 스레드에서도 불리므로 카운터 갱신과 스냅샷을 잠금으로 묶음
+_stats_lock = threading.Lock()
+
+
+def _count(stat):
+    with _stats_lock:
+        stats[stat] += 1
+
+
+def cache_settings():
+    return {**DEFAULT_CACHE, **getattr(settings, "TRANSLATION_CACHE", {})}
+
+
+def _get_memory(config):
+    # 설정을 호출할 때마다 읽으므로 MAX_ENTRIES 를 바꾸면 다음 저장부터 그 크기로 줄어듦
+    _memory.maxsize = config["MAX_ENTRIES"]
+    return _memory
+
+
+def normalize(text):
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_key(text, language, provider):
+    raw = f"{provider}\x00{language.strip().lower()}\x00{normalize(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get(text, language, provider):
+    config = cache_settings()
+    memory = _get_memory(config)
+    key = make_key(text, language, provider)
+    translated = memory.get(key)
+    if translated is not None:
+        _count("memory_hits")
+        return translated
+
+    if config["PERSIST"]:
+        try:
+            entry = TranslationCache.objects.filter(key=key).first()
+            if entry:
+                TranslationCache.objects.filter(pk=entry.pk).update(
+                    hits=F("hits") + 1, last_used_at=timezone.now()
+                )
+                memory.set(key, entry.translated_text)
+                _count("db_hits")
+                return entry.translated_text
+        except Exception as e:
+            logging.error(f"Error reading translation cache: {e}")
+
+    _count("misses")
+    return None
+
+
+def put(text, language, provider, translated):
+    if not translated:
+        return
+    config = cache_settings()
+    key = make_key(text, language, provider)
+    _get_memory(config).set(key, translated)
+
+    if config["PERSIST"]:
+        try:
+            TranslationCache.objects.update_or_create(
+                key=key,
+                defaults={
+                    "provider": provider,
+                    "language": language.strip().lower()[:20],
+                    "source_text": text,
+                    "translated_text": translated,
+                },
+            )
+        except Exception as e:
+            logging.error(f"Error writing translation cache: {e}")
+
+
+def clear():
+    """프로세스 내 LRU 만 비웁니다. (DB 항목은 그대로)"""
+    _memory.clear()
+
+
+def snapshot():
+    with _stats_lock:
+        counts = dict(stats)
+    lookups = counts["memory_hits"] + counts["db_hits"] + counts["misses"]
+    hits = counts["memory_hits"] + counts["db_hits"]
+    return {
+        **counts,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "memory": _memory.stats(),
+    }
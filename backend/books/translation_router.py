@@ -0,0 +1,183 @@
+"""
+번역 provider(DeepL, LLM) 선택기
+
+호출 위치마다 provider 를 고정하는 대신, 요청마다 대상 언어와 텍스트 길이를 보고
+관측된 지연 시간(EWMA)이 가장 짧을 것으로 예상되는 provider 를 고릅니다.
+- DeepL 은 지원하는 언어에만 쓰고, 여러 텍스트를 한 번의 벌크 요청으로 보냅니다.
+- LLM 은 JSON 한 번에 배치 번역합니다.
+- 선택한 provider 가 실패하거나 서킷이 열려 있으면 다음 provider 로 넘어가고,
+  모두 실패하면 원문을 그대로 돌려줍니다.
+"""
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from . import deepL_translation, resilience
+from . import language as language_detection
+from .clients import provider_backend
+from .generators import ai_translation
+from .metrics import Counter, register
+
+
+DEFAULT_ROUTER = {
+    "PROVIDERS": ["deepl", "llm"],
+    "EWMA_ALPHA": 0.2,
+    # 관측값이 없을 때 쓰는 초기 예상 지연 시간(초)
+    "INITIAL_LATENCY": {"deepl": 0.6, "llm": 2.5},
+    # 가끔 다른 provider 도 골라서 지연 시간 추정이 오래된 값에 머물지 않게 함
+    "EXPLORE_RATE": 0.05,
+}
+
+DEEPL_LANGUAGES = {
+    "bg", "cs", "da", "de", "el", "en", "es", "et", "fi", "fr", "hu", "id", "it", "ja",
+    "ko", "lt", "lv", "nb", "nl", "pl", "pt", "ro", "ru", "sk", "sl", "sv", "tr", "uk", "zh",
+}
+
+# 텍스트 길이(문자 수) 구간. 구간마다 지연 시간을 따로 추정함
+SIZE_BUCKETS = ((500, "small"), (4000, "medium"), (None, "large"))
+
+routed_total = register(Counter(
+    "storyteller_translation_routed_total",
+    "Translation requests by chosen provider, size bucket and outcome.",
+    ("provider", "size", "outcome"),
+))
+
+_latency = {}
+_lock = threading.Lock()
+
+
+def router_settings():
+    return {**DEFAULT_ROUTER, **getattr(settings, "TRANSLATION_ROUTER", {})}
+
+
+def size_bucket(chars):
+    for limit, name in SIZE_BUCKETS:
+        if limit is None or chars <= limit:
+            return name
+
+
+def supports(language):
+    """대상 언어로 번역할 수 있는 provider 가 있는지 (DeepL 지원 언어 또는 LLM 이 아는 언어)"""
+    if not isinstance(language, str) or not language.strip():
+        return False
+    code = language_detection.normalize_language(language)
+    return code in DEEPL_LANGUAGES or code in language_detection.LANGUAGE_NAMES.values()
+
+
+def deepl_available(language):
+    if language_detection.normalize_language(language) not in DEEPL_LANGUAGES:
+        return False
+    return provider_backend() == "fake" or bool(getattr(settings, "DEEPL_API_KEY", None))
+
+
+def estimated_latency(provider, bucket):
+    with _lock:
+        value = _latency.get((provider, bucket))
+    if value is None:
+        return router_settings()["INITIAL_LATENCY"].get(provider, 1.0)
+    return value
+
+
+def observe(provider, bucket, seconds):
+    alpha = router_settings()["EWMA_ALPHA"]
+    with _lock:
+        previous = _latency.get((provider, bucket))
+        _latency[(provider, bucket)] = seconds if previous is None else (
+            alpha * seconds + (1 - alpha) * previous)
+
+
+def _breaker_name(provider):
+    return "openai" if provider == "llm" else provider
+
+
+def candidates(language, chars):
+    """시도할 provider 순서 (예상 지연 시간이 짧은 순, 서킷이 열린 provider 는 뒤로)"""
+    config = router_settings()
+    bucket = size_bucket(chars)
+    providers = [
+        provider for provider in config["PROVIDERS"]
+        if provider != "deepl" or deepl_available(language)
+    ]
+    providers.sort(key=lambda provider: (
+        resilience.get_breaker(_breaker_name(provider)).state == resilience.CircuitBreaker.OPEN,
+        estimated_latency(provider, bucket),
+    ))
+    if len(providers) > 1 and random.random() < config["EXPLORE_RATE"]:
+        providers[0], providers[1] = providers[1], providers[0]
+    return providers
+
+
+def _translate_llm(texts, language):
+    return ai_translation.translate_batch(texts, language, raise_errors=True)
+
+
+def _translate_deepl(texts, language):
+    return deepL_translation.translate_many(texts, language)
+
+
+TRANSLATORS = {
+    "deepl": _translate_deepl,
+    "llm": _translate_llm,
+}
+
+
+def translate_texts(texts, language):
+    """{key: text} 를 번역해서 같은 키로 돌려줍니다. 모든 provider 가 실패하면 원문"""
+    if not texts:
+        return {}
+    chars = sum(len(text) for text in texts.values())
+    bucket = size_bucket(chars)
+
+    for provider in candidates(language, chars):
+        started = time.monotonic()
+        calls_before = resilience.calls_made()
+        try:
+            translated = TRANSLATORS[provider](texts, language)
+        except Exception as e:
+            routed_total.inc(provider=provider, size=bucket, outcome="failover")
+            logging.warning(f"Translation via {provider} failed, trying next provider: {e}")
+            continue
+        if resilience.calls_made() > calls_before:
+            # 번역 캐시나 언어 감지로 끝나 provider 를 부르지 않은 요청은 지연 시간 추정에서 뺌
+            observe(provider, bucket, time.monotonic() - started)
+            routed_total.inc(provider=provider, size=bucket, outcome="success")
+        else:
+            routed_total.inc(provider=provider, size=bucket, outcome="cached")
+        return {key: translated.get(key, text) for key, text in texts.items()}
+
+    logging.error(f"All translation providers failed for {len(texts)} texts; returning originals")
+    return dict(texts)
+
+
+def translate(content, language):
+    """
+    ``translate_text`` 와 같은 형태(str, dict, list)를 받아 선택된 provider 로 번역합니다.
+    """
+    if not language or language.lower() == "korean":
+        return content
+
+    if isinstance(content, str):
+        return translate_texts({"text": content}, language)["text"] if content.strip() else content
+
+    if isinstance(content, (dict, list)):
+        items = dict(enumerate(content)) if isinstance(content, list) else content
+        texts = {str(key): value for key, value in items.items()
+                 if isinstance(value, str) and value.strip()}
+        translated = translate_texts(texts, language)
+        result = {key: translated.get(str(key), value if isinstance(value, str) else str(value))
+                  for key, value in items.items()}
+        if isinstance(content, list):
+            return [result[index] for index in range(len(content))]
+        return result
+
+    logging.error(f"Invalid input type for translation: {type(content)}. Input data: {content}")
+    return str(content)
+
+
+def snapshot():
+    with _lock:
+        latency = {f"{provider}:{bucket}": round(value, 3) for (provider, bucket), value in _latency.items()}
+    return {"ewma_latency": latency}
@@ -3,7 +3,12 @@ from . import views
 
 urlpatterns = [
     path("", views.BookListAPIView.as_view()),
+    path("bulk/", views.BookBulkCreateAPIView.as_view()),
     path("<int:book_id>/", views.BookDetailAPIView.as_view()),
+    path("<int:book_id>/stream/", views.ChapterStreamAPIView.as_view()),
+    path("providers/status/", views.ProviderStatusAPIView.as_view()),
+    path("metrics/", views.MetricsAPIView.as_view()),
+    path("jobs/<int:job_id>/", views.GenerationJobAPIView.as_view()),
     path("<int:book_id>/del_prol/", views.DeletePrologueAPIView.as_view()),
     path("<int:book_id>/rating/", views.RatingAPIView.as_view()),
     path("<int:book_id>/comments/", views.CommentListAPIView.as_view()),
@@ -1,46 +1,34 @@
+import hmac
+import json
 import logging
+from django.conf import settings
 from django.shortcuts import get_object_or_404, render
-from openai import OpenAI
-import requests
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework import status
-from .models import Book, Comment, Rating, Chapter, Tag
+from .models import Book, Comment, Rating, Chapter, Tag, GenerationJob
 from .serializers import (
     BookSerializer,
     BookLikeSerializer,
     RatingSerializer,
     CommentSerializer,
     ChapterSerializer,
-    ElementsSerializer,
+    GenerationJobSerializer,
 )
 from django.core import serializers
-from django.core.files.base import ContentFile
-from .generators.summary_generator import generate_summary
-from .generators.prologue_generator import generate_prologue
-from .generators.elements_generator import generate_elements
-from .generators.ai_translation import translate_text
-from config import secret
+from django.http import HttpResponse, StreamingHttpResponse
+from .generators import prompt_budget
+from .services import resolve_summary_prompt
+from .streaming import stream_chapter
+from . import bulk, elements_cache, image_cache, jobs, metrics, resilience, story_memory, translation_router
+from . import language as language_detection
 from .serializers import BookSerializer, TagSerializer
 from django.db.models import Count
 import datetime
 from django.utils import timezone
 
 
-def translate_text_with_retries(content, language, max_retries=3):
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            return translate_text(content, language)
-        except Exception as e:
-            logging.error(f"Translation attempt {attempt + 1} failed: {e}")
-            attempt += 1
-    logging.error(f"Failed to translate after {
-                  max_retries} attempts: {content}")
-    return content  # 번역 실패 시 원본 텍스트 반환
-
-
 class BookListAPIView(APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -65,9 +53,9 @@ class BookListAPIView(APIView):
 
         try:
             # 콘텐츠 생성
-            content = generate_elements(
-                user_prompt, language)  # AI로 elements 생성
-            translated_content = translate_text(content, language)
+            content = elements_cache.get_elements(
+                user_prompt, language)  # AI로 elements 생성 (캐시 사용 시 재사용)
+            translated_content = translation_router.translate(content, language)
             content["user_id"] = request.user.pk
             content["tags"] = tags  # 태그 데이터를 content에 추가
 
@@ -75,6 +63,16 @@ class BookListAPIView(APIView):
             if serializer.is_valid(raise_exception=True):
                 book = serializer.save()
 
+            if settings.SPECULATIVE_PROLOGUE:
+                # 첫 챕터 요청 전에 프롤로그를 미리 생성해 둠 (BookDetailAPIView.post 에서 사용)
+                jobs.enqueue(
+                    jobs.PROLOGUE_DRAFT,
+                    {"book_id": book.id, "language": language},
+                    user=request.user,
+                    book=book,
+                    background=True,
+                )
+
             return Response(
                 data={
                     "book_id": book.id,
@@ -87,6 +85,37 @@ class BookListAPIView(APIView):
             return Response({"error": "Failed to create synopsis."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class BookBulkCreateAPIView(APIView):
+    """시놉시스 일괄 생성 (콘텐츠 팀용). 항목별 결과를 NDJSON 으로 끝나는 순서대로 스트리밍"""
+
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        prompts = request.data.get("prompts")
+        language = request.data.get("language")
+        tags = request.data.get("tags", [])
+
+        if not prompts or not isinstance(prompts, list) or not all(isinstance(p, str) and p.strip() for p in prompts):
+            return Response({"error": "Missing prompts"}, status=status.HTTP_400_BAD_REQUEST)
+        if not translation_router.supports(language):
+            return Response({"error": "Unsupported language"}, status=status.HTTP_400_BAD_REQUEST)
+        max_prompts = bulk.bulk_settings()["MAX_PROMPTS"]
+        if len(prompts) > max_prompts:
+            return Response(
+                {"error": f"Too many prompts (max {max_prompts})"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        lines = (
+            json.dumps(item, ensure_ascii=False) + "\n"
+            for item in bulk.generate_synopses(prompts, language, request.user, tags)
+        )
+        response = StreamingHttpResponse(lines, content_type="application/x-ndjson")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
 class ChapterImageGenerationAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -95,38 +124,43 @@ class ChapterImageGenerationAPIView(APIView):
         title = request.data.get("title", chapter.book_id.title)
         tone = request.data.get("tone", chapter.book_id.tone)
         setting = request.data.get("setting", chapter.book_id.setting)
+        # 같은 프롬프트로 만든 이미지를 재사용하지 않고 새로 생성
+        regenerate = str(request.data.get("regenerate", "")).lower() in ("1", "true")
 
         if not title or not tone or not setting:
             return Response(
                 {"error": "Missing parameters"}, status=status.HTTP_400_BAD_REQUEST
             )
 
+        # 이미지 생성은 작업 큐에서 실행하고 job_id 로 결과를 조회 (GET /api/books/jobs/<job_id>/)
         try:
-            # 이미지 생성
-            client = OpenAI(api_key=secret.OPENAI_API_KEY)
-            response = client.images.generate(
-                model="dall-e-3",
-                prompt=f"{title}, {tone}, {setting}",
-                size="1024x1024",
-                quality="standard",
-                n=1,
+            job = jobs.enqueue(
+                jobs.CHAPTER_IMAGE,
+                {"chapter_id": chapter.id, "title": title, "tone": tone,
+                 "setting": setting, "force": regenerate},
+                user=request.user,
+                book=chapter.book_id,
+                # 동기 모드에서도 15~30초 걸리는 이미지 생성을 요청 안에서 기다리지 않음
+                background=True,
+            )
+        except jobs.JobLimitExceeded:
+            return Response(
+                {"error": "Too many image requests in progress."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
             )
-            res = requests.get(response.data[0].url)
-            image_content = ContentFile(res.content, name=f"{title}_chapter_{
-                                        chapter.chapter_num}.png")
-
-            # 챕터에 이미지 저장
-            chapter.image.save(image_content.name, image_content)
-            chapter.save()
 
+        if job.status == GenerationJob.STATUS_SUCCEEDED:
             return Response(
-                {"image_url": request.build_absolute_uri(
-                    chapter.image.url) if request else chapter.image.url},
+                {"image_url": request.build_absolute_uri(job.result["image_url"])},
                 status=status.HTTP_200_OK
             )
-        except Exception as e:
-            logging.error(f"Error generating chapter image: {e}")
+        if job.status == GenerationJob.STATUS_FAILED:
+            logging.error(f"Error generating chapter image: {job.error}")
             return Response({"error": "Failed to generate image."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(
+            data={"job_id": job.id, "status": job.status},
+            status=status.HTTP_202_ACCEPTED,
+        )
 
 
 class BookDetailAPIView(APIView):
@@ -155,57 +189,38 @@ class BookDetailAPIView(APIView):
             )
 
         language = request.data.get("language", "EN-US")
-        selected_recommendation = request.data.get(
-            "selected_recommendation", None)
-
-        chapter = Chapter.objects.filter(book_id=book_id).last()
-        elements = ElementsSerializer(book).data
+        summary = resolve_summary_prompt(request.data)
 
-        if not chapter:
-            chapter_num = 0
-            result = generate_prologue(elements)
-            content = result["prologue"]
-            content = translate_text(content, language)
-
-        else:
-            if selected_recommendation:
-                summary = f"{selected_recommendation['Title']}: {
-                    selected_recommendation['Description']}"
-            else:
-                summary = request.data.get("summary")
-                if not summary:
-                    return Response(
-                        {"error": "Missing summary prompt"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-            chapter_num = chapter.chapter_num + 1
-            prologue = Chapter.objects.filter(
-                book_id=book_id, chapter_num=0).first()
-            result = generate_summary(
-                chapter_num,
-                summary,
-                elements,
-                prologue.content if prologue else "",
-                language,
+        if Chapter.objects.filter(book_id=book_id).exists() and not summary:
+            return Response(
+                {"error": "Missing summary prompt"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            content = result["final_summary"]
 
-        serializer = ChapterSerializer(
-            data={"content": content, "book_id": book_id,
-                  "chapter_num": chapter_num}
+        try:
+            job = jobs.enqueue(
+                jobs.CHAPTER,
+                {"book_id": book.id, "language": language, "summary": summary},
+                user=request.user,
+                book=book,
+            )
+        except jobs.JobConflict:
+            # 다른 요약으로 이미 챕터를 만드는 중 (같은 요청이면 위에서 그 작업에 붙음)
+            return Response(
+                {"error": "A chapter is already being generated for this book."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if not jobs.job_settings()["ASYNC"]:
+            # 동기 모드에서 중복 요청이 진행 중인 작업에 붙은 경우 같은 결과를 기다려 반환
+            jobs.wait(job)
+        if job.status == GenerationJob.STATUS_SUCCEEDED:
+            return Response(data=job.result, status=status.HTTP_201_CREATED)
+        if job.status == GenerationJob.STATUS_FAILED:
+            return Response({"error": "Failed to generate chapter."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(
+            data={"job_id": job.id, "status": job.status},
+            status=status.HTTP_202_ACCEPTED,
         )
-        if serializer.is_valid(raise_exception=True):
-            serializer.save()
-            response_data = {
-                "book_id": book_id,
-                "translated_content": content,
-                "chapter_num": chapter_num,
-                "recommendations": result.get("recommendations", []),
-            }
-            return Response(data=response_data, status=status.HTTP_201_CREATED)
-        else:
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     # 글 수정
 
@@ -235,10 +250,109 @@ class BookDetailAPIView(APIView):
         return Response("No Content", status=204)
 
 
+class ChapterStreamAPIView(APIView):
+    """챕터 생성 토큰을 Server-Sent Events 로 전달 (ASGI 권장)"""
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, book_id):
+        book = get_object_or_404(Book, id=book_id)
+        if book.user_id != request.user:
+            return Response(
+                {"error": "You don't have permission."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        language = request.data.get("language", "EN-US")
+        summary = resolve_summary_prompt(request.data)
+
+        if Chapter.objects.filter(book_id=book_id).exists() and not summary:
+            return Response(
+                {"error": "Missing summary prompt"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # 비스트리밍 요청과 같은 작업 fingerprint 로 등록해 같은 챕터를 두 번 생성하지 않음
+        try:
+            job = jobs.start(
+                jobs.CHAPTER,
+                {"book_id": book.id, "language": language, "summary": summary},
+                user=request.user,
+                book=book,
+            )
+        except jobs.JobConflict:
+            return Response(
+                {"error": "A chapter is already being generated for this book."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        response = StreamingHttpResponse(
+            stream_chapter(book, language, summary=summary, job=job),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # Nginx 버퍼링 해제
+        return response
+
+
+class ProviderStatusAPIView(APIView):
+    """provider 서킷 브레이커 상태와 토큰 사용량"""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "circuit_breakers": resilience.snapshot(),
+            "token_usage": dict(prompt_budget.usage),
+            "elements_cache": elements_cache.snapshot(),
+            "translation_skips": language_detection.snapshot(),
+            "translation_router": translation_router.snapshot(),
+            "image_cache": image_cache.snapshot(),
+        })
+
+
+class MetricsAPIView(APIView):
+    """provider 호출 지표 (Prometheus text format)"""
+
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        # 스크레이퍼는 X-Metrics-Token 헤더(METRICS_TOKEN)로, 그 외에는 관리자만 조회
+        token = settings.METRICS_TOKEN
+        authorized = request.user.is_staff or (
+            token and hmac.compare_digest(
+                request.headers.get("X-Metrics-Token", "").encode(), token.encode())
+        )
+        if not authorized:
+            return Response(
+                {"error": "You don't have permission."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4")
+
+
+class GenerationJobAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(GenerationJob, id=job_id)
+        if job.user_id != request.user.id:
+            return Response(
+                {"error": "You don't have permission."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        serializer = GenerationJobSerializer(job)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 class DeletePrologueAPIView(APIView):
     def delete(self, request, book_id):
         prologue = Chapter.objects.filter(chapter_num=0, book_id=book_id)
         prologue.delete()
+        story_memory.reset(book_id)
+        # 다시 생성할 때 이전 초안을 쓰지 않도록 남은 초안도 지움
+        GenerationJob.objects.filter(book_id=book_id, kind=jobs.PROLOGUE_DRAFT).exclude(
+            status=GenerationJob.STATUS_RUNNING).delete()
         return Response("Prologue deleted successfully", status=204)
 
 
@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+챕터 생성 SSE 스트리밍(/api/books/<book_id>/stream/)은 ASGI 로 서비스해야
+토큰 단위로 전달됩니다.
+
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker
 """
 
 import os
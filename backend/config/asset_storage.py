@@ -1,6 +1,12 @@
 from storages.backends.s3boto3 import S3Boto3Storage
 
+from books.blob_storage import ContentAddressedMixin
+
 
 class MediaStorage(S3Boto3Storage):
     location = "media"
     file_overwrite = False
+
+
+class ContentAddressedMediaStorage(ContentAddressedMixin, MediaStorage):
+    """같은 내용의 이미지는 S3 에 한 번만 올리는 MediaStorage (books.blob_storage)"""
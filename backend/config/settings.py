@@ -198,7 +198,15 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'mediafiles'
-DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+# 같은 내용의 파일을 한 번만 저장하려면 books.blob_storage.ContentAddressedFileSystemStorage
+# (S3 는 config.asset_storage.ContentAddressedMediaStorage) 로 바꾸고 gc_media 를 주기적으로 실행
+DEFAULT_FILE_STORAGE = os.getenv(
+    'DEFAULT_FILE_STORAGE', 'django.core.files.storage.FileSystemStorage')
+BLOB_STORAGE = {
+    "PREFIX": "blobs",
+    "SPOOL_MAX_SIZE": 2 * 1024 * 1024,
+    "GRACE_PERIOD": int(os.getenv('BLOB_GC_GRACE_PERIOD', str(60 * 60 * 24))),
+}
 
 # API Documentation
 SPECTACULAR_SETTINGS = {
@@ -210,6 +218,135 @@ SPECTACULAR_SETTINGS = {
 # Third-party API Keys
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 DEEPL_API_KEY = os.getenv('DEEPL_API_KEY')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')
+
+# AI Provider Backend (books.clients)
+# "fake" 면 API 비용 없이 books.fake_providers 의 가짜 LLM/DeepL/이미지를 사용 (부하 테스트용)
+AI_PROVIDER_BACKEND = os.getenv('AI_PROVIDER_BACKEND', 'openai')
+FAKE_PROVIDER = {
+    "LATENCY": float(os.getenv('FAKE_PROVIDER_LATENCY', '0.2')),
+    "TOKEN_DELAY": float(os.getenv('FAKE_PROVIDER_TOKEN_DELAY', '0.01')),
+    "FAILURE_RATE": float(os.getenv('FAKE_PROVIDER_FAILURE_RATE', '0.0')),
+    "IMAGE_LATENCY": float(os.getenv('FAKE_PROVIDER_IMAGE_LATENCY', '1.0')),
+    "SEED": int(os.getenv('FAKE_PROVIDER_SEED', '0')),
+}
+
+# True 면 앱 로딩 시(fork 전 마스터) langchain/openai/deepl 과 생성기 모듈을 미리 import (books.lazy)
+PRELOAD_PROVIDERS = os.getenv('PRELOAD_PROVIDERS', 'False') == 'True'
+
+# AI Provider HTTP Pool (books.clients)
+LLM_HTTP_POOL = {
+    "MAX_CONNECTIONS": int(os.getenv('LLM_MAX_CONNECTIONS', '20')),
+    "MAX_KEEPALIVE_CONNECTIONS": int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', '10')),
+    "KEEPALIVE_EXPIRY": float(os.getenv('LLM_KEEPALIVE_EXPIRY', '60')),
+    "CONNECT_TIMEOUT": float(os.getenv('LLM_CONNECT_TIMEOUT', '5')),
+    "READ_TIMEOUT": float(os.getenv('LLM_READ_TIMEOUT', '60')),
+    "MAX_RETRIES": int(os.getenv('LLM_MAX_RETRIES', '0')),
+}
+
+# 생성된 이미지 다운로드 (books.downloads)
+IMAGE_DOWNLOAD = {
+    "POOL_SIZE": int(os.getenv('IMAGE_DOWNLOAD_POOL_SIZE', '10')),
+    "CONNECT_TIMEOUT": float(os.getenv('IMAGE_DOWNLOAD_CONNECT_TIMEOUT', '5')),
+    "READ_TIMEOUT": float(os.getenv('IMAGE_DOWNLOAD_READ_TIMEOUT', '30')),
+    "MAX_BYTES": int(os.getenv('IMAGE_DOWNLOAD_MAX_BYTES', str(10 * 1024 * 1024))),
+    "CHUNK_SIZE": 64 * 1024,
+}
+
+# 책/챕터/프로필 이미지의 썸네일·중간 크기 파생본 (books.image_variants)
+IMAGE_VARIANTS = {
+    "SIZES": {"thumb": 256, "medium": 640},
+    "FORMATS": ["webp", "jpeg"],
+    "QUALITY": int(os.getenv('IMAGE_VARIANT_QUALITY', '80')),
+}
+
+# 챕터 삽화 캐시 (books.image_cache): "force"(기본) 면 항상 새로 생성, "reuse" 면 같은 프롬프트/모델/크기의 이미지를 재사용
+IMAGE_CACHE = {
+    "POLICY": os.getenv('IMAGE_CACHE_POLICY', 'force'),
+}
+
+# 챕터 생성 후 번역/추천 생성을 동시에 실행할 스레드 수 (books.executors)
+GENERATION_FANOUT_WORKERS = int(os.getenv('GENERATION_FANOUT_WORKERS', '8'))
+
+# 동기 모드에서 백그라운드로 돌리는 작업(이미지, 프롤로그 초안, 이미지 파생본) 전용 스레드 수 (books.executors)
+GENERATION_BACKGROUND_WORKERS = int(os.getenv('GENERATION_BACKGROUND_WORKERS', '2'))
+
+# 다음 챕터 프롬프트에 들어가는 누적 줄거리 요약의 최대 토큰 수 (books.story_memory)
+STORY_MEMORY_MAX_TOKENS = int(os.getenv('STORY_MEMORY_MAX_TOKENS', '400'))
+
+# 생성 단계별 프롬프트 토큰 예산 (books.generators.prompt_budget)
+PROMPT_TOKEN_BUDGETS = {
+    "elements": 1500,
+    "summary": int(os.getenv('SUMMARY_PROMPT_TOKEN_BUDGET', '3500')),
+}
+
+# Provider 재시도/서킷 브레이커 정책 (books.resilience)
+PROVIDER_RESILIENCE = {
+    "default": {
+        "ATTEMPTS": 3,
+        "BASE_DELAY": 0.5,
+        "MAX_DELAY": 8.0,
+        "DEADLINE": 60.0,
+        "FAILURE_THRESHOLD": 5,
+        "RESET_TIMEOUT": 30.0,
+    },
+    "deepl": {"DEADLINE": 20.0},
+    "openai_images": {"ATTEMPTS": 2, "DEADLINE": 90.0},
+}
+
+# /api/books/metrics/ 를 스크레이프할 때 X-Metrics-Token 헤더로 보내는 값 (비어 있으면 관리자만 조회)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Translation Provider Routing (books.translation_router)
+# 관측된 지연 시간(EWMA)으로 DeepL/LLM 중 빠른 쪽을 고르고, 실패하면 다음 provider 로 넘어갑니다.
+TRANSLATION_ROUTER = {
+    "PROVIDERS": os.getenv('TRANSLATION_PROVIDERS', 'deepl,llm').split(','),
+    "EWMA_ALPHA": 0.2,
+    "INITIAL_LATENCY": {"deepl": 0.6, "llm": 2.5},
+    "EXPLORE_RATE": float(os.getenv('TRANSLATION_EXPLORE_RATE', '0.05')),
+}
+
+# Translation Cache (books.translation_cache)
+TRANSLATION_CACHE = {
+    "MAX_ENTRIES": int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', '2048')),
+    "PERSIST": os.getenv('TRANSLATION_CACHE_PERSIST', 'True') == 'True',
+}
+
+# Synopsis(elements) Result Cache (books.elements_cache)
+# 같은 프롬프트는 VARIANTS 개까지 결과를 모은 뒤 그중 하나를 돌려줍니다.
+ELEMENTS_CACHE = {
+    "ENABLED": os.getenv('ELEMENTS_CACHE_ENABLED', 'False') == 'True',
+    "MAX_ENTRIES": int(os.getenv('ELEMENTS_CACHE_MAX_ENTRIES', '512')),
+    "TTL": int(os.getenv('ELEMENTS_CACHE_TTL', str(60 * 60 * 24))),
+    "VARIANTS": int(os.getenv('ELEMENTS_CACHE_VARIANTS', '3')),
+}
+
+# 책 생성 직후 프롤로그를 백그라운드로 미리 생성 (books.jobs "prologue_draft")
+SPECULATIVE_PROLOGUE = os.getenv('SPECULATIVE_PROLOGUE', 'False') == 'True'
+
+# Bulk Synopsis Generation (books.bulk)
+BULK_SYNOPSIS = {
+    "MAX_PROMPTS": int(os.getenv('BULK_SYNOPSIS_MAX_PROMPTS', '50')),
+    "CONCURRENCY": int(os.getenv('BULK_SYNOPSIS_CONCURRENCY', '4')),
+    "BATCH_SIZE": int(os.getenv('BULK_SYNOPSIS_BATCH_SIZE', '10')),
+    "GLOBAL_CONCURRENCY": int(os.getenv('BULK_SYNOPSIS_GLOBAL_CONCURRENCY', '8')),
+}
+
+# Generation Job Queue (books.jobs)
+# ASYNC=False 이면 워커 없이 요청 안에서 바로 실행합니다. (로컬 개발용)
+GENERATION_JOBS = {
+    "ASYNC": os.getenv('GENERATION_JOBS_ASYNC', 'True') == 'True',
+    "WORKERS": int(os.getenv('GENERATION_WORKERS', '2')),
+    "POLL_INTERVAL": 1.0,
+    "STALE_AFTER": 600,
+    "STALE_CHECK_INTERVAL": 60,
+    "MAX_ATTEMPTS": 2,
+    "JOIN_TIMEOUT": int(os.getenv('GENERATION_JOIN_TIMEOUT', '60')),
+    "DRAFT_WAIT": int(os.getenv('PROLOGUE_DRAFT_WAIT', '15')),
+    # 이미지 작업이 텍스트 생성 워커를 다 차지하지 않도록 종류별 동시 실행 수 제한
+    "KIND_LIMITS": {"chapter_image": int(os.getenv('CHAPTER_IMAGE_CONCURRENCY', '1'))},
+    "PER_USER_LIMITS": {"chapter_image": int(os.getenv('CHAPTER_IMAGE_PER_USER', '2'))},
+}
 
 # Internationalization
 LANGUAGE_CODE = "en-us"